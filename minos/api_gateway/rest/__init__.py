@@ -1,5 +1,11 @@
 __version__ = "0.4.0"
 
+import importlib
+from typing import (
+    TYPE_CHECKING,
+    Any,
+)
+
 from .config import (
     ApiGatewayConfig,
 )
@@ -8,9 +14,24 @@ from .exceptions import (
     ApiGatewayException,
     NoTokenException,
 )
-from .launchers import (
-    EntrypointLauncher,
-)
-from .service import (
-    ApiGatewayRestService,
-)
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .launchers import (
+        EntrypointLauncher,
+    )
+    from .service import (
+        ApiGatewayRestService,
+    )
+
+# The service stack (``aiohttp``, ``SQLAlchemy``, ``aiomisc``...) is only imported when it is used, so the commands
+# and modules that only need the config start faster.
+_LAZY_ATTRIBUTES = {
+    "EntrypointLauncher": ".launchers",
+    "ApiGatewayRestService": ".service",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_ATTRIBUTES:
+        return getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,162 @@
+import json
+import logging
+import queue
+import random
+import time
+from datetime import (
+    datetime,
+    timezone,
+)
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+)
+from typing import (
+    Awaitable,
+    Callable,
+    Optional,
+)
+
+from aiohttp import (
+    web,
+)
+
+
+class JsonFormatter(logging.Formatter):
+    """Format log records as single line ``JSON`` documents."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Format the given record.
+
+        :param record: The record to be formatted.
+        :return: A ``JSON`` encoded string.
+        """
+        payload = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        access = getattr(record, "access", None)
+        if access is not None:
+            payload.update(access)
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Queue handler that leaves the message formatting to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class AccessLogger:
+    """Structured access logger that writes through a background thread.
+
+    Records are pushed into a queue from the event loop and formatted and emitted by a ``QueueListener`` thread, so
+    the request path only pays for building a small ``dict``.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, handler: Optional[logging.Handler] = None, name: str = __name__):
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError(f"The sample rate must be between 0 and 1. Obtained: {sample_rate!r}")
+
+        if handler is None:
+            handler = logging.StreamHandler()
+            handler.setFormatter(JsonFormatter())
+
+        self.sample_rate = sample_rate
+        self.handler = handler
+        self.logger = logging.getLogger(name)
+
+        self._queue = queue.SimpleQueue()
+        self._queue_handler = _DeferredQueueHandler(self._queue)
+        self._listener = QueueListener(self._queue, handler, respect_handler_level=True)
+        self._started = False
+
+    def start(self) -> None:
+        """Start the background listener.
+
+        :return: This method does not return anything.
+        """
+        if self._started:
+            return
+        self.logger.addHandler(self._queue_handler)
+        self.logger.propagate = False
+        if self.logger.level == logging.NOTSET:
+            self.logger.setLevel(logging.INFO)
+        self._listener.start()
+        self._started = True
+
+    def stop(self) -> None:
+        """Flush the pending records and stop the background listener.
+
+        :return: This method does not return anything.
+        """
+        if not self._started:
+            return
+        self._listener.stop()
+        self.logger.removeHandler(self._queue_handler)
+        self._started = False
+
+    def log(self, request: web.Request, status: int, duration: float) -> None:
+        """Log a finished request.
+
+        :param request: The handled request.
+        :param status: The response status code.
+        :param duration: The elapsed time in seconds.
+        :return: This method does not return anything.
+        """
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+
+        access = {
+            "method": request.method,
+            "path": request.path,
+            "status": status,
+            "duration_ms": round(duration * 1000, 3),
+            "remote": request.remote,
+        }
+        self.logger.info("access", extra={"access": access})
+
+    def middleware(self) -> Callable[[web.Request, Callable], Awaitable[web.StreamResponse]]:
+        """Build an ``aiohttp`` middleware that logs every handled request.
+
+        The response is finished by the middleware, so the duration includes writing its body, which may be streamed
+        from the upstream service. Hence, the responses cannot be updated by the middlewares placed before this one.
+
+        :return: A middleware function.
+        """
+
+        @web.middleware
+        async def _middleware(request: web.Request, handler: Callable) -> web.StreamResponse:
+            start = time.perf_counter()
+            status = web.HTTPInternalServerError.status_code
+            try:
+                response = await handler(request)
+                status = response.status
+                try:
+                    await response.prepare(request)
+                    await response.write_eof()
+                except ConnectionError:
+                    pass  # The client has gone, which is handled by ``aiohttp`` when it finishes the response.
+                return response
+            except web.HTTPException as exc:
+                status = exc.status
+                raise
+            finally:
+                self.log(request, status, time.perf_counter() - start)
+
+        return _middleware
+
+    async def on_startup(self, app: web.Application) -> None:
+        """Start the listener as an ``aiohttp`` startup signal."""
+        self.start()
+
+    async def on_cleanup(self, app: web.Application) -> None:
+        """Stop the listener as an ``aiohttp`` cleanup signal."""
+        self.stop()
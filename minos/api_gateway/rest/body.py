@@ -0,0 +1,184 @@
+import asyncio
+import mmap
+import tempfile
+from typing import (
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Optional,
+    Union,
+)
+
+from aiohttp import (
+    StreamReader,
+    web,
+)
+
+from .urlmatch.target import (
+    RequestTarget,
+)
+
+# Same limit as the ``aiohttp`` default ``client_max_size``.
+DEFAULT_MAX_SIZE = 1024 ** 2
+
+_CHUNK_SIZE = 2 ** 16
+
+
+class BodyPolicy:
+    """Size limits applied to the bodies of the requests handled by the gateway.
+
+    Every service (the first segment of the request path) can define its own ``max_size``. Bodies bigger than
+    ``spool_threshold`` that must be buffered are spilled to a temporary file. The requests to the ``exempt`` paths
+    are not checked, as their handlers enforce their own limits.
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_MAX_SIZE,
+        spool_threshold: int = DEFAULT_MAX_SIZE,
+        services: Optional[dict[str, int]] = None,
+        exempt: Iterable[str] = (),
+    ):
+        self.max_size = max_size
+        self.spool_threshold = spool_threshold
+        self.services = dict() if services is None else dict(services)
+        self.exempt = frozenset(exempt)
+
+    def max_size_for(self, service: Optional[str]) -> int:
+        """Get the maximum body size accepted by the given service.
+
+        :param service: The service name.
+        :return: A size in bytes.
+        """
+        return self.services.get(service, self.max_size)
+
+    def check(self, request: web.Request, service: Optional[str] = None) -> None:
+        """Reject the given request if its declared ``Content-Length`` exceeds the limit of the service.
+
+        :param request: The inbound request.
+        :param service: The service name.
+        :return: This method does not return anything.
+        """
+        content_length = request.content_length
+        max_size = self.max_size_for(service)
+        if content_length is not None and content_length > max_size:
+            raise web.HTTPRequestEntityTooLarge(max_size=max_size, actual_size=content_length)
+
+    async def spool(self, request: web.Request, service: Optional[str] = None) -> "SpooledBody":
+        """Buffer the body of the given request, enforcing the limit of the service.
+
+        :param request: The inbound request.
+        :param service: The service name.
+        :return: A ``SpooledBody`` instance.
+        """
+        return await SpooledBody.from_stream(
+            request.content, threshold=self.spool_threshold, max_size=self.max_size_for(service)
+        )
+
+    async def handle(self, request: web.Request, handler: Callable) -> web.StreamResponse:
+        """Reject the given request if its declared body is too large, or pass it to the handler otherwise.
+
+        The check is performed before any handler reads the body, so the payload is never received.
+
+        :param request: The inbound request.
+        :param handler: The next handler.
+        :return: The response of the handler.
+        """
+        if request.path not in self.exempt:
+            self.check(request, RequestTarget.from_url(request.url).service)
+        return await handler(request)
+
+
+class SpooledBody:
+    """Request body kept in memory up to ``threshold`` bytes and spilled to a temporary file beyond it.
+
+    Spilled bodies are memory-mapped when they are forwarded, instead of being read back through file buffers. The
+    file is created and written from the default executor, so a large body never blocks the event loop on disk.
+    """
+
+    def __init__(self, threshold: int = DEFAULT_MAX_SIZE, max_size: Optional[int] = None):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.size = 0
+
+        self._chunks = list()
+        self._file = None
+
+    @classmethod
+    async def from_stream(
+        cls, stream: StreamReader, threshold: int = DEFAULT_MAX_SIZE, max_size: Optional[int] = None
+    ) -> "SpooledBody":
+        """Build a new instance from the given stream.
+
+        :param stream: The stream to be read.
+        :param threshold: The maximum number of bytes to be kept in memory.
+        :param max_size: The maximum number of bytes to be accepted.
+        :return: A new ``SpooledBody`` instance.
+        """
+        body = cls(threshold=threshold, max_size=max_size)
+        try:
+            async for chunk in stream.iter_any():
+                await body.write(chunk)
+        except BaseException:
+            body.close()
+            raise
+        return body
+
+    @property
+    def spilled(self) -> bool:
+        """Check if the body has been spilled to a temporary file.
+
+        :return: ``True`` if the body is stored in a file or ``False`` otherwise.
+        """
+        return self._file is not None
+
+    async def write(self, chunk: Union[bytes, bytearray, memoryview]) -> None:
+        """Append a chunk to the body.
+
+        :param chunk: The chunk to be appended.
+        :return: This method does not return anything.
+        """
+        size = self.size + len(chunk)
+        if self.max_size is not None and size > self.max_size:
+            raise web.HTTPRequestEntityTooLarge(max_size=self.max_size, actual_size=size)
+
+        if self._file is None and size <= self.threshold:
+            self._chunks.append(bytes(chunk))
+        else:
+            await asyncio.get_running_loop().run_in_executor(None, self._spill, bytes(chunk))
+        self.size = size
+
+    def _spill(self, chunk: bytes) -> None:
+        if self._file is None:
+            self._file = tempfile.TemporaryFile()
+            self._file.writelines(self._chunks)
+            self._chunks = list()
+        self._file.write(chunk)
+
+    async def chunks(self, chunk_size: int = _CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Iterate over the body chunks.
+
+        In-memory bodies are retrieved as the chunks received from the client, without concatenating them.
+
+        :param chunk_size: The maximum size of the chunks read from the temporary file.
+        :return: An asynchronous iterator of chunks.
+        """
+        if self._file is None:
+            for chunk in self._chunks:
+                yield chunk
+            return
+
+        await asyncio.get_running_loop().run_in_executor(None, self._file.flush)
+        with mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for offset in range(0, self.size, chunk_size):
+                yield mapped[offset : offset + chunk_size]  # noqa pylint: disable=whitespace
+
+    def close(self) -> None:
+        """Release the buffered body.
+
+        :return: This method does not return anything.
+        """
+        self._chunks = list()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -1,3 +1,4 @@
+import time
 from pathlib import (
     Path,
 )
@@ -10,12 +11,6 @@ import typer
 from .config import (
     ApiGatewayConfig,
 )
-from .launchers import (
-    EntrypointLauncher,
-)
-from .service import (
-    ApiGatewayRestService,
-)
 
 app = typer.Typer()
 
@@ -34,6 +29,17 @@ def start(
         typer.echo(f"Error loading config: {exc!r}")
         raise typer.Exit(code=1)
 
+    # The service stack is only imported by the commands that need it.
+    started = time.perf_counter()
+    from .launchers import (
+        EntrypointLauncher,
+    )
+    from .service import (
+        ApiGatewayRestService,
+    )
+
+    typer.echo(f"Api Gateway modules imported in {(time.perf_counter() - started) * 1000:.1f} ms.")
+
     services = (ApiGatewayRestService(address=config.rest.host, port=config.rest.port, config=config),)
     try:
         EntrypointLauncher(config=config, services=services).launch()
@@ -44,6 +50,36 @@ def start(
     typer.echo("Api Gateway is up and running!\n")
 
 
+@app.command("migrate")
+def migrate(
+    file_path: Optional[Path] = typer.Argument(
+        "config.yml", help="API Gateway configuration file.", envvar="MINOS_API_GATEWAY_CONFIG_FILE_PATH"
+    )
+):
+    """Create the Api Gateway database schema."""
+
+    try:
+        config = ApiGatewayConfig(file_path)
+    except Exception as exc:
+        typer.echo(f"Error loading config: {exc!r}")
+        raise typer.Exit(code=1)
+
+    from .database import (
+        backends,
+    )
+
+    backend = backends.build_backend(config.database)
+    try:
+        backend.migrate()
+    except Exception as exc:
+        typer.echo(f"Error migrating the database: {exc!r}")
+        raise typer.Exit(code=1)
+    finally:
+        backend.dispose()
+
+    typer.echo("Api Gateway database is up to date!")
+
+
 @app.command("status")
 def status():
     """Get the Api Gateway status."""
@@ -6,29 +6,49 @@ import abc
 import collections
 import os
 import typing as t
-from distutils import (
-    util,
-)
 from pathlib import (
     Path,
 )
+from types import (
+    MappingProxyType,
+)
 from typing import (
     Any,
 )
 
 import yaml
+from yarl import (
+    URL,
+)
 
 from .exceptions import (
     ApiGatewayConfigException,
 )
 
-REST = collections.namedtuple("Rest", "host port cors auth admin")
-DISCOVERY = collections.namedtuple("Discovery", "host port")
+REST = collections.namedtuple("Rest", "host port cors auth admin access_log body")
+DISCOVERY = collections.namedtuple("Discovery", "host port mode interval url")
 CORS = collections.namedtuple("Cors", "enabled")
 AUTH_SERVICE = collections.namedtuple("AuthService", "name")
 REST_ADMIN = collections.namedtuple("RestAdmin", "username password")
-DATABASE = collections.namedtuple("Database", "dbname user password host port")
-AUTH = collections.namedtuple("Auth", "enabled host port path services default")
+DATABASE = collections.namedtuple("Database", "backend path dbname user password host port create_schema timeout")
+AUTH = collections.namedtuple("Auth", "enabled host port path services default jwt token_headers url")
+JWT = collections.namedtuple("Jwt", "enabled jwks_path algorithms audience refresh_interval")
+ACCESS_LOG = collections.namedtuple("AccessLog", "enabled sample_rate")
+BODY = collections.namedtuple("Body", "max_size spool_threshold services")
+BODY_SERVICE = collections.namedtuple("BodyService", "name max_size")
+UPSTREAM = collections.namedtuple("Upstream", "protocol dns_ttl retries retry_backoff services")
+UPSTREAM_SERVICE = collections.namedtuple("UpstreamService", "name protocol socket")
+
+HEADERS = collections.namedtuple("Headers", "forwarded allow deny services")
+HEADERS_SERVICE = collections.namedtuple("HeadersService", "name set_headers remove")
+
+RULES = collections.namedtuple("Rules", "poll_interval listen cache_size import_max_size")
+
+CONFIG = collections.namedtuple("Config", "rest database discovery upstream headers rules")
+
+_UPSTREAM_PROTOCOLS = ("http/1.1", "h2", "h2c")
+_DISCOVERY_MODES = ("pull", "sync")
+_DATABASE_BACKENDS = ("postgresql", "sqlite", "file")
 
 _ENVIRONMENT_MAPPER = {
     "rest.host": "API_GATEWAY_REST_HOST",
@@ -38,13 +58,32 @@ _ENVIRONMENT_MAPPER = {
     "rest.auth.host": "API_GATEWAY_REST_AUTH_HOST",
     "rest.auth.port": "API_GATEWAY_REST_AUTH_PORT",
     "rest.auth.path": "API_GATEWAY_REST_AUTH_PATH",
+    "rest.auth.jwt.enabled": "API_GATEWAY_REST_AUTH_JWT_ENABLED",
+    "rest.access_log.enabled": "API_GATEWAY_REST_ACCESS_LOG_ENABLED",
+    "rest.access_log.sample_rate": "API_GATEWAY_REST_ACCESS_LOG_SAMPLE_RATE",
+    "rest.body.max_size": "API_GATEWAY_REST_BODY_MAX_SIZE",
+    "rest.body.spool_threshold": "API_GATEWAY_REST_BODY_SPOOL_THRESHOLD",
+    "database.backend": "API_GATEWAY_DATABASE_BACKEND",
+    "database.path": "API_GATEWAY_DATABASE_PATH",
     "database.dbname": "API_GATEWAY_DATABASE_NAME",
     "database.user": "API_GATEWAY_DATABASE_USER",
     "database.password": "API_GATEWAY_DATABASE_PASSWORD",
     "database.host": "API_GATEWAY_DATABASE_HOST",
     "database.port": "API_GATEWAY_DATABASE_PORT",
+    "database.create_schema": "API_GATEWAY_DATABASE_CREATE_SCHEMA",
+    "database.timeout": "API_GATEWAY_DATABASE_TIMEOUT",
     "discovery.host": "API_GATEWAY_DISCOVERY_HOST",
     "discovery.port": "API_GATEWAY_DISCOVERY_PORT",
+    "discovery.mode": "API_GATEWAY_DISCOVERY_MODE",
+    "discovery.interval": "API_GATEWAY_DISCOVERY_INTERVAL",
+    "upstream.protocol": "API_GATEWAY_UPSTREAM_PROTOCOL",
+    "upstream.dns_ttl": "API_GATEWAY_UPSTREAM_DNS_TTL",
+    "upstream.retries": "API_GATEWAY_UPSTREAM_RETRIES",
+    "upstream.retry_backoff": "API_GATEWAY_UPSTREAM_RETRY_BACKOFF",
+    "rules.poll_interval": "API_GATEWAY_RULES_POLL_INTERVAL",
+    "rules.listen": "API_GATEWAY_RULES_LISTEN",
+    "rules.cache_size": "API_GATEWAY_RULES_CACHE_SIZE",
+    "rules.import_max_size": "API_GATEWAY_RULES_IMPORT_MAX_SIZE",
 }
 
 _PARAMETERIZED_MAPPER = {
@@ -55,29 +94,133 @@ _PARAMETERIZED_MAPPER = {
     "rest.auth.host": "api_gateway_rest_auth_host",
     "rest.auth.port": "api_gateway_rest_auth_port",
     "rest.auth.path": "api_gateway_rest_auth_path",
-    "database.database": "api_gateway_database_name",
+    "rest.auth.jwt.enabled": "api_gateway_rest_auth_jwt_enabled",
+    "rest.access_log.enabled": "api_gateway_rest_access_log_enabled",
+    "rest.access_log.sample_rate": "api_gateway_rest_access_log_sample_rate",
+    "rest.body.max_size": "api_gateway_rest_body_max_size",
+    "rest.body.spool_threshold": "api_gateway_rest_body_spool_threshold",
+    "database.backend": "api_gateway_database_backend",
+    "database.path": "api_gateway_database_path",
+    "database.dbname": "api_gateway_database_name",
     "database.user": "api_gateway_database_user",
     "database.password": "api_gateway_database_password",
     "database.host": "api_gateway_database_host",
     "database.port": "api_gateway_database_port",
+    "database.create_schema": "api_gateway_database_create_schema",
+    "database.timeout": "api_gateway_database_timeout",
     "discovery.host": "api_gateway_discovery_host",
     "discovery.port": "api_gateway_discovery_port",
+    "discovery.mode": "api_gateway_discovery_mode",
+    "discovery.interval": "api_gateway_discovery_interval",
+    "upstream.protocol": "api_gateway_upstream_protocol",
+    "upstream.dns_ttl": "api_gateway_upstream_dns_ttl",
+    "upstream.retries": "api_gateway_upstream_retries",
+    "upstream.retry_backoff": "api_gateway_upstream_retry_backoff",
+    "rules.poll_interval": "api_gateway_rules_poll_interval",
+    "rules.listen": "api_gateway_rules_listen",
+    "rules.cache_size": "api_gateway_rules_cache_size",
+    "rules.import_max_size": "api_gateway_rules_import_max_size",
 }
 
 
 class ApiGatewayConfig(abc.ABC):
-    """Api Gateway config class."""
+    """Api Gateway config class.
 
-    __slots__ = ("_services", "_path", "_data", "_with_environment", "_parameterized")
+    The file, the environment variables and the named arguments are resolved and validated once, when the instance is
+    built, into an immutable ``CONFIG`` snapshot, so reading the config while handling requests is only an attribute
+    access.
+    """
+
+    __slots__ = ("_path", "_data", "_with_environment", "_parameterized", "_snapshot")
 
     def __init__(self, path: t.Union[Path, str], with_environment: bool = True, **kwargs):
         if isinstance(path, Path):
             path = str(path)
-        self._services = {}
         self._path = path
         self._load(path)
         self._with_environment = with_environment
         self._parameterized = kwargs
+        self._snapshot = self._resolve()
+
+    def _resolve(self) -> CONFIG:
+        try:
+            return CONFIG(
+                rest=self._rest,
+                database=self._database,
+                discovery=self._discovery,
+                upstream=self._upstream,
+                headers=self._headers,
+                rules=self._rules,
+            )
+        except KeyError as exc:
+            raise ApiGatewayConfigException(f"The {exc.args[0]!r} config key is missing.")
+        except (TypeError, ValueError) as exc:
+            raise ApiGatewayConfigException(f"The config is not valid: {exc}")
+
+    @property
+    def snapshot(self) -> CONFIG:
+        """Get the resolved config.
+
+        :return: A ``CONFIG`` NamedTuple instance.
+        """
+        return self._snapshot
+
+    def reload(self) -> "ApiGatewayConfig":
+        """Build a new config from the same file, environment and named arguments.
+
+        The current instance is left untouched, so it can still be used if the new config is not valid.
+
+        :return: A new ``ApiGatewayConfig`` instance.
+        """
+        return type(self)(self._path, with_environment=self._with_environment, **self._parameterized)
+
+    @property
+    def rest(self) -> REST:
+        """Get the rest config.
+
+        :return: A ``REST`` NamedTuple instance.
+        """
+        return self._snapshot.rest
+
+    @property
+    def database(self) -> DATABASE:
+        """Get the database config.
+
+        :return: A ``DATABASE`` NamedTuple instance.
+        """
+        return self._snapshot.database
+
+    @property
+    def discovery(self) -> DISCOVERY:
+        """Get the discovery config.
+
+        :return: A ``DISCOVERY`` NamedTuple instance.
+        """
+        return self._snapshot.discovery
+
+    @property
+    def upstream(self) -> UPSTREAM:
+        """Get the upstream config.
+
+        :return: A ``UPSTREAM`` NamedTuple instance.
+        """
+        return self._snapshot.upstream
+
+    @property
+    def headers(self) -> HEADERS:
+        """Get the forwarded headers config.
+
+        :return: A ``HEADERS`` NamedTuple instance.
+        """
+        return self._snapshot.headers
+
+    @property
+    def rules(self) -> RULES:
+        """Get the rules config.
+
+        :return: A ``RULES`` NamedTuple instance.
+        """
+        return self._snapshot.rules
 
     @staticmethod
     def _file_exit(path: str) -> bool:
@@ -88,7 +231,10 @@ class ApiGatewayConfig(abc.ABC):
     def _load(self, path):
         if self._file_exit(path):
             with open(path) as f:
-                self._data = yaml.load(f, Loader=yaml.FullLoader)
+                try:
+                    self._data = yaml.load(f, Loader=yaml.FullLoader)
+                except yaml.YAMLError as exc:
+                    raise ApiGatewayConfigException(f"The {path!r} file is not valid: {exc}")
         else:
             raise ApiGatewayConfigException(f"Check if this path: {path} is correct")
 
@@ -98,7 +244,7 @@ class ApiGatewayConfig(abc.ABC):
 
         if self._with_environment and key in _ENVIRONMENT_MAPPER and _ENVIRONMENT_MAPPER[key] in os.environ:
             if os.environ[_ENVIRONMENT_MAPPER[key]] in ["true", "True", "false", "False"]:
-                return bool(util.strtobool(os.environ[_ENVIRONMENT_MAPPER[key]]))
+                return os.environ[_ENVIRONMENT_MAPPER[key]] in ["true", "True"]
             return os.environ[_ENVIRONMENT_MAPPER[key]]
 
         def _fn(k: str, data: dict[str, t.Any]) -> t.Any:
@@ -110,20 +256,23 @@ class ApiGatewayConfig(abc.ABC):
 
             return _fn(following, part)
 
-        return _fn(key, self._data)
+        try:
+            return _fn(key, self._data)
+        except (KeyError, TypeError):
+            if "default" in kwargs:
+                return kwargs["default"]
+            raise KeyError(key)
 
     @property
-    def rest(self) -> REST:
-        """Get the rest config.
-
-        :return: A ``REST`` NamedTuple instance.
-        """
+    def _rest(self) -> REST:
         return REST(
             host=self._get("rest.host"),
             port=int(self._get("rest.port")),
             cors=self._cors,
             auth=self._auth,
             admin=self._admin,
+            access_log=self._access_log,
+            body=self._body,
         )
 
     @property
@@ -142,25 +291,77 @@ class ApiGatewayConfig(abc.ABC):
         """
         return REST_ADMIN(username=self._get("rest.admin.username"), password=self._get("rest.admin.password"))
 
+    @property
+    def _access_log(self) -> ACCESS_LOG:
+        """Get the access log config.
+
+        :return: A ``ACCESS_LOG`` NamedTuple instance.
+        """
+        return ACCESS_LOG(
+            enabled=self._get("rest.access_log.enabled", default=False),
+            sample_rate=float(self._get("rest.access_log.sample_rate", default=1.0)),
+        )
+
+    @property
+    def _body(self) -> BODY:
+        """Get the request body config.
+
+        :return: A ``BODY`` NamedTuple instance.
+        """
+        body = BODY(
+            max_size=int(self._get("rest.body.max_size", default=1024 ** 2)),
+            spool_threshold=int(self._get("rest.body.spool_threshold", default=1024 ** 2)),
+            services=tuple(
+                self._body_service_entry(service) for service in self._get("rest.body.services", default=[])
+            ),
+        )
+
+        for value in (body.max_size, body.spool_threshold, *(service.max_size for service in body.services)):
+            if value < 0:
+                raise ApiGatewayConfigException(f"The body sizes must be non-negative. Obtained: {value!r}")
+
+        return body
+
+    @staticmethod
+    def _body_service_entry(service: dict[str, Any]) -> BODY_SERVICE:
+        return BODY_SERVICE(name=service["name"], max_size=int(service["max_size"]))
+
     @property
     def _auth(self) -> t.Optional[AUTH]:
         try:
             services = self._auth_services
+            host = self._get("rest.auth.host")
+            port = int(self._get("rest.auth.port"))
+            path = self._get("rest.auth.path")
             return AUTH(
                 enabled=self._get("rest.auth.enabled"),
-                host=self._get("rest.auth.host"),
-                port=int(self._get("rest.auth.port")),
-                path=self._get("rest.auth.path"),
+                host=host,
+                port=port,
+                path=path,
                 services=services,
                 default=self._get("rest.auth.default"),
+                jwt=self._auth_jwt,
+                token_headers=tuple(self._get("rest.auth.token_headers", default=["Authorization", "Cookie"])),
+                url=URL.build(scheme="http", host=host, port=port, path=path),
             )
         except KeyError:
             return None
 
     @property
-    def _auth_services(self) -> list[AUTH_SERVICE]:
+    def _auth_jwt(self) -> JWT:
+        path = self._get("rest.auth.path")
+        return JWT(
+            enabled=self._get("rest.auth.jwt.enabled", default=False),
+            jwks_path=self._get("rest.auth.jwt.jwks_path", default=f"{path}/jwks"),
+            algorithms=tuple(self._get("rest.auth.jwt.algorithms", default=["RS256"])),
+            audience=self._get("rest.auth.jwt.audience", default=None),
+            refresh_interval=float(self._get("rest.auth.jwt.refresh_interval", default=300)),
+        )
+
+    @property
+    def _auth_services(self) -> tuple[AUTH_SERVICE, ...]:
         info = self._get("rest.auth.services")
-        services = [self._auth_service_entry(service) for service in info]
+        services = tuple(self._auth_service_entry(service) for service in info)
         return services
 
     @staticmethod
@@ -168,23 +369,118 @@ class ApiGatewayConfig(abc.ABC):
         return AUTH_SERVICE(name=service["name"],)
 
     @property
-    def database(self) -> DATABASE:
-        """Get the rest config.
+    def _database(self) -> DATABASE:
+        backend = self._get("database.backend", default="postgresql")
+        if backend not in _DATABASE_BACKENDS:
+            raise ApiGatewayConfigException(
+                f"The database backend must be one of {_DATABASE_BACKENDS!r}. Obtained: {backend!r}"
+            )
+
+        if backend != "postgresql":
+            # The embedded backends only need the path of the database, or of the rules file.
+            return DATABASE(
+                backend=backend,
+                path=self._get("database.path"),
+                dbname=None,
+                user=None,
+                password=None,
+                host=None,
+                port=None,
+                create_schema=self._get("database.create_schema", default=True),
+                timeout=float(self._get("database.timeout", default=30)),
+            )
 
-        :return: A ``REST`` NamedTuple instance.
-        """
         return DATABASE(
+            backend=backend,
+            path=None,
             dbname=self._get("database.dbname"),
             user=self._get("database.user"),
             password=self._get("database.password"),
             host=self._get("database.host"),
             port=int(self._get("database.port")),
+            create_schema=self._get("database.create_schema", default=True),
+            timeout=float(self._get("database.timeout", default=30)),
         )
 
     @property
-    def discovery(self) -> DISCOVERY:
-        """Get the rest config.
+    def _discovery(self) -> DISCOVERY:
+        mode = self._get("discovery.mode", default="pull")
+        if mode not in _DISCOVERY_MODES:
+            raise ApiGatewayConfigException(
+                f"The discovery mode must be one of {_DISCOVERY_MODES!r}. Obtained: {mode!r}"
+            )
 
-        :return: A ``REST`` NamedTuple instance.
-        """
-        return DISCOVERY(host=self._get("discovery.host"), port=int(self._get("discovery.port")))
+        host = self._get("discovery.host")
+        port = int(self._get("discovery.port"))
+        return DISCOVERY(
+            host=host,
+            port=port,
+            mode=mode,
+            interval=float(self._get("discovery.interval", default=30)),
+            url=URL.build(scheme="http", host=host, port=port),
+        )
+
+    @property
+    def _upstream(self) -> UPSTREAM:
+        protocol = self._get("upstream.protocol", default="http/1.1")
+        services = tuple(
+            self._upstream_service_entry(service) for service in self._get("upstream.services", default=[])
+        )
+
+        for value in (protocol, *(service.protocol for service in services)):
+            if value not in _UPSTREAM_PROTOCOLS:
+                raise ApiGatewayConfigException(
+                    f"The upstream protocol must be one of {_UPSTREAM_PROTOCOLS!r}. Obtained: {value!r}"
+                )
+
+        dns_ttl = self._get("upstream.dns_ttl", default=10)
+        if dns_ttl is not None:
+            dns_ttl = int(dns_ttl)
+
+        retries = int(self._get("upstream.retries", default=0))
+        if retries < 0:
+            raise ApiGatewayConfigException(f"The upstream retries must be non-negative. Obtained: {retries!r}")
+
+        return UPSTREAM(
+            protocol=protocol,
+            dns_ttl=dns_ttl,
+            retries=retries,
+            retry_backoff=float(self._get("upstream.retry_backoff", default=0.1)),
+            services=services,
+        )
+
+    @staticmethod
+    def _upstream_service_entry(service: dict[str, Any]) -> UPSTREAM_SERVICE:
+        return UPSTREAM_SERVICE(
+            name=service["name"], protocol=service.get("protocol", "http/1.1"), socket=service.get("socket"),
+        )
+
+    @property
+    def _headers(self) -> HEADERS:
+        allow = self._get("headers.allow", default=None)
+        return HEADERS(
+            forwarded=self._get("headers.forwarded", default=True),
+            allow=None if allow is None else tuple(allow),
+            deny=tuple(self._get("headers.deny", default=[])),
+            services=tuple(
+                self._headers_service_entry(service) for service in self._get("headers.services", default=[])
+            ),
+        )
+
+    @staticmethod
+    def _headers_service_entry(service: dict[str, Any]) -> HEADERS_SERVICE:
+        return HEADERS_SERVICE(
+            name=service["name"],
+            set_headers=MappingProxyType(dict(service.get("set", dict()))),
+            remove=tuple(service.get("remove", list())),
+        )
+
+    @property
+    def _rules(self) -> RULES:
+        return RULES(
+            poll_interval=float(self._get("rules.poll_interval", default=5)),
+            listen=self._get("rules.listen", default=True),
+            cache_size=int(self._get("rules.cache_size", default=10000)),
+            # The rule imports are not bound by the body limits, as a large rule set is expected to be imported.
+            import_max_size=int(self._get("rules.import_max_size", default=64 * 1024 ** 2)),
+        )
@@ -0,0 +1,152 @@
+import logging
+from pathlib import (
+    Path,
+)
+from typing import (
+    Any,
+    Union,
+)
+
+import yaml
+from sqlalchemy import (
+    create_engine,
+)
+from sqlalchemy.engine import (
+    Engine,
+)
+from sqlalchemy.pool import (
+    StaticPool,
+)
+
+from ..config import (
+    DATABASE,
+)
+from ..exceptions import (
+    ApiGatewayConfigException,
+)
+from .migrations import (
+    build_engine,
+    migrate,
+)
+from .repository import (
+    ReadOnlyRepository,
+    Repository,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RuleBackend:
+    """Storage of the rules, which builds the repositories used to access them.
+
+    The rules are stored in a database reached through ``engine``: PostgreSQL, or an embedded SQLite database.
+    """
+
+    read_only = False
+
+    def __init__(self, engine: Engine, create_schema: bool = True):
+        self.engine = engine
+        self.create_schema = create_schema
+
+    def repository(self) -> Repository:
+        """Build a repository to access the rules.
+
+        :return: A ``Repository`` instance.
+        """
+        return Repository(self.engine)
+
+    def migrate(self) -> None:
+        """Create the missing database tables and upgrade the existing ones to the current schema.
+
+        :return: This method does not return anything.
+        """
+        migrate(self.engine)
+
+    def setup(self) -> None:
+        """Prepare the storage to be used, migrating it if the schema creation is enabled.
+
+        :return: This method does not return anything.
+        """
+        if self.create_schema:
+            self.migrate()
+
+    def dispose(self) -> None:
+        """Close the database connections.
+
+        :return: This method does not return anything.
+        """
+        self.engine.dispose()
+
+
+class FileRuleBackend(RuleBackend):
+    """Read-only rules, loaded from a YAML file into an in-memory database.
+
+    The file has an ``auth_rules`` and an ``autz_rules`` list, whose entries are written as the ones accepted by the
+    bulk imports. The in-memory database is only used by the admin listings and exports, as the rules are checked
+    against the rule index, so the file backend does not add any query to the requests.
+    """
+
+    read_only = True
+
+    def __init__(self, path: Union[Path, str]):
+        # The in-memory database only lives as long as its connection, so a single one is shared by every thread.
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        super().__init__(engine, create_schema=True)
+        self.path = Path(path)
+
+    def repository(self) -> Repository:
+        """Build a repository to access the rules, which cannot be changed.
+
+        :return: A ``ReadOnlyRepository`` instance.
+        """
+        return ReadOnlyRepository(self.engine)
+
+    def migrate(self) -> None:
+        """Create the in-memory database tables and load the rules from the file.
+
+        :return: This method does not return anything.
+        """
+        super().migrate()
+        content = self._read()
+
+        repository = Repository(self.engine)
+        try:
+            auth = repository.import_auth_rules(content.get("auth_rules") or list())
+            autz = repository.import_autz_rules(content.get("autz_rules") or list())
+        except ValueError as exc:
+            raise ApiGatewayConfigException(f"The {str(self.path)!r} rules file is not valid: {exc}")
+        finally:
+            repository.close()
+
+        logger.info(
+            "Loaded %d authentication and %d authorization rules from %r.",
+            len(auth.created),
+            len(autz.created),
+            str(self.path),
+        )
+
+    def _read(self) -> dict[str, Any]:
+        try:
+            with self.path.open() as file:
+                content = yaml.safe_load(file)
+        except OSError as exc:
+            raise ApiGatewayConfigException(f"The {str(self.path)!r} rules file cannot be read: {exc}")
+        except yaml.YAMLError as exc:
+            raise ApiGatewayConfigException(f"The {str(self.path)!r} rules file is not valid: {exc}")
+
+        if content is None:
+            return dict()
+        if not isinstance(content, dict):
+            raise ApiGatewayConfigException(f"The {str(self.path)!r} rules file must be a mapping.")
+        return content
+
+
+def build_backend(database: DATABASE) -> RuleBackend:
+    """Build the rules backend selected by the database config.
+
+    :param database: The database config.
+    :return: A ``RuleBackend`` instance.
+    """
+    if database.backend == "file":
+        return FileRuleBackend(database.path)
+    return RuleBackend(build_engine(database), create_schema=database.create_schema)
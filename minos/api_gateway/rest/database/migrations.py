@@ -0,0 +1,175 @@
+import json
+import logging
+from typing import (
+    Iterable,
+    Optional,
+)
+
+from sqlalchemy import (
+    JSON,
+    Table,
+    create_engine,
+    event,
+    insert,
+    inspect,
+    select,
+    text,
+)
+from sqlalchemy.dialects.postgresql import (
+    JSONB,
+)
+from sqlalchemy.engine import (
+    Connection,
+    Engine,
+)
+
+from ..config import (
+    DATABASE,
+)
+from .models import (
+    AuthRule,
+    AutzRule,
+    Base,
+    RuleSet,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def build_engine(database: DATABASE) -> Engine:
+    """Build the engine used to connect to the database.
+
+    :param database: The database config.
+    :return: An ``Engine`` instance.
+    """
+    if database.backend == "sqlite":
+        # The connections are used from the worker threads too, but never by two threads at once.
+        engine = create_engine(
+            f"sqlite:///{database.path}", connect_args={"timeout": database.timeout, "check_same_thread": False}
+        )
+        event.listen(engine, "connect", _configure_sqlite)
+        return engine
+
+    uri = (
+        f"postgresql+psycopg2://{database.user}:{database.password}@"
+        f"{database.host}:{database.port}/{database.dbname}"
+    )
+    # Bound the connection attempts, so an unreachable database cannot block the startup forever.
+    return create_engine(uri, connect_args={"connect_timeout": max(1, int(database.timeout))})
+
+
+def _configure_sqlite(dbapi_connection, connection_record) -> None:
+    # With the write-ahead log the readers do not block the writer, nor the other way around.
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+    finally:
+        cursor.close()
+
+
+def migrate(engine: Engine) -> None:
+    """Create the missing database tables and upgrade the existing ones to the current schema.
+
+    The changes are applied in a single transaction, so a failed upgrade leaves the database untouched.
+
+    :param engine: The engine connected to the database.
+    :return: This method does not return anything.
+    """
+    with engine.begin() as connection:
+        Base.metadata.create_all(connection)
+        if connection.execute(select(RuleSet.id).where(RuleSet.id == 1)).scalar() is None:
+            connection.execute(insert(RuleSet).values(id=1, version=0))
+        if connection.dialect.name == "postgresql":
+            for table in (AuthRule.__table__, AutzRule.__table__):
+                _upgrade_rules_table(connection, table)
+
+
+def _upgrade_rules_table(connection: Connection, table: Table) -> None:
+    """Upgrade a rules table created by a previous version.
+
+    Those tables were keyed by ``(service, rule)`` (plus ``id`` in the authorization rules), with ids taken from a
+    sequence shared by both tables, and stored the lists as plain ``JSON``.
+    """
+    inspector = inspect(connection)
+    name = table.name
+
+    primary_key = inspector.get_pk_constraint(name)
+    if primary_key["constrained_columns"] != ["id"]:
+        logger.info("Upgrading the %r table keys...", name)
+        sequence = f"{name}_id_seq"
+        _merge_duplicated_rules(connection, name)
+        for statement in (
+            f"CREATE SEQUENCE IF NOT EXISTS {sequence}",
+            f"SELECT setval('{sequence}', COALESCE((SELECT max(id) FROM {name}), 0) + 1, false)",
+            f"ALTER SEQUENCE {sequence} OWNED BY {name}.id",
+            f"ALTER TABLE {name} ALTER COLUMN id SET DEFAULT nextval('{sequence}')",
+            f"ALTER TABLE {name} DROP CONSTRAINT {primary_key['name']}",
+            f"ALTER TABLE {name} ADD PRIMARY KEY (id)",
+            f"ALTER TABLE {name} ADD CONSTRAINT uq_{name}_service_rule UNIQUE (service, rule)",
+        ):
+            connection.execute(text(statement))
+
+    columns = inspector.get_columns(name)
+    if next(column["default"] for column in columns if column["name"] == "id") is None:
+        # The sequence is also the default of the column, so the rows inserted by other clients get an id too.
+        sequence = f"{name}_id_seq"
+        connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {name}.id"))
+        connection.execute(text(f"ALTER TABLE {name} ALTER COLUMN id SET DEFAULT nextval('{sequence}')"))
+
+    for column in columns:
+        if isinstance(column["type"], JSON) and not isinstance(column["type"], JSONB):
+            logger.info("Upgrading the %r column of the %r table to JSONB...", column["name"], name)
+            connection.execute(
+                text(f"ALTER TABLE {name} ALTER COLUMN {column['name']} TYPE JSONB USING {column['name']}::jsonb")
+            )
+
+    for index in table.indexes:
+        index.create(connection, checkfirst=True)
+
+
+def _merge_duplicated_rules(connection: Connection, name: str) -> None:
+    """Merge the rules sharing the same ``(service, rule)`` pair into the most recent one, so the pair can be unique.
+
+    The merged rule allows the union of the roles and the methods of the duplicated ones, which keeps the access
+    decisions unchanged, as they already combine every rule of an url.
+    """
+    duplicated = f"SELECT service, rule FROM {name} GROUP BY service, rule HAVING count(*) > 1"
+    rows = connection.execute(
+        text(f"SELECT * FROM {name} WHERE (service, rule) IN ({duplicated}) ORDER BY service, rule, id")
+    ).mappings()
+
+    groups = dict()
+    for row in rows:
+        groups.setdefault((row["service"], row["rule"]), list()).append(row)
+
+    for (service, rule), group in groups.items():
+        kept = group[-1]
+        values = {field: _merge_lists(row[field] for row in group) for field in ("roles", "methods") if field in kept}
+        for row in group[:-1]:
+            logger.warning(
+                "Merging the %r rule %r into the rule %r, as they have the same service and rule: %r",
+                name,
+                dict(row),
+                kept["id"],
+                values,
+            )
+        assignments = ", ".join(f"{field} = :{field}" for field in values)
+        parameters = {field: None if value is None else json.dumps(value) for field, value in values.items()}
+        connection.execute(text(f"UPDATE {name} SET {assignments} WHERE id = :id"), {**parameters, "id": kept["id"]})
+        connection.execute(
+            text(f"DELETE FROM {name} WHERE service = :service AND rule = :rule AND id <> :id"),
+            {"service": service, "rule": rule, "id": kept["id"]},
+        )
+
+
+def _merge_lists(values: Iterable[Optional[list]]) -> Optional[list]:
+    # A missing list means that anything is allowed, so it absorbs the rest of them.
+    merged = list()
+    for value in values:
+        if value is None:
+            return None
+        for item in value if isinstance(value, list) else [value]:
+            if item not in merged:
+                merged.append(item)
+    return merged
@@ -1,24 +1,45 @@
 from sqlalchemy import (
     JSON,
     TIMESTAMP,
+    BigInteger,
     Column,
+    Index,
     Integer,
     Sequence,
     String,
+    UniqueConstraint,
+)
+from sqlalchemy.dialects.postgresql import (
+    JSONB,
 )
 from sqlalchemy.ext.declarative import (
     declarative_base,
 )
 
+from ..urlmatch.roles import (
+    RoleSet,
+)
+
 Base = declarative_base()
 
+# Binary JSON on PostgreSQL, so the lists can be indexed and searched with containment operators.
+JSON_LIST = JSON().with_variant(JSONB(), "postgresql")
+
+AUTH_RULES_ID = Sequence("auth_rules_id_seq")
+AUTZ_RULES_ID = Sequence("autz_rules_id_seq")
+
 
 class AuthRule(Base):
     __tablename__ = "auth_rules"
-    id = Column(Integer, Sequence("item_id_seq"), nullable=False)
-    service = Column(String, primary_key=True, nullable=False)
-    rule = Column(String, primary_key=True, nullable=False)
-    methods = Column(JSON)
+    __table_args__ = (
+        UniqueConstraint("service", "rule", name="uq_auth_rules_service_rule"),
+        Index("ix_auth_rules_service", "service"),
+        Index("ix_auth_rules_methods", "methods", postgresql_using="gin"),
+    )
+    id = Column(Integer, AUTH_RULES_ID, primary_key=True)
+    service = Column(String, nullable=False)
+    rule = Column(String, nullable=False)
+    methods = Column(JSON_LIST)
     created_at = Column(TIMESTAMP)
     updated_at = Column(TIMESTAMP)
 
@@ -42,6 +63,10 @@ class AuthRule(Base):
 
 
 class AuthRuleDTO:
+    """Authentication rule as loaded to be checked, built from a model or from a row with the same fields."""
+
+    __slots__ = ("id", "service", "rule", "methods", "created_at", "updated_at")
+
     id: int
     service: str
     rule: str
@@ -57,14 +82,30 @@ class AuthRuleDTO:
         self.created_at = str(model.created_at)
         self.updated_at = str(model.updated_at)
 
+    def to_serializable_dict(self):
+        return {
+            "id": self.id,
+            "service": self.service,
+            "rule": self.rule,
+            "methods": self.methods,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
 
 class AutzRule(Base):
     __tablename__ = "autz_rules"
-    id = Column(Integer, Sequence("item_id_seq"), nullable=False, primary_key=True)
-    service = Column(String, primary_key=True, nullable=False)
-    rule = Column(String, primary_key=True, nullable=False)
-    roles = Column(JSON)
-    methods = Column(JSON)
+    __table_args__ = (
+        UniqueConstraint("service", "rule", name="uq_autz_rules_service_rule"),
+        Index("ix_autz_rules_service", "service"),
+        Index("ix_autz_rules_roles", "roles", postgresql_using="gin"),
+        Index("ix_autz_rules_methods", "methods", postgresql_using="gin"),
+    )
+    id = Column(Integer, AUTZ_RULES_ID, primary_key=True)
+    service = Column(String, nullable=False)
+    rule = Column(String, nullable=False)
+    roles = Column(JSON_LIST)
+    methods = Column(JSON_LIST)
     created_at = Column(TIMESTAMP)
     updated_at = Column(TIMESTAMP)
 
@@ -88,6 +129,10 @@ class AutzRule(Base):
 
 
 class AutzRuleDTO:
+    """Authorization rule as loaded to be checked, built from a model or from a row with the same fields."""
+
+    __slots__ = ("id", "service", "rule", "roles", "methods", "created_at", "updated_at", "role_set")
+
     id: int
     service: str
     rule: str
@@ -95,6 +140,7 @@ class AutzRuleDTO:
     methods: list
     created_at: str
     updated_at: str
+    role_set: RoleSet
 
     def __init__(self, model: AutzRule):
         self.id = model.id
@@ -104,3 +150,36 @@ class AutzRuleDTO:
         self.methods = model.methods
         self.created_at = str(model.created_at)
         self.updated_at = str(model.updated_at)
+        # Compiled once, as the rules are checked on every request.
+        self.role_set = RoleSet.from_roles(model.roles)
+
+    def to_serializable_dict(self):
+        return {
+            "id": self.id,
+            "service": self.service,
+            "rule": self.rule,
+            "roles": self.roles,
+            "methods": self.methods,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class RuleSet(Base):
+    """Single row table holding the version of the rules, bumped by every change."""
+
+    __tablename__ = "rule_set"
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(TIMESTAMP)
+
+
+class RuleChange(Base):
+    """The services whose rules have changed in every version, so the rules can be refreshed incrementally."""
+
+    __tablename__ = "rule_changes"
+    __table_args__ = (Index("ix_rule_changes_version", "version"),)
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False)
+    kind = Column(String, nullable=False)
+    service = Column(String, nullable=False)
@@ -1,17 +1,76 @@
+import base64
+import json
+from collections import (
+    namedtuple,
+)
+from datetime import (
+    datetime,
+)
+from typing import (
+    Any,
+    Iterable,
+    Optional,
+    Sequence,
+)
+
 from sqlalchemy import (
+    DateTime,
+    bindparam,
+    cast,
+    func,
+    insert,
+    literal,
     or_,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import (
+    JSONB,
 )
 from sqlalchemy.orm import (
     sessionmaker,
 )
 
+from ..exceptions import (
+    ReadOnlyRulesException,
+)
 from .models import (
     AuthRule,
     AuthRuleDTO,
     AutzRule,
     AutzRuleDTO,
+    RuleChange,
+    RuleSet,
 )
 
+AUTH_RULE_FIELDS = ("id", "service", "rule", "methods", "created_at", "updated_at")
+AUTZ_RULE_FIELDS = ("id", "service", "rule", "roles", "methods", "created_at", "updated_at")
+
+# Fields that can be used to sort the listings, which are always paired with ``id`` to get a total order.
+SORT_FIELDS = ("id", "service", "rule", "created_at", "updated_at")
+
+# Fields that can be set through the bulk imports, besides the ``(service, rule)`` key.
+AUTH_RULE_VALUES = ("methods",)
+AUTZ_RULE_VALUES = ("roles", "methods")
+
+# The maximum number of rows read or written by a single statement of a bulk import.
+IMPORT_BATCH_SIZE = 500
+
+# The kinds of rules, as recorded in the change feed.
+AUTH_RULES = "auth"
+AUTZ_RULES = "autz"
+
+# The channel notified (on PostgreSQL) every time the rules change, with the new version as payload.
+RULES_CHANNEL = "api_gateway_rules"
+
+# The number of versions whose changes are kept, so the instances that fall further behind reload all the rules.
+RETAINED_VERSIONS = 1000
+
+RulePage = namedtuple("RulePage", "records cursor total")
+RuleDiff = namedtuple("RuleDiff", "created updated deleted unchanged")
+RuleChanges = namedtuple("RuleChanges", "version changes")
+
 
 class Repository:
     def __init__(self, engine):
@@ -21,58 +80,410 @@ class Repository:
 
     def create_auth_rule(self, record: AuthRule):
         self.session.add(record)
+        self._changed(AUTH_RULES, {record.service})
         self.session.commit()
         return record.to_serializable_dict()
 
     def create_autz_rule(self, record: AutzRule):
         self.session.add(record)
+        self._changed(AUTZ_RULES, {record.service})
         self.session.commit()
         return record.to_serializable_dict()
 
     def get_auth_rules(self):
-        r = self.session.query(AuthRule).all()
-
-        records = list()
-        for record in r:
-            records.append(AuthRuleDTO(record).__dict__)
-        return records
+        return [AuthRuleDTO(row).to_serializable_dict() for row in self._rules_query(AuthRule)]
 
     def get_autz_rules(self):
-        r = self.session.query(AutzRule).all()
+        return [AutzRuleDTO(row).to_serializable_dict() for row in self._rules_query(AutzRule)]
+
+    def list_auth_rules(
+        self, fields: Optional[Sequence[str]] = None, method: Optional[str] = None, **kwargs
+    ) -> RulePage:
+        """Get a page of authentication rules, filtered, sorted and projected by the database.
+
+        :param fields: The fields to be retrieved. All of them by default.
+        :param method: Retrieve only the rules that apply to the given method.
+        :param kwargs: Additional named arguments, as described in ``_list_rules``.
+        :return: A ``RulePage`` instance.
+        """
+        query = self.session.query(AuthRule)
+        if method is not None:
+            query = self._contains_any(query, AuthRule.methods, method)
+        return self._list_rules(query, AuthRule, AUTH_RULE_FIELDS, fields, **kwargs)
+
+    def list_autz_rules(
+        self, fields: Optional[Sequence[str]] = None, method: Optional[str] = None, role: Optional[str] = None, **kwargs
+    ) -> RulePage:
+        """Get a page of authorization rules, filtered, sorted and projected by the database.
+
+        :param fields: The fields to be retrieved. All of them by default.
+        :param method: Retrieve only the rules that apply to the given method.
+        :param role: Retrieve only the rules that apply to the given role.
+        :param kwargs: Additional named arguments, as described in ``_list_rules``.
+        :return: A ``RulePage`` instance.
+        """
+        query = self.session.query(AutzRule)
+        if method is not None:
+            query = self._contains_any(query, AutzRule.methods, method)
+        if role is not None:
+            # Roles are usually stored as numbers, but they are received as strings.
+            roles = (int(role), role) if role.isascii() and role.isdigit() else (role,)
+            query = self._contains_any(query, AutzRule.roles, *roles)
+        return self._list_rules(query, AutzRule, AUTZ_RULE_FIELDS, fields, **kwargs)
+
+    def _list_rules(
+        self,
+        query,
+        model,
+        available: Sequence[str],
+        fields: Optional[Sequence[str]] = None,
+        service: Optional[str] = None,
+        rule: Optional[str] = None,
+        sort: str = "id",
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+        count: bool = False,
+    ) -> RulePage:
+        """Get a page of rules.
+
+        The pagination is based on the sort key of the last retrieved row (the cursor), instead of on an offset, so
+        every page is an index range scan no matter how deep it is.
+
+        :param query: The base query.
+        :param model: The rule model.
+        :param available: The fields of the rules.
+        :param fields: The fields to be retrieved. All the available ones by default.
+        :param service: Retrieve only the rules of the given service.
+        :param rule: Retrieve only the rules starting with the given prefix.
+        :param sort: The field used to sort the rules, prefixed by ``-`` to get the descending order.
+        :param after: The cursor returned with the previous page.
+        :param limit: The maximum number of rules to be retrieved. All of them by default.
+        :param count: If ``True``, the total number of rules that match the filters is also retrieved.
+        :return: A ``RulePage`` instance.
+        """
+        descending = sort.startswith("-")
+        sort_field = sort.lstrip("-")
+        if sort_field not in SORT_FIELDS:
+            raise ValueError(f"The rules cannot be sorted by {sort_field!r}. Use one of {SORT_FIELDS!r}.")
+        fields = available if fields is None else fields
+        for field in fields:
+            if field not in available:
+                raise ValueError(f"The rules do not have the {field!r} field. Use some of {available!r}.")
 
-        records = list()
-        for record in r:
-            records.append(AutzRuleDTO(record).__dict__)
-        return records
+        if service is not None:
+            query = query.filter(model.service == service)
+        if rule is not None:
+            escaped = rule.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            query = query.filter(model.rule.like(f"{escaped}%", escape="\\"))
+
+        total = None
+        if count:
+            total = query.with_entities(func.count(model.id)).scalar()
+
+        sort_column = getattr(model, sort_field)
+        key = tuple_(sort_column, model.id)
+        if after is not None:
+            cursor_sort, value, id_ = _decode_cursor(after)
+            if cursor_sort != sort:
+                raise ValueError("The cursor was obtained with a different sort order.")
+            # The value is bound with the column type, so it is compared as stored (SQLite stores timestamps as text).
+            bound = tuple_(literal(_cursor_value(sort_column, value), sort_column.type), literal(id_, model.id.type))
+            query = query.filter(key < bound if descending else key > bound)
+
+        columns = dict.fromkeys((*fields, sort_field, "id"))
+        query = query.with_entities(*(getattr(model, name) for name in columns))
+        query = query.order_by(*((column.desc() for column in key.clauses) if descending else key.clauses))
+        if limit is not None:
+            query = query.limit(limit)
+
+        rows = query.all()
+
+        cursor = None
+        if limit is not None and len(rows) == limit:
+            last = rows[-1]
+            value = getattr(last, sort_field)
+            cursor = _encode_cursor(sort, value.isoformat() if isinstance(value, datetime) else value, last.id)
+
+        records = [{field: _serialize(getattr(row, field)) for field in fields} for row in rows]
+        return RulePage(records, cursor, total)
+
+    def import_auth_rules(self, entries: Iterable[dict[str, Any]], dry_run: bool = False) -> RuleDiff:
+        """Create, update or delete authentication rules in bulk.
+
+        :param entries: The rules, as described in ``_import_rules``.
+        :param dry_run: If ``True``, the changes are computed but not applied.
+        :return: A ``RuleDiff`` instance.
+        """
+        return self._import_rules(AuthRule, AUTH_RULES, AUTH_RULE_VALUES, entries, dry_run)
+
+    def import_autz_rules(self, entries: Iterable[dict[str, Any]], dry_run: bool = False) -> RuleDiff:
+        """Create, update or delete authorization rules in bulk.
+
+        :param entries: The rules, as described in ``_import_rules``.
+        :param dry_run: If ``True``, the changes are computed but not applied.
+        :return: A ``RuleDiff`` instance.
+        """
+        return self._import_rules(AutzRule, AUTZ_RULES, AUTZ_RULE_VALUES, entries, dry_run)
+
+    def _import_rules(
+        self, model, kind: str, values: Sequence[str], entries: Iterable[dict[str, Any]], dry_run: bool
+    ) -> RuleDiff:
+        """Create, update or delete rules in bulk, in a single transaction.
+
+        Rules are identified by their ``(service, rule)`` pair, so the existing ones are updated instead of being
+        created again (upsert). Entries with ``"op": "delete"`` delete the rule instead. If the same rule is given more
+        than once, the last entry wins. The statements are executed in batches of ``IMPORT_BATCH_SIZE`` rows.
+
+        :param model: The rule model.
+        :param kind: The kind of rules, as recorded in the change feed.
+        :param values: The fields of the rules, besides ``service`` and ``rule``.
+        :param entries: The rules.
+        :param dry_run: If ``True``, the changes are computed but not applied.
+        :return: A ``RuleDiff`` instance.
+        """
+        upserts, deletes = dict(), set()
+        for index, entry in enumerate(entries):
+            key = _rule_key(index, entry)
+            op = entry.get("op", "upsert")
+            if op == "delete":
+                upserts.pop(key, None)
+                deletes.add(key)
+            elif op == "upsert":
+                upserts[key] = _rule_values(index, entry, values)
+                deletes.discard(key)
+            else:
+                raise ValueError(f"The entry {index} has an unknown {op!r} operation. Use 'upsert' or 'delete'.")
+
+        keys = [*upserts, *deletes]
+        columns = (model.id, model.service, model.rule, *(getattr(model, value) for value in values))
+        existing = dict()
+        for batch in _batches(keys):
+            for row in self.session.query(*columns).filter(tuple_(model.service, model.rule).in_(batch)):
+                existing[(row.service, row.rule)] = row
+
+        now = datetime.now()
+        created, updated, deleted, unchanged = list(), list(), list(), 0
+        inserts, updates, deleted_ids = list(), list(), list()
+        for (service, rule), new in upserts.items():
+            row = existing.get((service, rule))
+            if row is None:
+                inserts.append({"service": service, "rule": rule, **new, "created_at": now, "updated_at": now})
+                created.append({"service": service, "rule": rule, **new})
+                continue
+            old = {value: getattr(row, value) for value in values}
+            changes = {value: [old[value], new[value]] for value in values if old[value] != new[value]}
+            if changes:
+                updates.append({"_id": row.id, **new, "updated_at": now})
+                updated.append({"service": service, "rule": rule, "changes": changes})
+            else:
+                unchanged += 1
+        for service, rule in deletes:
+            row = existing.get((service, rule))
+            if row is not None:
+                deleted_ids.append(row.id)
+                deleted.append({"service": service, "rule": rule})
+
+        if not dry_run and (created or updated or deleted):
+            try:
+                for batch in _batches(inserts):
+                    self.session.execute(insert(model), batch)
+                for batch in _batches(updates):
+                    self.session.execute(update(model).where(model.id == bindparam("_id")), batch)
+                for batch in _batches(deleted_ids):
+                    self.session.query(model).filter(model.id.in_(batch)).delete(synchronize_session=False)
+                self._changed(kind, {entry["service"] for entry in (*created, *updated, *deleted)})
+                self.session.commit()
+            except BaseException:
+                self.session.rollback()
+                raise
+
+        return RuleDiff(created, updated, deleted, unchanged)
 
     def update_auth_rule(self, id: int, **kwargs):
-        self.session.query(AuthRule).filter(AuthRule.id == id).update(kwargs)
-        self.session.commit()
+        self._update_rule(AuthRule, AUTH_RULES, id, kwargs)
 
     def update_autz_rule(self, id: int, **kwargs):
-        self.session.query(AutzRule).filter(AutzRule.id == id).update(kwargs)
+        self._update_rule(AutzRule, AUTZ_RULES, id, kwargs)
+
+    def _update_rule(self, model, kind: str, id: int, values: dict[str, Any]) -> None:
+        service = self.session.query(model.service).filter(model.id == id).scalar()
+        if self.session.query(model).filter(model.id == id).update(values):
+            self._changed(kind, {service, values.get("service", service)})
         self.session.commit()
 
     def delete_auth_rule(self, id: int):
-        self.session.query(AuthRule).filter(AuthRule.id == id).delete()
-        self.session.commit()
+        self._delete_rule(AuthRule, AUTH_RULES, id)
 
     def delete_autz_rule(self, id: int):
-        self.session.query(AutzRule).filter(AutzRule.id == id).delete()
+        self._delete_rule(AutzRule, AUTZ_RULES, id)
+
+    def _delete_rule(self, model, kind: str, id: int) -> None:
+        service = self.session.query(model.service).filter(model.id == id).scalar()
+        if self.session.query(model).filter(model.id == id).delete():
+            self._changed(kind, {service})
         self.session.commit()
 
-    def get_auth_rule_by_service(self, service: str):
-        r = self.session.query(AuthRule).filter(or_(AuthRule.service == service, AuthRule.service == "*")).all()
+    def _changed(self, kind: str, services: Iterable[str]) -> None:
+        """Bump the rules version and record the changed services, in the transaction that changes them.
 
-        records = list()
-        for record in r:
-            records.append(AuthRuleDTO(record))
-        return records
+        The version row stays locked until the transaction ends, so the versions are committed in order.
+        """
+        self.session.execute(
+            update(RuleSet).where(RuleSet.id == 1).values(version=RuleSet.version + 1, updated_at=datetime.now())
+        )
+        version = self.get_rules_version()
+
+        self.session.execute(
+            insert(RuleChange), [{"version": version, "kind": kind, "service": service} for service in services]
+        )
+        self.session.query(RuleChange).filter(RuleChange.version <= version - RETAINED_VERSIONS).delete()
+        if self.engine.dialect.name == "postgresql":
+            self.session.execute(select(func.pg_notify(RULES_CHANNEL, str(version))))
+
+    def get_rules_version(self) -> int:
+        """Get the current version of the rules.
+
+        :return: The version number.
+        """
+        return self.session.query(RuleSet.version).filter(RuleSet.id == 1).scalar() or 0
+
+    def get_rule_changes(self, since: int) -> RuleChanges:
+        """Get the services whose rules have changed after the given version.
+
+        :param since: The last version known by the caller.
+        :return: A ``RuleChanges`` instance, whose ``changes`` are a set of ``(kind, service)`` pairs, or ``None`` if
+            the changes are not retained anymore, so all the rules must be reloaded.
+        """
+        version = self.get_rules_version()
+        if version == since:
+            return RuleChanges(version, frozenset())
+        if version < since:  # The rules have been recreated from scratch.
+            return RuleChanges(version, None)
+
+        rows = (
+            self.session.query(RuleChange.version, RuleChange.kind, RuleChange.service)
+            .filter(RuleChange.version > since, RuleChange.version <= version)
+            .all()
+        )
+        if not rows or min(row.version for row in rows) != since + 1:
+            return RuleChanges(version, None)
+        return RuleChanges(version, frozenset((row.kind, row.service) for row in rows))
+
+    def get_rules_of_services(self, kind: str, services: Optional[Iterable[str]] = None) -> list:
+        """Get the rules of the given services, or all of them.
+
+        :param kind: The kind of rules.
+        :param services: The services. All of them by default.
+        :return: A list of ``AuthRuleDTO`` or ``AutzRuleDTO`` instances.
+        """
+        model, dto = (AuthRule, AuthRuleDTO) if kind == AUTH_RULES else (AutzRule, AutzRuleDTO)
+        query = self._rules_query(model)
+        if services is not None:
+            query = query.filter(model.service.in_(tuple(services)))
+        return [dto(row) for row in query]
+
+    def _rules_query(self, model):
+        # The rules are read as plain rows rather than as tracked instances, as they are only used to build the DTOs.
+        fields = AUTH_RULE_FIELDS if model is AuthRule else AUTZ_RULE_FIELDS
+        return self.session.query(*(getattr(model, field) for field in fields))
+
+    def _contains_any(self, query, column, *values: Any):
+        # The wildcard rules and the ones without a list (either a SQL or a JSON null) apply to any value, so they are
+        # retrieved too.
+        values = (*values, "*")
+        if self.engine.dialect.name == "postgresql":
+            column = cast(column, JSONB)
+            matches = [column.contains([value]) for value in values]
+            return query.filter(or_(column.is_(None), func.jsonb_typeof(column) == "null", *matches))
+
+        elements = func.json_each(column).table_valued("value")
+        matches = select(elements.c.value).where(elements.c.value.in_(values)).exists()
+        return query.filter(or_(column.is_(None), func.json_type(column) == "null", matches))
+
+    def close(self) -> None:
+        """Release the database connection, if any."""
+        self.session.close()
+
+    def get_auth_rule_by_service(self, service: str):
+        query = self._rules_query(AuthRule).filter(AuthRule.service.in_((service, "*")))
+        return [AuthRuleDTO(row) for row in query]
 
     def get_autz_rule_by_service(self, service: str):
-        r = self.session.query(AutzRule).filter(or_(AutzRule.service == service, AutzRule.service == "*")).all()
+        query = self._rules_query(AutzRule).filter(AutzRule.service.in_((service, "*")))
+        return [AutzRuleDTO(row) for row in query]
+
+
+def _rule_key(index: int, entry: Any) -> tuple[str, str]:
+    if not isinstance(entry, dict):
+        raise ValueError(f"The entry {index} is not an object.")
+    service, rule = entry.get("service"), entry.get("rule")
+    if not isinstance(service, str) or not isinstance(rule, str):
+        raise ValueError(f"The entry {index} must have the 'service' and 'rule' strings.")
+    return service, rule
+
+
+def _rule_values(index: int, entry: dict[str, Any], values: Sequence[str]) -> dict[str, list]:
+    for value in values:
+        if not isinstance(entry.get(value), list):
+            raise ValueError(f"The entry {index} must have the {value!r} list.")
+    return {value: entry[value] for value in values}
+
+
+def _batches(items: Sequence[Any]) -> Iterable[Sequence[Any]]:
+    for start in range(0, len(items), IMPORT_BATCH_SIZE):
+        yield items[start : start + IMPORT_BATCH_SIZE]  # noqa pylint: disable=whitespace
+
+
+def _serialize(value: Any) -> Any:
+    if value is None or isinstance(value, (int, str, list, dict)):
+        return value
+    return str(value)
 
-        records = list()
-        for record in r:
-            records.append(AutzRuleDTO(record))
-        return records
+
+def _encode_cursor(sort: str, value: Any, id_: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([sort, value, id_]).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[str, Any, int]:
+    try:
+        sort, value, id_ = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("The cursor is not valid.")
+    return sort, value, int(id_)
+
+
+def _cursor_value(column, value: Any) -> Any:
+    if value is None or not isinstance(column.type, DateTime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        raise ValueError("The cursor is not valid.")
+
+
+class ReadOnlyRepository(Repository):
+    """Repository of rules that cannot be changed, as they are loaded from a file."""
+
+    def create_auth_rule(self, record: AuthRule):
+        raise ReadOnlyRulesException("The rules are read-only.")
+
+    def create_autz_rule(self, record: AutzRule):
+        raise ReadOnlyRulesException("The rules are read-only.")
+
+    def import_auth_rules(self, entries: Iterable[dict[str, Any]], dry_run: bool = False) -> RuleDiff:
+        raise ReadOnlyRulesException("The rules are read-only.")
+
+    def import_autz_rules(self, entries: Iterable[dict[str, Any]], dry_run: bool = False) -> RuleDiff:
+        raise ReadOnlyRulesException("The rules are read-only.")
+
+    def update_auth_rule(self, id: int, **kwargs):
+        raise ReadOnlyRulesException("The rules are read-only.")
+
+    def update_autz_rule(self, id: int, **kwargs):
+        raise ReadOnlyRulesException("The rules are read-only.")
+
+    def delete_auth_rule(self, id: int):
+        raise ReadOnlyRulesException("The rules are read-only.")
+
+    def delete_autz_rule(self, id: int):
+        raise ReadOnlyRulesException("The rules are read-only.")
@@ -0,0 +1,267 @@
+import asyncio
+import logging
+import re
+from typing import (
+    Any,
+    Optional,
+)
+
+from aiohttp import (
+    ClientError,
+    ClientSession,
+    web,
+)
+from yarl import (
+    URL,
+)
+
+logger = logging.getLogger(__name__)
+
+_ENDPOINT_PREFIX = "endpoint:"
+_PARAMETER = re.compile(r"{(\w+)(?::([^{}]+))?}")
+
+
+class EndpointTable:
+    """In-memory routing table of the endpoints exposed by the discovered microservices.
+
+    The table is built from the ``/endpoints`` response of the discovery service, which is a list of microservices
+    like ``{"name": ..., "address": ..., "port": ..., "status": ..., "endpoints": ["endpoint:GET:/order/{id}", ...]}``.
+
+    Path templates are compiled into a radix tree per verb, keyed by path segment, so the lookup cost depends on the
+    length of the path instead of on the number of endpoints. Tables are immutable once built, so updates are applied
+    by building a new table and swapping the reference.
+    """
+
+    def __init__(self, routes: Optional[dict[str, "_RouteNode"]] = None):
+        self._routes = dict() if routes is None else routes
+
+    @classmethod
+    def from_endpoints(cls, data: list[dict[str, Any]]) -> "EndpointTable":
+        """Build a new table from the discovery ``/endpoints`` response.
+
+        :param data: The list of discovered microservices.
+        :return: An ``EndpointTable`` instance.
+        """
+        routes = dict()
+        for microservice in data:
+            if not microservice.get("status", True):
+                continue
+            target = {
+                "name": microservice.get("name"),
+                "address": microservice["address"],
+                "port": int(microservice["port"]),
+                "status": True,
+            }
+            for endpoint in microservice.get("endpoints", list()):
+                verb, path = _parse_endpoint(endpoint)
+                if verb not in routes:
+                    routes[verb] = _RouteNode()
+                routes[verb].add(_split(path), target)
+        return cls(routes)
+
+    def __len__(self) -> int:
+        return sum(len(node) for node in self._routes.values())
+
+    def match(self, verb: str, path: str) -> Optional[tuple[dict[str, Any], dict[str, str]]]:
+        """Find the endpoint that matches the given verb and path.
+
+        :param verb: Endpoint Verb.
+        :param path: Endpoint url.
+        :return: A tuple containing the microservice connection data and the captured path parameters, or ``None`` if
+            there is no matching endpoint.
+        """
+        node = self._routes.get(verb)
+        if node is None:
+            return None
+        return node.match(_split(path), 0, dict())
+
+    def resolve(self, verb: str, path: str) -> Optional[dict[str, Any]]:
+        """Get the microservice connection data for the given endpoint.
+
+        :param verb: Endpoint Verb.
+        :param path: Endpoint url.
+        :return: The microservice connection data or ``None`` if there is no matching endpoint.
+        """
+        matched = self.match(verb, path)
+        if matched is None:
+            return None
+        return dict(matched[0])
+
+
+class _RouteNode:
+    """Node of the routing radix tree."""
+
+    __slots__ = ("static", "dynamic", "target")
+
+    def __init__(self):
+        self.static = dict()
+        self.dynamic = list()
+        self.target = None
+
+    def __len__(self) -> int:
+        count = int(self.target is not None)
+        count += sum(len(child) for child in self.static.values())
+        count += sum(len(child) for _, _, child in self.dynamic)
+        return count
+
+    def add(self, segments: list[str], target: dict[str, Any]) -> None:
+        node = self
+        for segment in segments:
+            if _PARAMETER.search(segment) is None:
+                node = node.static.setdefault(segment, _RouteNode())
+                continue
+
+            for key, _, child in node.dynamic:
+                if key == segment:
+                    node = child
+                    break
+            else:
+                child = _RouteNode()
+                node.dynamic.append((segment, _compile_segment(segment), child))
+                node = child
+
+        if node.target is None:  # The first registered endpoint wins.
+            node.target = target
+
+    def match(self, segments: list[str], index: int, params: dict[str, str]):
+        if index == len(segments):
+            if self.target is None:
+                return None
+            return self.target, params
+
+        segment = segments[index]
+        child = self.static.get(segment)
+        if child is not None:
+            matched = child.match(segments, index + 1, params)
+            if matched is not None:
+                return matched
+
+        for _, pattern, child in self.dynamic:
+            captured = pattern.fullmatch(segment)
+            if captured is None:
+                continue
+            matched = child.match(segments, index + 1, {**params, **captured.groupdict()})
+            if matched is not None:
+                return matched
+
+        return None
+
+
+def _split(path: str) -> list[str]:
+    return path.split("/")[1:]
+
+
+def _parse_endpoint(endpoint: str) -> tuple[str, str]:
+    if endpoint.startswith(_ENDPOINT_PREFIX):
+        endpoint = endpoint[len(_ENDPOINT_PREFIX) :]  # noqa pylint: disable=whitespace
+    verb, _, path = endpoint.partition(":")
+    return verb.upper(), path
+
+
+def _compile_segment(segment: str) -> re.Pattern:
+    regex = str()
+    position = 0
+    for match in _PARAMETER.finditer(segment):
+        regex += re.escape(segment[position : match.start()])  # noqa pylint: disable=whitespace
+        regex += f"(?P<{match.group(1)}>{match.group(2) or '[^/]+'})"
+        position = match.end()
+    regex += re.escape(segment[position:])
+    return re.compile(regex)
+
+
+class DiscoverySynchronizer:
+    """Keep a local copy of the discovery endpoint table.
+
+    The full table is fetched at startup and then re-synchronized every ``interval`` seconds, so that routes are
+    resolved locally instead of calling the discovery service on every request.
+    """
+
+    def __init__(self, host: str, port: int, interval: float = 30.0, path: str = "/endpoints"):
+        self.url = URL.build(scheme="http", host=host, port=port, path=path)
+        self.interval = interval
+
+        self._table = None
+        self._etag = None
+        self._task = None
+
+    @property
+    def ready(self) -> bool:
+        """Check if the endpoint table has been loaded at least once.
+
+        :return: ``True`` if the table is available or ``False`` otherwise.
+        """
+        return self._table is not None
+
+    @property
+    def table(self) -> Optional[EndpointTable]:
+        """Get the current endpoint table.
+
+        :return: An ``EndpointTable`` instance or ``None`` if it is not loaded yet.
+        """
+        return self._table
+
+    def resolve(self, verb: str, path: str) -> dict[str, Any]:
+        """Get the microservice connection data for the given endpoint.
+
+        :param verb: Endpoint Verb.
+        :param path: Endpoint url.
+        :return: The microservice connection data.
+        """
+        data = self._table.resolve(verb, path)
+        if data is None:
+            raise web.HTTPNotFound(text=f"The {path!r} path is not available for {verb!r} method.")
+        return data
+
+    async def synchronize(self) -> bool:
+        """Fetch the endpoint table from the discovery service and swap it if it has changed.
+
+        :return: ``True`` if the table has been updated or ``False`` otherwise.
+        """
+        headers = dict()
+        if self._etag is not None and self._table is not None:
+            headers["If-None-Match"] = self._etag
+
+        async with ClientSession() as session:
+            async with session.get(url=self.url, headers=headers) as response:
+                if response.status == 304:
+                    return False
+                response.raise_for_status()
+                data = await response.json()
+                etag = response.headers.get("ETag")
+
+        self._table = EndpointTable.from_endpoints(data)
+        self._etag = etag
+        logger.debug("Synchronized %d endpoints from the discovery service.", len(self._table))
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.synchronize()
+            except (ClientError, asyncio.TimeoutError) as exc:
+                logger.warning("Unable to synchronize the discovery endpoints: %r", exc)
+            except Exception:
+                # A malformed response must not stop the synchronization, so the previous table is kept.
+                logger.exception("Unable to synchronize the discovery endpoints.")
+
+    async def on_startup(self, app: web.Application) -> None:
+        """Load the table and start the periodic synchronization as an ``aiohttp`` startup signal."""
+        try:
+            await self.synchronize()
+        except (ClientError, asyncio.TimeoutError) as exc:
+            logger.warning("Unable to load the discovery endpoints, using per-request discovery meanwhile: %r", exc)
+        except Exception:
+            logger.exception("Unable to load the discovery endpoints, using per-request discovery meanwhile.")
+        self._task = asyncio.create_task(self._run())
+
+    async def on_cleanup(self, app: web.Application) -> None:
+        """Stop the periodic synchronization as an ``aiohttp`` cleanup signal."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
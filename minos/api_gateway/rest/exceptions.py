@@ -8,3 +8,7 @@ class NoTokenException(ApiGatewayException):
 
 class ApiGatewayConfigException(ApiGatewayException):
     """Base config exception."""
+
+
+class ReadOnlyRulesException(ApiGatewayException):
+    """Exception to be raised when the rules are changed but their backend is read-only."""
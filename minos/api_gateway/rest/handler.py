@@ -1,5 +1,8 @@
+import asyncio
+import functools
 import json
 import logging
+import re
 import secrets
 from datetime import (
     datetime,
@@ -7,14 +10,20 @@ from datetime import (
 from typing import (
     Any,
     Optional,
+    Union,
 )
 
 from aiohttp import (
     ClientConnectorError,
-    ClientResponse,
     ClientSession,
     web,
 )
+from multidict import (
+    CIMultiDict,
+)
+from sqlalchemy.exc import (
+    SQLAlchemyError,
+)
 from yarl import (
     URL,
 )
@@ -23,138 +32,153 @@ from minos.api_gateway.rest.database.models import (
     AuthRule,
     AutzRule,
 )
-from minos.api_gateway.rest.urlmatch.authmatch import (
-    AuthMatch,
-)
 
-from .database.repository import (
-    Repository,
+from .body import (
+    SpooledBody,
+)
+from .exceptions import (
+    ReadOnlyRulesException,
 )
-from .urlmatch.autzmatch import (
-    AutzMatch,
+from .upstream import (
+    clone_response,
+)
+from .urlmatch.decision import (
+    AuthDecision,
+    DecisionMatch,
+)
+from .urlmatch.target import (
+    RequestTarget,
+    has_encoded_slash,
 )
 
 logger = logging.getLogger(__name__)
 
+# The maximum number of rules retrieved by a single admin listing request.
+MAX_PAGE_SIZE = 1000
 
-async def orchestrate(request: web.Request) -> web.Response:
-    """ Orchestrate discovery and microservice call """
-    discovery_host = request.app["config"].discovery.host
-    discovery_port = request.app["config"].discovery.port
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
 
-    verb = request.method
-    url = f"/{request.match_info['endpoint']}"
+# An HTTP method is a token (RFC 7230), or the ``*`` wildcard, which is a token too.
+_METHOD = re.compile(r"[!#$%&'*+.^_`|~0-9A-Za-z-]+")
 
-    discovery_data = await discover(discovery_host, int(discovery_port), "/microservices", verb, url)
+# The numeric roles are stored as JSON numbers, which the databases keep as 64 bits integers.
+_MAX_NUMERIC_ROLE = 2 ** 63 - 1
 
-    auth = request.app["config"].rest.auth
+
+async def orchestrate(request: web.Request) -> web.StreamResponse:
+    """ Orchestrate discovery and microservice call """
+    verb = request.method
+    if has_encoded_slash(request.url):
+        return web.HTTPBadRequest(text="The request path cannot have encoded slashes.")
+    # The same target is authorized, routed and forwarded, so they cannot disagree about the service or the path.
+    target = RequestTarget.from_url(request.url)
+
+    state = request["state"]
+    config = state.config
+    synchronizer = state.discovery
+    if synchronizer is not None and synchronizer.ready:
+        discovery_data = synchronizer.resolve(verb, target.path)
+    else:
+        discovery = config.discovery
+        discovery_data = await discover(discovery.host, discovery.port, "/microservices", verb, target.path)
+
+    auth = config.rest.auth
     user = None
     if auth is not None and auth.enabled:
-        if await check_authentication(
-            request=request, service=request.url.parts[1], url=str(request.url), method=request.method
-        ):
-            response = await validate_token(request)
-            user = json.loads(response)
-            user = user["uuid"]
-
-        if await check_authorization(
-            request=request, service=request.url.parts[1], url=str(request.url), method=request.method
-        ):
-            response = await validate_token(request)
-            data = json.loads(response)
+        decision = await check_access(request=request, service=target.service, url=target.url, method=request.method)
+        if decision.authenticate:
+            data = await validate_token(request)
             user = data["uuid"]
-            role = data["role"]
-            if not await is_authorized_role(
-                request=request, role=role, service=request.url.parts[1], url=str(request.url), method=request.method
-            ):
+            if not decision.allows(data.get("role")):
                 return web.HTTPUnauthorized()
 
-    microservice_response = await call(**discovery_data, original_req=request, user=user)
+    microservice_response = await call(**discovery_data, original_req=request, user=user, target=target)
     return microservice_response
 
 
-async def check_authentication(request: web.Request, service: str, url: str, method: str) -> bool:
-    records = Repository(request.app["db_engine"]).get_auth_rule_by_service(service)
-    return AuthMatch.match(url=url, method=method, records=records)
-
-
-async def check_authorization(request: web.Request, service: str, url: str, method: str) -> bool:
-    records = Repository(request.app["db_engine"]).get_autz_rule_by_service(service)
-    return AuthMatch.match(url=url, method=method, records=records)
-
+async def check_access(request: web.Request, service: Optional[str], url: str, method: str) -> AuthDecision:
+    """Decide if the request needs a token and which roles are allowed, reading the rules of the service once."""
+    rules = request.app["rules"]
+    if rules.ready:
+        return rules.decide(service, url, method)
 
-async def is_authorized_role(request: web.Request, role: int, service: str, url: str, method: str) -> bool:
-    records = Repository(request.app["db_engine"]).get_autz_rule_by_service(service)
-    return AutzMatch.match(url=url, role=role, method=method, records=records)
+    repository = request.app["rules_backend"].repository()
+    auth_records = repository.get_auth_rule_by_service(service)
+    autz_records = repository.get_autz_rule_by_service(service)
+    return DecisionMatch.match(url=url, method=method, auth_records=auth_records, autz_records=autz_records)
 
 
-async def authentication_default(request: web.Request) -> web.Response:
+async def authentication_default(request: web.Request) -> web.StreamResponse:
     """ Orchestrate discovery and microservice call """
-    auth_host = request.app["config"].rest.auth.host
-    auth_port = request.app["config"].rest.auth.port
-    auth_path = request.app["config"].rest.auth.path
-    default_service = request.app["config"].rest.auth.default
+    auth = request["state"].config.rest.auth
+    if auth is None or not auth.enabled:
+        return await orchestrate(request)
 
-    url = URL(f"http://{auth_host}:{auth_port}{auth_path}/{default_service}")
+    url = auth.url / auth.default
 
     return await authentication_call(request, url)
 
 
-async def login_default(request: web.Request) -> web.Response:
+async def login_default(request: web.Request) -> web.StreamResponse:
     """ Orchestrate discovery and microservice call """
-    auth_host = request.app["config"].rest.auth.host
-    auth_port = request.app["config"].rest.auth.port
-    auth_path = request.app["config"].rest.auth.path
-    default_service = request.app["config"].rest.auth.default
+    auth = request["state"].config.rest.auth
+    if auth is None or not auth.enabled:
+        return await orchestrate(request)
 
-    url = URL(f"http://{auth_host}:{auth_port}{auth_path}/{default_service}/login")
+    url = auth.url / auth.default / "login"
 
     return await authentication_call(request, url)
 
 
-async def authentication(request: web.Request) -> web.Response:
+async def authentication(request: web.Request) -> web.StreamResponse:
     """ Orchestrate discovery and microservice call """
+    auth = request["state"].config.rest.auth
+    services = set() if auth is None or not auth.enabled else {service.name for service in auth.services}
+    if request.match_info["service"] not in services:
+        return await orchestrate(request)
 
-    auth_host = request.app["config"].rest.auth.host
-    auth_port = request.app["config"].rest.auth.port
-
-    url = URL(f"http://{auth_host}:{auth_port}{request.path}")
+    url = auth.url.with_path(request.path)
 
     return await authentication_call(request, url)
 
 
 async def authentication_call(request: web.Request, url: URL) -> web.Response:
     """ Orchestrate discovery and microservice call """
-    headers = request.headers.copy()
+    headers = request["state"].headers.request_headers(request)
     data = await request.read()
 
     try:
-        async with ClientSession() as session:
+        async with ClientSession(auto_decompress=False) as session:
             async with session.request(headers=headers, method=request.method, url=url, data=data) as response:
-                return await _clone_response(response)
+                return await clone_response(response)
     except ClientConnectorError:
         raise web.HTTPServiceUnavailable(text="The requested endpoint is not available.")
 
 
-async def validate_token(request: web.Request):
-    """ Orchestrate discovery and microservice call """
-    auth_host = request.app["config"].rest.auth.host
-    auth_port = request.app["config"].rest.auth.port
-    auth_path = request.app["config"].rest.auth.path
+async def validate_token(request: web.Request) -> dict[str, Any]:
+    """ Validate the request token, locally if possible or against the authentication service otherwise """
+    verifier = request["state"].token_verifier
+    if verifier is not None:
+        data = await verifier.verify_request(request)
+        if data is not None:
+            return data
 
-    auth_url = URL(f"http://{auth_host}:{auth_port}{auth_path}/validate-token")
+    auth = request["state"].config.rest.auth
 
-    headers = request.headers.copy()
-    data = await request.read()
+    auth_url = auth.url / "validate-token"
+
+    # Only the credentials are needed to validate the token, so the body is left for the upstream call.
+    headers = CIMultiDict()
+    for name in auth.token_headers:
+        for value in request.headers.getall(name, ()):
+            headers.add(name, value)
 
     try:
         async with ClientSession() as session:
-            async with session.request(method="POST", url=auth_url, data=data, headers=headers) as response:
-                resp = await _clone_response(response)
-
+            async with session.request(method="POST", url=auth_url, headers=headers) as response:
                 if not response.ok:
                     raise web.HTTPUnauthorized(text="The given request does not have authorization to be forwarded.")
-                return resp.text
+                return json.loads(await response.read())
 
     except ClientConnectorError:
         raise web.HTTPServiceUnavailable(text="The requested endpoint is not available.")
@@ -190,51 +214,82 @@ async def discover(host: str, port: int, path: str, verb: str, endpoint: str) ->
 
 
 # noinspection PyUnusedLocal
-async def call(address: str, port: int, original_req: web.Request, user: Optional[str], **kwargs) -> web.Response:
+async def call(
+    address: str,
+    port: int,
+    original_req: web.Request,
+    user: Optional[str],
+    target: Optional[RequestTarget] = None,
+    **kwargs,
+) -> web.StreamResponse:
     """Call microservice (redirect the original call)
 
-    :param address: The ip of the microservices.
+    :param address: The ip of the microservices, or a ``unix:<path>`` Unix domain socket address.
     :param port: The port of the microservice.
     :param original_req: The original request.
     :param kwargs: Additional named arguments.
     :param user: User that makes the request
+    :param target: The normalized target of the original request, which is built from it if not given.
     :return: The web response to be retrieved to the client.
     """
 
-    headers = original_req.headers.copy()
+    state = original_req["state"]
+    upstream = state.upstream
+    if target is None:
+        target = RequestTarget.from_url(original_req.url)
+    service = target.service
+
+    headers = state.headers.request_headers(original_req, service)
     if user is not None:
         headers["X-User"] = user
     else:  # Enforce that the 'User' entry is only generated by the auth system.
         # noinspection PyTypeChecker
-        headers.pop("X-User", None)
+        headers.popall("X-User", None)
 
-    url = original_req.url.with_scheme("http").with_host(address).with_port(port)
-    method = original_req.method
-    data = await original_req.read()
+    socket = upstream.socket_for(service, address)
 
-    logger.info(f"Redirecting {method!r} request to {url!r}...")
+    if socket is None:
+        url = _forwarded_url(original_req, target, address, port)
+    else:  # The host is only used to build the ``Host`` header when connecting through a Unix domain socket.
+        url = _forwarded_url(original_req, target, "localhost", None)
+    method = original_req.method
+    if not original_req.body_exists:
+        data = None
+    elif original_req.content_length is None or upstream.replayable(service, method):
+        # Bodies without a declared length are buffered to enforce the size limit and to send a sized body, and so
+        # are bodies that may have to be sent again, which can then be replayed without reading the client again.
+        data = await state.body.spool(original_req, service)
+        headers["Content-Length"] = str(data.size)
+    else:
+        # The inbound stream is forwarded as is, so the body is never buffered by the gateway.
+        data = original_req.content
+        headers["Content-Length"] = str(original_req.content_length)
+
+    logger.debug("Redirecting %r request to %r...", method, url)
 
     try:
-        async with ClientSession() as session:
-            async with session.request(headers=headers, method=method, url=url, data=data) as response:
-                return await _clone_response(response)
-    except ClientConnectorError:
-        raise web.HTTPServiceUnavailable(text="The requested endpoint is not available.")
+        return await upstream.request(
+            method=method, url=url, headers=headers, data=data, service=service, socket=socket
+        )
+    finally:
+        if isinstance(data, SpooledBody):
+            data.close()
 
 
-# noinspection PyMethodMayBeStatic
-async def _clone_response(response: ClientResponse) -> web.Response:
-    return web.Response(
-        body=await response.read(), status=response.status, reason=response.reason, headers=response.headers,
-    )
+def _forwarded_url(original_req: web.Request, target: RequestTarget, host: str, port: Optional[int]) -> URL:
+    # The path is the normalized one, but the query string is forwarded exactly as it was received.
+    path = URL.build(path=target.path).raw_path
+    query = original_req.url.raw_query_string
+    return URL.build(scheme="http", host=host, port=port, path=path, query_string=query, encoded=True)
 
 
 class AdminHandler:
     @staticmethod
     async def login(request: web.Request) -> web.Response:
         """ Orchestrate discovery and microservice call """
-        username = request.app["config"].rest.admin.username
-        password = request.app["config"].rest.admin.password
+        admin = request["state"].config.rest.admin
+        username = admin.username
+        password = admin.password
 
         try:
             content = await request.json()
@@ -253,15 +308,12 @@ class AdminHandler:
 
     @staticmethod
     async def get_endpoints(request: web.Request) -> web.Response:
-        discovery_host = request.app["config"].discovery.host
-        discovery_port = request.app["config"].discovery.port
-
-        url = URL.build(scheme="http", host=discovery_host, port=discovery_port, path="/endpoints")
+        url = request["state"].config.discovery.url.with_path("/endpoints")
 
         try:
             async with ClientSession() as session:
                 async with session.get(url=url) as response:
-                    return await _clone_response(response)
+                    return await clone_response(response)
         except ClientConnectorError:
             return web.json_response(
                 {"error": "The requested endpoint is not available."}, status=web.HTTPServiceUnavailable.status_code
@@ -269,16 +321,12 @@ class AdminHandler:
 
     @staticmethod
     async def get_roles(request: web.Request) -> web.Response:
-        auth_host = request.app["config"].rest.auth.host
-        auth_port = request.app["config"].rest.auth.port
-        auth_path = request.app["config"].rest.auth.path
-
-        url = URL.build(scheme="http", host=auth_host, port=auth_port, path=f"{auth_path}/roles")
+        url = request["state"].config.rest.auth.url / "roles"
 
         try:
             async with ClientSession() as session:
                 async with session.get(url=url) as response:
-                    return await _clone_response(response)
+                    return await clone_response(response)
         except ClientConnectorError:
             return web.json_response(
                 {"error": "The requested endpoint is not available."}, status=web.HTTPServiceUnavailable.status_code
@@ -286,8 +334,7 @@ class AdminHandler:
 
     @staticmethod
     async def get_rules(request: web.Request) -> web.Response:
-        records = Repository(request.app["db_engine"]).get_auth_rules()
-        return web.json_response(records)
+        return await _list_rules(request, "list_auth_rules", ("service", "rule", "method"))
 
     @staticmethod
     async def create_rule(request: web.Request) -> web.Response:
@@ -310,7 +357,8 @@ class AdminHandler:
                 updated_at=now,
             )
 
-            record = Repository(request.app["db_engine"]).create_auth_rule(rule)
+            record = request.app["rules_backend"].repository().create_auth_rule(rule)
+            await _refresh_rules(request)
 
             return web.json_response(record)
         except Exception as e:
@@ -321,7 +369,8 @@ class AdminHandler:
         try:
             id = int(request.url.name)
             content = await request.json()
-            Repository(request.app["db_engine"]).update_auth_rule(id=id, **content)
+            request.app["rules_backend"].repository().update_auth_rule(id=id, **content)
+            await _refresh_rules(request)
             return web.json_response(status=web.HTTPOk.status_code)
         except Exception as e:
             return web.json_response({"error": str(e)}, status=web.HTTPBadRequest.status_code)
@@ -331,7 +380,8 @@ class AdminHandler:
         try:
             id = int(request.url.name)
             content = await request.json()
-            Repository(request.app["db_engine"]).update_autz_rule(id=id, **content)
+            request.app["rules_backend"].repository().update_autz_rule(id=id, **content)
+            await _refresh_rules(request)
             return web.json_response(status=web.HTTPOk.status_code)
         except Exception as e:
             return web.json_response({"error": str(e)}, status=web.HTTPBadRequest.status_code)
@@ -340,7 +390,8 @@ class AdminHandler:
     async def delete_rule(request: web.Request) -> web.Response:
         try:
             id = int(request.url.name)
-            Repository(request.app["db_engine"]).delete_auth_rule(id)
+            request.app["rules_backend"].repository().delete_auth_rule(id)
+            await _refresh_rules(request)
             return web.json_response(status=web.HTTPOk.status_code)
         except Exception as e:
             return web.json_response({"error": str(e)}, status=web.HTTPBadRequest.status_code)
@@ -349,7 +400,8 @@ class AdminHandler:
     async def delete_autz_rule(request: web.Request) -> web.Response:
         try:
             id = int(request.url.name)
-            Repository(request.app["db_engine"]).delete_autz_rule(id)
+            request.app["rules_backend"].repository().delete_autz_rule(id)
+            await _refresh_rules(request)
             return web.json_response(status=web.HTTPOk.status_code)
         except Exception as e:
             return web.json_response({"error": str(e)}, status=web.HTTPBadRequest.status_code)
@@ -381,13 +433,207 @@ class AdminHandler:
                 updated_at=now,
             )
 
-            record = Repository(request.app["db_engine"]).create_autz_rule(rule)
+            record = request.app["rules_backend"].repository().create_autz_rule(rule)
+            await _refresh_rules(request)
 
             return web.json_response(record)
         except Exception as e:
             return web.json_response({"error": str(e)}, status=web.HTTPBadRequest.status_code)
 
+    @staticmethod
+    async def get_rules_cache(request: web.Request) -> web.Response:
+        return web.json_response(request.app["rules"].decisions.stats())
+
     @staticmethod
     async def get_autz_rules(request: web.Request) -> web.Response:
-        records = Repository(request.app["db_engine"]).get_autz_rules()
-        return web.json_response(records)
+        return await _list_rules(request, "list_autz_rules", ("service", "rule", "method", "role"))
+
+    @staticmethod
+    async def export_rules(request: web.Request) -> web.StreamResponse:
+        return await _export_rules(request, "list_auth_rules")
+
+    @staticmethod
+    async def export_autz_rules(request: web.Request) -> web.StreamResponse:
+        return await _export_rules(request, "list_autz_rules")
+
+    @staticmethod
+    async def import_rules(request: web.Request) -> web.Response:
+        return await _import_rules(request, "import_auth_rules")
+
+    @staticmethod
+    async def import_autz_rules(request: web.Request) -> web.Response:
+        return await _import_rules(request, "import_autz_rules")
+
+
+async def _refresh_rules(request: web.Request) -> None:
+    """Refresh the rule index after a change, so the following requests to this instance already see it."""
+    try:
+        await request.app["rules"].refresh()
+    except SQLAlchemyError as exc:
+        logger.warning("Unable to refresh the rules: %r", exc)
+
+
+async def _list_rules(request: web.Request, list_rules: str, filters: tuple[str, ...]) -> web.Response:
+    """List the rules matching the query parameters of the given request, through the ``list_rules`` repository method.
+
+    The rules are filtered by the ``filters`` parameters (``rule`` is a prefix) and projected with ``fields`` (a comma
+    separated list), sorted by ``sort``, and paginated with ``limit`` and ``after``. The cursor of the next page is
+    given in the ``Link`` header and, if ``count=true`` is given, the total number of rules in the ``X-Total-Count``
+    header. The query runs in a worker thread, so the event loop is never blocked.
+    """
+    query = request.query
+    kwargs = {name: query[name] for name in filters if name in query}
+    try:
+        if "fields" in query:
+            kwargs["fields"] = tuple(field.strip() for field in query["fields"].split(",") if field.strip())
+        if "sort" in query:
+            kwargs["sort"] = query["sort"]
+        if "after" in query:
+            kwargs["after"] = query["after"]
+        if "limit" in query:
+            kwargs["limit"] = int(query["limit"])
+            if not 0 < kwargs["limit"] <= MAX_PAGE_SIZE:
+                raise ValueError(f"The limit must be between 1 and {MAX_PAGE_SIZE}.")
+        kwargs["count"] = query.get("count", "false").lower() in ("true", "1")
+        _check_filters(kwargs)
+
+        repository = request.app["rules_backend"].repository()
+        page = await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(getattr(repository, list_rules), **kwargs)
+        )
+    except ValueError as e:
+        return web.json_response({"error": str(e)}, status=web.HTTPBadRequest.status_code)
+
+    headers = dict()
+    if page.cursor is not None:
+        # The total is only counted once, with the first page.
+        next_query = {**{name: value for name, value in query.items() if name != "count"}, "after": page.cursor}
+        headers["Link"] = f'<{request.rel_url.with_query(next_query)}>; rel="next"'
+    if page.total is not None:
+        headers["X-Total-Count"] = str(page.total)
+    return web.json_response(page.records, headers=headers)
+
+
+def _check_filters(filters: dict[str, Any]) -> None:
+    """Check the method and role filters, so the wrong ones are rejected before querying the database.
+
+    :param filters: The filters of the listing.
+    """
+    method = filters.get("method")
+    if method is not None and _METHOD.fullmatch(method) is None:
+        raise ValueError("The method must be an HTTP method.")
+    role = filters.get("role")
+    if role is not None:
+        if not role or not role.isprintable():
+            raise ValueError("The role must be a non empty printable string.")
+        if role.isascii() and role.isdigit() and int(role) > _MAX_NUMERIC_ROLE:
+            raise ValueError(f"The numeric roles must not be greater than {_MAX_NUMERIC_ROLE}.")
+
+
+async def _export_rules(request: web.Request, list_rules: str) -> web.StreamResponse:
+    """Stream the rules of the given service (or all of them) as a JSON array, or as NDJSON if it is requested.
+
+    The rules are read page by page in a worker thread and written as they are read, so the whole rule set is never
+    held in memory.
+    """
+    ndjson = _is_ndjson(request)
+    kwargs = {"service": request.query["service"]} if "service" in request.query else dict()
+    list_rules = getattr(request.app["rules_backend"].repository(), list_rules)
+    loop = asyncio.get_running_loop()
+
+    response = web.StreamResponse(headers={"Content-Type": NDJSON_CONTENT_TYPE if ndjson else "application/json"})
+    await response.prepare(request)
+
+    if not ndjson:
+        await response.write(b"[")
+
+    cursor, first = None, True
+    while True:
+        page = await loop.run_in_executor(
+            None, functools.partial(list_rules, after=cursor, limit=MAX_PAGE_SIZE, **kwargs)
+        )
+        if page.records and ndjson:
+            await response.write(b"".join(json.dumps(record).encode() + b"\n" for record in page.records))
+        elif page.records:
+            # The page is encoded at once, and its brackets dropped, so it is written as part of the whole array.
+            await response.write((b"" if first else b",") + json.dumps(page.records).encode()[1:-1])
+            first = False
+        cursor = page.cursor
+        if cursor is None:
+            break
+
+    if not ndjson:
+        await response.write(b"]")
+    await response.write_eof()
+    return response
+
+
+async def _import_rules(request: web.Request, import_rules: str) -> web.Response:
+    """Create, update or delete the rules given as a JSON array, or as NDJSON, in a single transaction, through the
+    ``import_rules`` repository method.
+
+    The body is read as a stream, limited by ``rules.import_max_size`` instead of the request body limits. NDJSON
+    rules are parsed line by line as they are received, so the raw body is never held in memory. The summary of the
+    changes is returned, or the full diff if ``dry_run=true`` is given, in which case nothing is changed.
+    """
+    dry_run = request.query.get("dry_run", "false").lower() in ("true", "1")
+    ndjson = _is_ndjson(request)
+    max_size = request["state"].config.rules.import_max_size
+
+    def _import(entries):
+        if not ndjson:
+            entries = _parse_rules(entries)
+        repository = request.app["rules_backend"].repository()
+        return getattr(repository, import_rules)(entries, dry_run=dry_run)
+
+    try:
+        entries = await _read_rules(request, ndjson, max_size)
+        diff = await asyncio.get_running_loop().run_in_executor(None, _import, entries)
+    except (ValueError, ReadOnlyRulesException) as e:
+        return web.json_response({"error": str(e)}, status=web.HTTPBadRequest.status_code)
+
+    if dry_run:
+        return web.json_response({"dry_run": True, **diff._asdict()})
+
+    await _refresh_rules(request)
+    return web.json_response(
+        {
+            "created": len(diff.created),
+            "updated": len(diff.updated),
+            "deleted": len(diff.deleted),
+            "unchanged": diff.unchanged,
+        }
+    )
+
+
+def _is_ndjson(request: web.Request) -> bool:
+    if request.query.get("format") == "ndjson":
+        return True
+    if request.method == "GET":
+        return NDJSON_CONTENT_TYPE in request.headers.get("Accept", "")
+    return request.content_type == NDJSON_CONTENT_TYPE
+
+
+async def _read_rules(request: web.Request, ndjson: bool, max_size: int) -> Union[bytes, list[Any]]:
+    # The JSON arrays are returned as read, to be parsed in a worker thread, and the NDJSON rules already parsed.
+    if request.content_length is not None and request.content_length > max_size:
+        raise web.HTTPRequestEntityTooLarge(max_size=max_size, actual_size=request.content_length)
+
+    size, body, entries = 0, bytearray(), list()
+    stream = request.content if ndjson else request.content.iter_any()
+    async for chunk in stream:
+        size += len(chunk)
+        if size > max_size:
+            raise web.HTTPRequestEntityTooLarge(max_size=max_size, actual_size=size)
+        if not ndjson:
+            body += chunk
+        elif chunk.strip():
+            entries.append(json.loads(chunk))
+    return entries if ndjson else bytes(body)
+
+
+def _parse_rules(body: bytes) -> list[Any]:
+    entries = json.loads(body)
+    if not isinstance(entries, list):
+        raise ValueError("The rules must be given as a JSON array.")
+    return entries
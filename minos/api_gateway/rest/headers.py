@@ -0,0 +1,126 @@
+from typing import (
+    Iterable,
+    Optional,
+)
+
+from aiohttp import (
+    web,
+)
+from multidict import (
+    CIMultiDict,
+    CIMultiDictProxy,
+)
+
+# Headers that are meaningful only for a single transport-level connection (RFC 7230, section 6.1).
+HOP_BY_HOP_HEADERS = frozenset(
+    (
+        "connection",
+        "keep-alive",
+        "proxy-authenticate",
+        "proxy-authorization",
+        "proxy-connection",
+        "te",
+        "trailer",
+        "transfer-encoding",
+        "upgrade",
+    )
+)
+
+# Headers that are recomputed by the client that sends the message.
+_RECOMPUTED_REQUEST_HEADERS = frozenset(("host", "content-length"))
+_RECOMPUTED_RESPONSE_HEADERS = frozenset(("content-length",))
+
+_EXCLUDED_RESPONSE_HEADERS = HOP_BY_HOP_HEADERS | _RECOMPUTED_RESPONSE_HEADERS
+
+
+class HeaderRewrite:
+    """Header modifications applied to the requests forwarded to a single service."""
+
+    __slots__ = ("set_headers", "remove")
+
+    def __init__(self, set_headers: Optional[dict[str, str]] = None, remove: Iterable[str] = ()):
+        self.set_headers = tuple((dict() if set_headers is None else set_headers).items())
+        self.remove = tuple(remove)
+
+
+class HeaderPipeline:
+    """Build the headers of the requests forwarded by the gateway.
+
+    Every lookup table is computed once when the pipeline is built, so processing a request is a single pass over the
+    inbound headers.
+    """
+
+    def __init__(
+        self,
+        forwarded: bool = True,
+        allow: Optional[Iterable[str]] = None,
+        deny: Iterable[str] = (),
+        rewrites: Optional[dict[str, HeaderRewrite]] = None,
+    ):
+        self.forwarded = forwarded
+        self._allow = None if allow is None else frozenset(name.lower() for name in allow)
+        self._excluded = HOP_BY_HOP_HEADERS | _RECOMPUTED_REQUEST_HEADERS | frozenset(name.lower() for name in deny)
+        self._rewrites = dict() if rewrites is None else dict(rewrites)
+
+    def request_headers(self, request: web.Request, service: Optional[str] = None) -> CIMultiDict:
+        """Build the headers to be sent upstream for the given inbound request.
+
+        :param request: The inbound request.
+        :param service: The target service name, used to apply the per-service rewrites.
+        :return: A new ``CIMultiDict`` instance.
+        """
+        excluded = self._excluded
+        connection = request.headers.get("Connection")
+        if connection:
+            excluded = excluded | {token.strip().lower() for token in connection.split(",")}
+
+        allow = self._allow
+        headers = CIMultiDict()
+        for name, value in request.headers.items():
+            key = name.lower()
+            if key in excluded or (allow is not None and key not in allow):
+                continue
+            headers.add(name, value)
+
+        rewrite = self._rewrites.get(service)
+        if rewrite is not None:
+            for name in rewrite.remove:
+                headers.popall(name, None)
+            for name, value in rewrite.set_headers:
+                headers[name] = value
+
+        if self.forwarded:
+            _add_forwarded_headers(request, headers)
+
+        return headers
+
+
+def response_headers(headers: CIMultiDictProxy) -> CIMultiDict:
+    """Build the headers to be retrieved to the client from an upstream response.
+
+    :param headers: The upstream response headers.
+    :return: A new ``CIMultiDict`` instance.
+    """
+    excluded = _EXCLUDED_RESPONSE_HEADERS
+    connection = headers.get("Connection")
+    if connection:
+        excluded = excluded | {token.strip().lower() for token in connection.split(",")}
+
+    return CIMultiDict((name, value) for name, value in headers.items() if name.lower() not in excluded)
+
+
+def _add_forwarded_headers(request: web.Request, headers: CIMultiDict) -> None:
+    remote = request.remote
+    scheme = request.scheme
+    host = request.host
+
+    if remote is not None:
+        previous = headers.get("X-Forwarded-For")
+        headers["X-Forwarded-For"] = remote if previous is None else f"{previous}, {remote}"
+    headers["X-Forwarded-Proto"] = scheme
+    headers["X-Forwarded-Host"] = host
+
+    node = "unknown" if remote is None else (f'"[{remote}]"' if ":" in remote else remote)
+    element = f'for={node};proto={scheme};host="{host}"'
+    previous = headers.get("Forwarded")
+    headers["Forwarded"] = element if previous is None else f"{previous}, {element}"
@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import signal
+from collections import (
+    namedtuple,
+)
+from typing import (
+    Awaitable,
+    Callable,
+    Optional,
+)
+
+from aiohttp import (
+    web,
+)
+
+from .config import (
+    ApiGatewayConfig,
+)
+from .exceptions import (
+    ApiGatewayConfigException,
+)
+
+logger = logging.getLogger(__name__)
+
+GatewayState = namedtuple("GatewayState", "version config upstream headers body discovery token_verifier")
+
+# The state fields holding components, which may have to be started and stopped when they are replaced.
+_COMPONENTS = ("upstream", "headers", "body", "discovery", "token_verifier")
+
+
+class ConfigReloader:
+    """Keep the state of the gateway (the config and the components built from it) and swap it on demand.
+
+    A reload reads and validates the config again and builds a new state through ``build``, which only has to rebuild
+    the components whose config section has changed. The new components are started before the state is swapped, so
+    it is replaced atomically, and the replaced ones are stopped afterwards. Every request is pinned to the state that
+    was active when it started, so the in-flight requests finish with the old config.
+
+    Reloads are triggered by the ``SIGHUP`` signal or through the ``handle`` admin endpoint.
+    """
+
+    def __init__(
+        self,
+        config: ApiGatewayConfig,
+        build: Callable[[ApiGatewayConfig, Optional[GatewayState]], GatewayState],
+    ):
+        self._build = build
+        self._app = None
+        self._lock = asyncio.Lock()
+        self._retiring = dict()
+        self._reloading = set()
+
+        self.state = build(config, None)
+
+    @property
+    def config(self) -> ApiGatewayConfig:
+        """Get the active config.
+
+        :return: An ``ApiGatewayConfig`` instance.
+        """
+        return self.state.config
+
+    async def reload(self) -> GatewayState:
+        """Read the config again and swap the state of the gateway.
+
+        :return: The new ``GatewayState`` instance.
+        """
+        async with self._lock:
+            previous = self.state
+            config = previous.config.reload()
+            state = self._build(config, previous)
+
+            if self._app is None:  # The components will be started with the application.
+                self.state = state
+                return state
+
+            started = list()
+            try:
+                for component in _replaced(state, previous):
+                    await self._start(component)
+                    started.append(component)
+            except BaseException:
+                for component in started:
+                    await self._stop(component)
+                raise
+
+            self.state = state
+
+            for component in _replaced(previous, state):
+                self._retire(component)
+
+            logger.info("Config reloaded (version %d).", state.version)
+            return state
+
+    def middleware(self) -> Callable[[web.Request, Callable], Awaitable[web.StreamResponse]]:
+        """Build an ``aiohttp`` middleware that pins the active state to every request as ``request["state"]``.
+
+        It must be the first middleware, so the rest of them see the same state as the handler.
+
+        :return: A middleware function.
+        """
+
+        @web.middleware
+        async def _middleware(request: web.Request, handler: Callable) -> web.StreamResponse:
+            request["state"] = self.state
+            return await handler(request)
+
+        return _middleware
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """Reload the config as an admin endpoint.
+
+        :param request: The request.
+        :return: A ``web.Response`` instance.
+        """
+        try:
+            state = await self.reload()
+        except ApiGatewayConfigException as exc:
+            return web.json_response({"error": str(exc)}, status=web.HTTPBadRequest.status_code)
+        return web.json_response({"version": state.version})
+
+    def _on_signal(self) -> None:
+        # The loop only keeps weak references to the tasks, so they are kept until they are done.
+        task = asyncio.create_task(self._reload_on_signal())
+        self._reloading.add(task)
+        task.add_done_callback(self._reloading.discard)
+
+    async def _reload_on_signal(self) -> None:
+        try:
+            await self.reload()
+        except ApiGatewayConfigException as exc:
+            logger.warning("The config has not been reloaded: %s", exc)
+
+    async def _start(self, component) -> None:
+        if hasattr(component, "on_startup"):
+            await component.on_startup(self._app)
+
+    async def _stop(self, component) -> None:
+        if hasattr(component, "on_cleanup"):
+            await component.on_cleanup(self._app)
+
+    def _retire(self, component) -> None:
+        if hasattr(component, "retire"):
+            # The component may still be used by the in-flight requests, so it decides when it can be stopped.
+            task = asyncio.create_task(component.retire())
+        else:
+            task = asyncio.create_task(self._stop(component))
+        self._retiring[task] = component
+        task.add_done_callback(self._retiring.pop)
+
+    async def on_startup(self, app: web.Application) -> None:
+        """Start the components and listen to the ``SIGHUP`` signal as an ``aiohttp`` startup signal."""
+        self._app = app
+        for component in _components(self.state):
+            await self._start(component)
+
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, self._on_signal)
+        except (NotImplementedError, RuntimeError, AttributeError):  # pragma: no cover
+            logger.warning("The config cannot be reloaded through the 'SIGHUP' signal on this platform.")
+
+    async def on_cleanup(self, app: web.Application) -> None:
+        """Stop listening to the ``SIGHUP`` signal and stop the components as an ``aiohttp`` cleanup signal."""
+        try:
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+        except (NotImplementedError, RuntimeError, AttributeError):  # pragma: no cover
+            pass
+
+        reloading = set(self._reloading)
+        for task in reloading:
+            task.cancel()
+        await asyncio.gather(*reloading, return_exceptions=True)
+
+        async with self._lock:
+            retiring = dict(self._retiring)
+            for task in retiring:
+                task.cancel()
+            await asyncio.gather(*retiring, return_exceptions=True)
+
+            for component in (*_components(self.state), *retiring.values()):
+                await self._stop(component)
+
+
+def _components(state: GatewayState) -> list:
+    return [getattr(state, name) for name in _COMPONENTS if getattr(state, name) is not None]
+
+
+def _replaced(state: GatewayState, other: GatewayState) -> list:
+    return [component for component in _components(state) if all(component is not c for c in _components(other))]
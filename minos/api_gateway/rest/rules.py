@@ -0,0 +1,314 @@
+import asyncio
+import logging
+from collections import (
+    OrderedDict,
+)
+from typing import (
+    Any,
+    Hashable,
+    Optional,
+    Union,
+)
+
+from aiohttp import (
+    web,
+)
+from sqlalchemy.exc import (
+    SQLAlchemyError,
+)
+
+from .database.backends import (
+    RuleBackend,
+)
+from .database.models import (
+    AuthRuleDTO,
+    AutzRuleDTO,
+)
+from .database.repository import (
+    AUTH_RULES,
+    AUTZ_RULES,
+    RULES_CHANNEL,
+)
+from .urlmatch.decision import (
+    AuthDecision,
+    DecisionMatch,
+)
+
+logger = logging.getLogger(__name__)
+
+_KINDS = (AUTH_RULES, AUTZ_RULES)
+
+
+class DecisionCache:
+    """Bounded cache of the access decisions taken with a version of the rules.
+
+    The least recently used decisions are evicted once ``max_size`` is reached, and all of them are dropped as soon as
+    they are looked up with a different version, so a decision never outlives the rules it was taken with.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._decisions = OrderedDict()
+
+    def get(self, version: int, key: Hashable) -> Optional[AuthDecision]:
+        """Get the decision cached for the given key.
+
+        :param version: The current version of the rules.
+        :param key: The key of the decision.
+        :return: An ``AuthDecision`` instance, or ``None`` if it is not cached.
+        """
+        if version != self.version:
+            self._decisions.clear()
+            self.version = version
+
+        decision = self._decisions.get(key)
+        if decision is None:
+            self.misses += 1
+            return None
+
+        self._decisions.move_to_end(key)
+        self.hits += 1
+        return decision
+
+    def put(self, version: int, key: Hashable, decision: AuthDecision) -> None:
+        """Cache a decision.
+
+        :param version: The version of the rules the decision was taken with.
+        :param key: The key of the decision.
+        :param decision: The decision.
+        :return: This method does not return anything.
+        """
+        if self.max_size <= 0 or version != self.version:
+            return
+
+        self._decisions[key] = decision
+        if len(self._decisions) > self.max_size:
+            self._decisions.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict[str, Any]:
+        """Get the cache metrics.
+
+        :return: A dictionary with the size, the hits, the misses and the evictions of the cache.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "version": self.version,
+            "size": len(self._decisions),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else None,
+        }
+
+
+class RuleIndex:
+    """In-memory copy of the authentication and authorization rules, indexed by service.
+
+    The rules are loaded at startup and then kept up to date through the rules change feed: every change bumps the
+    rules version and records the affected services, so only the rules of those services are reloaded. The index is
+    refreshed as soon as a change is notified (through PostgreSQL ``LISTEN``, if ``listen`` is ``True``) and every
+    ``poll_interval`` seconds anyway, so every instance of the gateway sees the changes made by the rest of them with
+    a bounded delay even if the notifications are not available. The rules of a read-only backend are only loaded
+    once.
+    """
+
+    def __init__(self, backend: RuleBackend, poll_interval: float = 5.0, listen: bool = True, cache_size: int = 10000):
+        self.backend = backend
+        self.engine = backend.engine
+        self.poll_interval = poll_interval
+        self.listen = listen
+        self.version = None
+        self.decisions = DecisionCache(cache_size)
+
+        self._rules = {kind: dict() for kind in _KINDS}
+        self._lock = asyncio.Lock()
+        self._changed = asyncio.Event()
+        self._connection = None
+        self._task = None
+
+    @property
+    def ready(self) -> bool:
+        """Check if the rules have been loaded at least once.
+
+        :return: ``True`` if the rules are available or ``False`` otherwise.
+        """
+        return self.version is not None
+
+    def auth_rules(self, service: str) -> list[AuthRuleDTO]:
+        """Get the authentication rules that apply to the given service, including the ``"*"`` ones.
+
+        :param service: The service name.
+        :return: A list of ``AuthRuleDTO`` instances.
+        """
+        return self._get(AUTH_RULES, service)
+
+    def autz_rules(self, service: str) -> list[AutzRuleDTO]:
+        """Get the authorization rules that apply to the given service, including the ``"*"`` ones.
+
+        :param service: The service name.
+        :return: A list of ``AutzRuleDTO`` instances.
+        """
+        return self._get(AUTZ_RULES, service)
+
+    def decide(self, service: str, url: str, method: str) -> AuthDecision:
+        """Decide the access to the given url and method of a service, reusing the decisions already taken.
+
+        :param service: The service name.
+        :param url: The requested url.
+        :param method: The requested method.
+        :return: An ``AuthDecision`` instance.
+        """
+        key = (service, method, url)
+        decision = self.decisions.get(self.version, key)
+        if decision is None:
+            decision = DecisionMatch.match(
+                url=url, method=method, auth_records=self.auth_rules(service), autz_records=self.autz_rules(service)
+            )
+            self.decisions.put(self.version, key, decision)
+        return decision
+
+    def _get(self, kind: str, service: str) -> list[Union[AuthRuleDTO, AutzRuleDTO]]:
+        rules = self._rules[kind]
+        if service == "*":
+            return list(rules.get("*", ()))
+        return [*rules.get(service, ()), *rules.get("*", ())]
+
+    async def refresh(self) -> bool:
+        """Load the rules changed since the loaded version.
+
+        :return: ``True`` if any rule has been reloaded or ``False`` otherwise.
+        """
+        async with self._lock:
+            version, rules = await asyncio.get_running_loop().run_in_executor(None, self._load)
+            if rules is not None:
+                self._rules = rules
+            updated = version != self.version
+            self.version = version
+            return updated
+
+    def _load(self) -> tuple[int, Optional[dict[str, dict[str, tuple]]]]:
+        repository = self.backend.repository()
+        try:
+            if self.version is None:
+                version, changes = repository.get_rules_version(), None
+            else:
+                version, changes = repository.get_rule_changes(self.version)
+
+            if changes is None:
+                logger.debug("Loading all the rules (version %d)...", version)
+                return version, {kind: _group(repository.get_rules_of_services(kind)) for kind in _KINDS}
+
+            if not changes:
+                return version, None
+
+            rules = dict(self._rules)
+            for kind in _KINDS:
+                services = {service for changed, service in changes if changed == kind}
+                if services:
+                    rules[kind] = {k: v for k, v in rules[kind].items() if k not in services}
+                    rules[kind].update(_group(repository.get_rules_of_services(kind, services)))
+            logger.debug("Reloaded the rules of %d services (version %d).", len(changes), version)
+            return version, rules
+        finally:
+            repository.close()
+
+    async def _start_listening(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._connection = await loop.run_in_executor(None, self._connect)
+        loop.add_reader(self._connection.connection.fileno(), self._on_notify)
+
+    def _connect(self):
+        # The connection is detached from the pool, as it is left in autocommit mode and listening.
+        connection = self.engine.raw_connection()
+        connection.detach()
+        try:
+            connection.connection.autocommit = True
+            with connection.connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {RULES_CHANNEL}")
+        except BaseException:
+            connection.close()
+            raise
+        return connection
+
+    def _on_notify(self) -> None:
+        dbapi_connection = self._connection.connection
+        try:
+            dbapi_connection.poll()
+        except self.engine.dialect.dbapi.Error as exc:
+            logger.warning("The rules notifications have been lost, polling for changes meanwhile: %r", exc)
+            self._stop_listening()
+            return
+        if dbapi_connection.notifies:
+            dbapi_connection.notifies.clear()
+            self._changed.set()
+
+    def _stop_listening(self) -> None:
+        if self._connection is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_reader(self._connection.connection.fileno())
+        finally:
+            self._connection.close()
+            self._connection = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._changed.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._changed.clear()
+
+            if self.listen and self._connection is None:
+                await self._try_listening()
+            try:
+                await self.refresh()
+            except SQLAlchemyError as exc:
+                logger.warning("Unable to refresh the rules: %r", exc)
+
+    async def _try_listening(self) -> None:
+        try:
+            await self._start_listening()
+        except Exception as exc:
+            # Whatever the failure, the rules are still polled, so they are kept up to date anyway.
+            logger.warning("Unable to listen to the rules notifications, polling for changes instead: %r", exc)
+
+    async def on_startup(self, app: web.Application) -> None:
+        """Load the rules and start following the changes as an ``aiohttp`` startup signal."""
+        try:
+            await self.refresh()
+        except SQLAlchemyError as exc:
+            logger.warning("Unable to load the rules, querying them on every request meanwhile: %r", exc)
+
+        if self.backend.read_only and self.ready:
+            return
+
+        self.listen = self.listen and self.engine.dialect.name == "postgresql"
+        if self.listen:
+            await self._try_listening()
+        self._task = asyncio.create_task(self._run())
+
+    async def on_cleanup(self, app: web.Application) -> None:
+        """Stop following the changes as an ``aiohttp`` cleanup signal."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._stop_listening()
+
+
+def _group(rules: list) -> dict[str, tuple]:
+    grouped = dict()
+    for rule in rules:
+        grouped.setdefault(rule.service, list()).append(rule)
+    return {service: tuple(rules) for service, rules in grouped.items()}
@@ -1,10 +1,15 @@
+import asyncio
 import logging
+import time
 from pathlib import (
     Path,
 )
+from typing import (
+    Any,
+    Callable,
+    Optional,
+)
 
-import aiohttp_jinja2
-import jinja2
 from aiohttp import (
     web,
 )
@@ -14,15 +19,30 @@ from aiohttp_middlewares import (
 from aiomisc.service.aiohttp import (
     AIOHTTPService,
 )
-from sqlalchemy import (
-    create_engine,
-)
 
+from .access_log import (
+    AccessLogger,
+)
+from .body import (
+    BodyPolicy,
+)
 from .config import (
+    AUTH,
+    BODY,
+    DISCOVERY,
+    HEADERS,
+    UPSTREAM,
     ApiGatewayConfig,
 )
-from .database.models import (
-    Base,
+from .database.backends import (
+    RuleBackend,
+    build_backend,
+)
+from .discovery import (
+    DiscoverySynchronizer,
+)
+from .exceptions import (
+    ApiGatewayException,
 )
 from .handler import (
     AdminHandler,
@@ -31,41 +51,118 @@ from .handler import (
     login_default,
     orchestrate,
 )
+from .headers import (
+    HeaderPipeline,
+    HeaderRewrite,
+)
+from .reload import (
+    ConfigReloader,
+    GatewayState,
+)
+from .rules import (
+    RuleIndex,
+)
+from .static import (
+    StaticAssets,
+)
+from .tokens import (
+    TokenVerifier,
+)
+from .upstream import (
+    UpstreamClient,
+)
 
 logger = logging.getLogger(__name__)
 
+_cors = cors_middleware(allow_all=True)
+
+
+@web.middleware
+async def _cors_middleware(request: web.Request, handler: Callable) -> web.StreamResponse:
+    if request["state"].config.rest.cors.enabled:
+        return await _cors(request, handler)
+    return await handler(request)
+
+
+# The rule imports are streamed, and limited by ``rules.import_max_size`` instead of the body limits.
+_IMPORT_PATHS = frozenset({"/admin/rules/import", "/admin/autz-rules/import"})
+
+
+@web.middleware
+async def _body_middleware(request: web.Request, handler: Callable) -> web.StreamResponse:
+    # The policy of the state pinned to the request is used, so it follows the config reloads.
+    return await request["state"].body.handle(request, handler)
+
+
+def _section(config: ApiGatewayConfig, name: str) -> Any:
+    value = config
+    for attr in name.split("."):
+        value = None if value is None else getattr(value, attr)
+    return value
+
 
 class ApiGatewayRestService(AIOHTTPService):
     def __init__(self, address: str, port: int, config: ApiGatewayConfig):
         self.config = config
+        self.backend = None
         self.engine = None
         super().__init__(address, port)
 
     async def create_application(self) -> web.Application:
-        middlewares = list()
-        if self.config.rest.cors.enabled:
-            middlewares = [cors_middleware(allow_all=True)]
+        started = time.perf_counter()
+        reloader = ConfigReloader(self.config, self._build_state)
+        middlewares = [reloader.middleware()]
+
+        access_log = self.config.rest.access_log
+        access_logger = None
+        if access_log.enabled:
+            # It finishes the responses, so it goes before any middleware that updates them.
+            access_logger = AccessLogger(sample_rate=access_log.sample_rate)
+            middlewares.append(access_logger.middleware())
 
-        app = web.Application(middlewares=middlewares)
+        middlewares.extend((_cors_middleware, _body_middleware))
 
-        app["config"] = self.config
+        app = web.Application(middlewares=middlewares, client_max_size=self.config.rest.body.max_size)
 
-        self.engine = await self.create_engine()
+        app["reloader"] = reloader
+        app.on_startup.append(reloader.on_startup)
+        app.on_cleanup.append(reloader.on_cleanup)
+
+        if access_logger is not None:
+            app["access_logger"] = access_logger
+            app.on_startup.append(access_logger.on_startup)
+            app.on_cleanup.append(access_logger.on_cleanup)
+
+        components_built = time.perf_counter()
+        self.backend = await self.create_backend()
+        self.engine = self.backend.engine
         await self.create_database()
+        database_ready = time.perf_counter()
 
+        app["rules_backend"] = self.backend
         app["db_engine"] = self.engine
 
-        auth = self.config.rest.auth
-        if auth is not None and auth.enabled:
-            app.router.add_route("*", "/auth", authentication_default)
-            app.router.add_route("*", "/auth/login", login_default)
-            for service in auth.services:
-                app.router.add_route("*", f"/auth/{service.name}", authentication)
-                app.router.add_route("POST", f"/auth/{service.name}/login", authentication)
+        rules = self.config.rules
+        app["rules"] = RuleIndex(
+            self.backend, poll_interval=rules.poll_interval, listen=rules.listen, cache_size=rules.cache_size
+        )
+        app.on_startup.append(app["rules"].on_startup)
+        app.on_cleanup.append(app["rules"].on_cleanup)
+
+        # The authentication routes are always registered, so they can be enabled by a config reload. Requests to them
+        # are orchestrated as usual while the authentication is disabled.
+        app.router.add_route("*", "/auth", authentication_default)
+        app.router.add_route("*", "/auth/login", login_default)
+        app.router.add_route("*", "/auth/{service}", authentication)
+        app.router.add_route("POST", "/auth/{service}/login", authentication)
 
         app.router.add_route("POST", "/admin/login", AdminHandler.login)
+        app.router.add_route("POST", "/admin/reload", reloader.handle)
         app.router.add_route("GET", "/admin/endpoints", AdminHandler.get_endpoints)
         app.router.add_route("GET", "/admin/rules", AdminHandler.get_rules)
+        app.router.add_route("GET", "/admin/rules/export", AdminHandler.export_rules)
+        app.router.add_route("GET", "/admin/rules/cache", AdminHandler.get_rules_cache)
+        app.router.add_route("POST", "/admin/rules/import", AdminHandler.import_rules)
         app.router.add_route("POST", "/admin/rules", AdminHandler.create_rule)
         app.router.add_route("PATCH", "/admin/rules/{id}", AdminHandler.update_rule)
         app.router.add_route("DELETE", "/admin/rules/{id}", AdminHandler.delete_rule)
@@ -73,80 +170,126 @@ class ApiGatewayRestService(AIOHTTPService):
         app.router.add_route("GET", "/admin/roles", AdminHandler.get_roles)
         app.router.add_route("POST", "/admin/autz-rules", AdminHandler.create_autz_rule)
         app.router.add_route("GET", "/admin/autz-rules", AdminHandler.get_autz_rules)
+        app.router.add_route("GET", "/admin/autz-rules/export", AdminHandler.export_autz_rules)
+        app.router.add_route("POST", "/admin/autz-rules/import", AdminHandler.import_autz_rules)
         app.router.add_route("PATCH", "/admin/autz-rules/{id}", AdminHandler.update_autz_rule)
         app.router.add_route("DELETE", "/admin/autz-rules/{id}", AdminHandler.delete_autz_rule)
 
         # Administration routes
-        path = Path(__file__).parent
-        aiohttp_jinja2.setup(app, loader=jinja2.FileSystemLoader(f"{path}/backend/templates"))
-        app.router.add_route("*", "/administration{path:.*}", self.handler)
-        # app.router.add_route("GET", "/administration/{filename:.*}", self._serve_files)
+        path = Path(__file__).parent / "backend"
+        app["admin_assets"] = StaticAssets(
+            directory=path / "admin", index=path / "templates" / "index.html", headers={"Content-Language": "es"}
+        )
+        app.on_startup.append(app["admin_assets"].on_startup)
+        app.on_cleanup.append(app["admin_assets"].on_cleanup)
+        app.router.add_get("/administration{path:.*}", app["admin_assets"].handle)
 
         app.router.add_route("*", "/{endpoint:.*}", orchestrate)
 
+        finished = time.perf_counter()
+        app["startup_report"] = {
+            "components": components_built - started,
+            "database": database_ready - components_built,
+            "routes": finished - database_ready,
+        }
+        logger.info(
+            "Application built in %.1f ms (components: %.1f ms, database: %.1f ms, routes: %.1f ms).",
+            (finished - started) * 1000,
+            *(value * 1000 for value in app["startup_report"].values()),
+        )
+
         return app
 
-    async def create_engine(self):
-        DATABASE_URI = (
-            f"postgresql+psycopg2://{self.config.database.user}:{self.config.database.password}@"
-            f"{self.config.database.host}:{self.config.database.port}/{self.config.database.dbname}"
+    def _build_state(self, config: ApiGatewayConfig, previous: Optional[GatewayState] = None) -> GatewayState:
+        """Build the state of the gateway for the given config, reusing the components whose config is unchanged.
+
+        :param config: The config.
+        :param previous: The state to be replaced, if any.
+        :return: A ``GatewayState`` instance.
+        """
+        if previous is not None:
+            restart = ("database", "rest.host", "rest.port", "rest.body.max_size", "rest.access_log", "rules")
+            for section in restart:
+                if _section(previous.config, section) != _section(config, section):
+                    logger.warning("The %r config changes will not be applied until the gateway is restarted.", section)
+
+        def _component(name: str, section: str, build: Callable[[Any], Any]) -> Any:
+            if previous is not None and _section(previous.config, section) == _section(config, section):
+                return getattr(previous, name)
+            return build(_section(config, section))
+
+        return GatewayState(
+            version=1 if previous is None else previous.version + 1,
+            config=config,
+            upstream=_component("upstream", "upstream", self._build_upstream),
+            headers=_component("headers", "headers", self._build_headers),
+            body=_component("body", "rest.body", self._build_body),
+            discovery=_component("discovery", "discovery", self._build_discovery),
+            token_verifier=_component("token_verifier", "rest.auth", self._build_token_verifier),
+        )
+
+    @staticmethod
+    def _build_upstream(upstream: UPSTREAM) -> UpstreamClient:
+        return UpstreamClient(
+            protocol=upstream.protocol,
+            services={service.name: service.protocol for service in upstream.services},
+            sockets={service.name: service.socket for service in upstream.services if service.socket is not None},
+            dns_ttl=upstream.dns_ttl,
+            retries=upstream.retries,
+            retry_backoff=upstream.retry_backoff,
         )
 
-        return create_engine(DATABASE_URI)
+    @staticmethod
+    def _build_headers(headers: HEADERS) -> HeaderPipeline:
+        return HeaderPipeline(
+            forwarded=headers.forwarded,
+            allow=headers.allow,
+            deny=headers.deny,
+            rewrites={
+                service.name: HeaderRewrite(set_headers=service.set_headers, remove=service.remove)
+                for service in headers.services
+            },
+        )
 
-    async def create_database(self):
-        Base.metadata.create_all(self.engine)
+    @staticmethod
+    def _build_body(body: BODY) -> BodyPolicy:
+        return BodyPolicy(
+            max_size=body.max_size,
+            spool_threshold=body.spool_threshold,
+            services={service.name: service.max_size for service in body.services},
+            exempt=_IMPORT_PATHS,
+        )
 
-    @aiohttp_jinja2.template("tmpl.jinja2")
-    async def handler(self, request):  # pragma: no cover
-        try:
-            path = Path(__file__).parent
-            filename = Path(request.match_info["path"].replace("/", "", 1))
-            filepath = path.joinpath("backend", "admin", filename).resolve()
-
-            if filepath.is_file():
-                return await self._get_file(filepath)
-        except Exception:
-            pass
-        response = aiohttp_jinja2.render_template("index.html", request, {})
-        response.headers["Content-Language"] = "es"
-        return response
+    @staticmethod
+    def _build_discovery(discovery: DISCOVERY) -> Optional[DiscoverySynchronizer]:
+        if discovery.mode != "sync":
+            return None
+        return DiscoverySynchronizer(host=discovery.host, port=discovery.port, interval=discovery.interval)
 
     @staticmethod
-    async def _get_file(file_path) -> web.FileResponse:  # pragma: no cover
+    def _build_token_verifier(auth: Optional[AUTH]) -> Optional[TokenVerifier]:
+        if auth is None or not auth.enabled or not auth.jwt.enabled:
+            return None
+        url = auth.url.with_path(auth.jwt.jwks_path)
         try:
-            return web.FileResponse(path=file_path, status=200)
-        except (ValueError, FileNotFoundError) as error:
-            # relatively safe
-            raise web.HTTPNotFound() from error
-        except web.HTTPForbidden:
-            raise
-        except Exception as error:
-            raise web.HTTPNotFound() from error
-
-    """
-    async def _serve_files(self, request: web.Request) -> web.FileResponse:
-        rel_url = request.match_info["filename"]
-
-        path = Path(Path.cwd())
-        self._directory = path.resolve()
+            return TokenVerifier(
+                url=url,
+                algorithms=auth.jwt.algorithms,
+                audience=auth.jwt.audience,
+                refresh_interval=auth.jwt.refresh_interval,
+            )
+        except ValueError as exc:
+            logger.warning("Local token verification is disabled: %s", exc)
+            return None
 
+    async def create_backend(self) -> RuleBackend:
+        return build_backend(self.config.database)
+
+    async def create_database(self):
+        """Prepare the rules backend in a worker thread, so the event loop is not blocked."""
+        timeout = self.config.database.timeout
+        future = asyncio.get_running_loop().run_in_executor(None, self.backend.setup)
         try:
-            filename = Path(rel_url)
-            if filename.anchor:
-                raise web.HTTPForbidden()
-            filepath = self._directory.joinpath("minos", "api_gateway", "rest", "backend", "admin", filename).resolve()
-
-            # p = filepath.relative_to(self._directory)
-            return web.FileResponse(path=filepath, status=200)
-
-        except (ValueError, FileNotFoundError) as error:
-            # relatively safe
-            raise web.HTTPNotFound() from error
-        except web.HTTPForbidden:
-            raise
-        except Exception as error:
-            # perm error or other kind!
-            request.app.logger.exception(error)
-            raise web.HTTPNotFound() from error
-    """
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise ApiGatewayException(f"The database schema could not be created in {timeout} seconds.")
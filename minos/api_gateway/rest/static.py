@@ -0,0 +1,183 @@
+import asyncio
+import gzip
+import hashlib
+import logging
+import mimetypes
+import re
+from pathlib import (
+    Path,
+)
+from typing import (
+    Optional,
+    Union,
+)
+
+from aiohttp import (
+    web,
+)
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Bundles built with content hashes in their names, like ``main.33051811e0a291cf.js``, never change.
+_HASHED_FILENAME = re.compile(r"\.[0-9a-f]{16,}\.[^.]+$")
+
+# Formats that are already compressed, so compressing them again only wastes CPU.
+_COMPRESSED_TYPES = frozenset(
+    ("image/png", "image/jpeg", "image/gif", "image/webp", "font/woff", "font/woff2", "application/zip")
+)
+
+# Compressed variants by ``ETag``, shared by all the instances so every file is compressed once per process.
+_ENCODINGS_CACHE = dict()
+
+
+class _Asset:
+    __slots__ = ("body", "etag", "content_type", "cache_control", "encodings")
+
+    def __init__(self, body: bytes, content_type: str, cache_control: str):
+        self.body = body
+        self.etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.encodings = dict()
+
+
+class StaticAssets:
+    """Serve the files of a single page application from memory.
+
+    Every file is loaded once at startup. Files with hashed names are served with an immutable ``Cache-Control``,
+    and the rest (including the index) must be revalidated through their ``ETag``. The ``gzip`` and ``br`` (if the
+    ``brotli`` extra is installed) variants are generated once per process, in a background thread, so the startup
+    is not delayed and the requests never spend CPU compressing. Unknown paths are answered with the index, so the
+    client side routes work.
+    """
+
+    def __init__(self, directory: Union[Path, str], index: Union[Path, str], headers: Optional[dict[str, str]] = None):
+        self.directory = Path(directory)
+        self.index = Path(index)
+        self.headers = dict() if headers is None else dict(headers)
+
+        self._assets = dict()
+        self._index = None
+        self._task = None
+        self._stopped = False
+
+    def load(self) -> None:
+        """Load the files in memory.
+
+        :return: This method does not return anything.
+        """
+        assets = dict()
+        for path in sorted(self.directory.rglob("*")):
+            if path.is_file():
+                name = path.relative_to(self.directory).as_posix()
+                cache_control = IMMUTABLE_CACHE_CONTROL if _HASHED_FILENAME.search(name) else REVALIDATE_CACHE_CONTROL
+                assets[name] = _Asset(path.read_bytes(), _content_type(path), cache_control)
+
+        self._assets = assets
+        self._index = _Asset(self.index.read_bytes(), "text/html", REVALIDATE_CACHE_CONTROL)
+        logger.debug("Loaded %d static assets from %r.", len(assets), str(self.directory))
+
+    def compress(self) -> None:
+        """Generate the compressed variants of the loaded files.
+
+        :return: This method does not return anything.
+        """
+        for asset in (self._index, *self._assets.values()):
+            if self._stopped:
+                return
+            if asset.content_type in _COMPRESSED_TYPES:
+                continue
+            if asset.etag not in _ENCODINGS_CACHE:
+                _ENCODINGS_CACHE[asset.etag] = _compress(asset.body)
+            asset.encodings = _ENCODINGS_CACHE[asset.etag]
+
+    def get(self, name: str) -> Optional[_Asset]:
+        """Get the asset with the given name.
+
+        :param name: The path of the file, relative to the directory.
+        :return: The asset or ``None`` if it does not exist.
+        """
+        return self._assets.get(name.lstrip("/"))
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """Serve the file requested by the given request.
+
+        :param request: The request.
+        :return: A ``web.Response`` instance.
+        """
+        asset = self.get(request.match_info.get("path", ""))
+        headers = dict()
+        if asset is None:
+            asset = self._index
+            headers.update(self.headers)
+
+        encoding = _negotiate(request, asset)
+        etag = asset.etag if encoding is None else f'{asset.etag[:-1]}-{encoding}"'
+        headers.update({"ETag": etag, "Cache-Control": asset.cache_control, "Vary": "Accept-Encoding"})
+
+        if _matches(request.headers.get("If-None-Match"), etag):
+            return web.Response(status=304, headers=headers)
+
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+            return web.Response(body=asset.encodings[encoding], content_type=asset.content_type, headers=headers)
+
+        return web.Response(body=asset.body, content_type=asset.content_type, headers=headers)
+
+    async def on_startup(self, app: web.Application) -> None:
+        """Load the files and start the compression as an ``aiohttp`` startup signal."""
+        self.load()
+        self._stopped = False
+        self._task = asyncio.get_running_loop().run_in_executor(None, self.compress)
+
+    async def on_cleanup(self, app: web.Application) -> None:
+        """Stop the compression as an ``aiohttp`` cleanup signal."""
+        if self._task is not None:
+            self._stopped = True
+            await self._task
+            self._task = None
+
+
+def _compress(body: bytes) -> dict[str, bytes]:
+    encodings = dict()
+    if brotli is not None:
+        encodings["br"] = brotli.compress(body, quality=11)
+    encodings["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+    return {encoding: compressed for encoding, compressed in encodings.items() if len(compressed) < len(body)}
+
+
+def _content_type(path: Path) -> str:
+    content_type, _ = mimetypes.guess_type(path.name)
+    return content_type or "application/octet-stream"
+
+
+def _negotiate(request: web.Request, asset: _Asset) -> Optional[str]:
+    if not asset.encodings:
+        return None
+
+    accepted = set()
+    for value in request.headers.get("Accept-Encoding", "").split(","):
+        coding, _, params = value.partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(coding.strip().lower())
+
+    for encoding in ("br", "gzip"):
+        if encoding in accepted and encoding in asset.encodings:
+            return encoding
+    return None
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
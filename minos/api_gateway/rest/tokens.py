@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import time
+from typing import (
+    Any,
+    Optional,
+)
+
+from aiohttp import (
+    ClientError,
+    ClientSession,
+    web,
+)
+from yarl import (
+    URL,
+)
+
+try:
+    import jwt
+except ImportError:  # pragma: no cover
+    jwt = None
+
+logger = logging.getLogger(__name__)
+
+
+class TokenVerifier:
+    """Verify ``JWT`` tokens locally using the signing keys published by the authentication service.
+
+    The ``JWKS`` document is fetched at startup and every ``refresh_interval`` seconds, and also when a token is
+    signed with an unknown key, so key rotations are picked up without waiting for the next refresh. Tokens that are
+    not ``JWT`` or whose key is still unknown are left to the authentication service.
+    """
+
+    def __init__(
+        self,
+        url: URL,
+        algorithms: Optional[list[str]] = None,
+        audience: Optional[str] = None,
+        refresh_interval: float = 300.0,
+        min_refresh_interval: float = 30.0,
+    ):
+        if jwt is None:
+            raise ValueError("Local token verification requires the 'pyjwt[crypto]' extra.")
+
+        self.url = url
+        self.algorithms = ["RS256"] if algorithms is None else list(algorithms)
+        self.audience = audience
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+
+        self._keys = dict()
+        self._refreshed_at = None
+        self._lock = None
+        self._task = None
+
+    async def refresh(self) -> None:
+        """Fetch the signing keys from the authentication service.
+
+        :return: This method does not return anything.
+        """
+        async with ClientSession() as session:
+            async with session.get(url=self.url) as response:
+                response.raise_for_status()
+                data = await response.json()
+
+        keys = dict()
+        for key in jwt.PyJWKSet.from_dict(data).keys:
+            keys[key.key_id] = key
+        self._keys = keys
+        self._refreshed_at = time.monotonic()
+        logger.debug("Loaded %d signing keys from the authentication service.", len(keys))
+
+    async def verify_request(self, request: web.Request) -> Optional[dict[str, Any]]:
+        """Verify the bearer token of the given request.
+
+        :param request: The request to be verified.
+        :return: A dictionary containing the ``uuid`` and ``role`` of the user, or ``None`` if the token cannot be
+            verified locally. A token that is not valid, or that has neither the ``uuid`` nor the ``sub`` claims, is
+            rejected with a ``401`` response.
+        """
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return None
+        return await self.verify(token.strip())
+
+    async def verify(self, token: str) -> Optional[dict[str, Any]]:
+        """Verify the given token.
+
+        :param token: The token to be verified.
+        :return: A dictionary containing the ``uuid`` and ``role`` of the user, or ``None`` if the token cannot be
+            verified locally. A token that is not valid, or that has neither the ``uuid`` nor the ``sub`` claims, is
+            rejected with a ``401`` response.
+        """
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.DecodeError:
+            return None  # Opaque token.
+
+        key = await self._get_key(header.get("kid"))
+        if key is None:
+            return None
+
+        try:
+            claims = jwt.decode(
+                token,
+                key.key,
+                algorithms=self.algorithms,
+                audience=self.audience,
+                options={"require": ["exp"], "verify_aud": self.audience is not None},
+            )
+        except jwt.InvalidTokenError:
+            raise web.HTTPUnauthorized(text="The given request does not have authorization to be forwarded.")
+
+        uuid = claims.get("uuid", claims.get("sub"))
+        if uuid is None:
+            # A valid token that does not identify the user cannot be forwarded on behalf of anyone.
+            raise web.HTTPUnauthorized(text="The given request does not have authorization to be forwarded.")
+        return {"uuid": uuid, "role": claims.get("role")}
+
+    async def _get_key(self, kid: Optional[str]):
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            key = self._keys.get(kid)
+            if key is not None or not self._can_refresh():
+                return key
+            try:
+                await self.refresh()
+            except (ClientError, asyncio.TimeoutError, ValueError, jwt.PyJWTError) as exc:
+                logger.warning("Unable to refresh the signing keys: %r", exc)
+                self._refreshed_at = time.monotonic()
+            return self._keys.get(kid)
+
+    def _can_refresh(self) -> bool:
+        return self._refreshed_at is None or time.monotonic() - self._refreshed_at >= self.min_refresh_interval
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except (ClientError, asyncio.TimeoutError, ValueError, jwt.PyJWTError) as exc:
+                logger.warning("Unable to refresh the signing keys: %r", exc)
+
+    async def on_startup(self, app: web.Application) -> None:
+        """Load the keys and start the periodic refresh as an ``aiohttp`` startup signal."""
+        try:
+            await self.refresh()
+        except (ClientError, asyncio.TimeoutError, ValueError, jwt.PyJWTError) as exc:
+            logger.warning("Unable to load the signing keys, using the authentication service meanwhile: %r", exc)
+        self._task = asyncio.create_task(self._run())
+
+    async def on_cleanup(self, app: web.Application) -> None:
+        """Stop the periodic refresh as an ``aiohttp`` cleanup signal."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
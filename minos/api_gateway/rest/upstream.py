@@ -0,0 +1,392 @@
+import asyncio
+import logging
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Optional,
+    Union,
+)
+
+from aiohttp import (
+    ClientConnectionError,
+    ClientConnectorError,
+    ClientResponse,
+    ClientSession,
+    StreamReader,
+    TCPConnector,
+    UnixConnector,
+    web,
+)
+from multidict import (
+    CIMultiDict,
+)
+from yarl import (
+    URL,
+)
+
+from .body import (
+    SpooledBody,
+)
+from .headers import (
+    response_headers,
+)
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+HTTP_1_1 = "http/1.1"
+HTTP_2 = "h2"
+H2C = "h2c"
+
+PROTOCOLS = (HTTP_1_1, HTTP_2, H2C)
+
+UNIX_ADDRESS_PREFIX = "unix:"
+
+# Methods that can be sent again without changing the result (RFC 7231, section 4.2.2).
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE"))
+
+# Connection-specific headers are forbidden in HTTP/2 messages (RFC 7540, section 8.1.2.2).
+_HTTP2_EXCLUDED_HEADERS = frozenset(
+    ("connection", "keep-alive", "proxy-connection", "transfer-encoding", "upgrade", "te", "host", "content-length")
+)
+_RETRYABLE_ERRORS = (ClientConnectionError,)
+_UNAVAILABLE_ERRORS = (ClientConnectorError,)
+if httpx is not None:
+    # Same limits as the ``aiohttp`` default client timeout.
+    _HTTP2_TIMEOUT = httpx.Timeout(300.0, connect=30.0)
+    _RETRYABLE_ERRORS += (httpx.TransportError,)
+    _UNAVAILABLE_ERRORS += (httpx.ConnectError,)
+
+# Same limit as the ``aiohttp`` default client timeout, so no upstream response is expected to last longer.
+_RETIRE_TIMEOUT = 300.0
+
+
+class UpstreamClient:
+    """Client used to forward requests to the upstream microservices.
+
+    HTTP/1.1 requests share a pooled ``aiohttp`` session, whose connector caches the resolved addresses of the
+    discovered hosts for ``dns_ttl`` seconds. Services served through a Unix domain socket get their own session.
+    Services configured to use ``h2`` or ``h2c`` go through an ``httpx`` client (if installed) that multiplexes
+    concurrent requests over few connections. Services that do not speak HTTP/2 are downgraded to HTTP/1.1.
+
+    Idempotent requests that fail at the connection level are sent again up to ``retries`` times, waiting
+    ``retry_backoff`` seconds (doubled on every attempt) between them.
+
+    Clients replaced by a config reload are retired, so their connections are only closed once the responses that
+    are still being forwarded have been released.
+    """
+
+    def __init__(
+        self,
+        protocol: str = HTTP_1_1,
+        services: Optional[dict[str, str]] = None,
+        sockets: Optional[dict[str, str]] = None,
+        dns_ttl: Optional[int] = 10,
+        retries: int = 0,
+        retry_backoff: float = 0.1,
+    ):
+        services = dict() if services is None else dict(services)
+        for value in (protocol, *services.values()):
+            if value not in PROTOCOLS:
+                raise ValueError(f"The protocol must be one of {PROTOCOLS!r}. Obtained: {value!r}")
+
+        if httpx is None and any(value != HTTP_1_1 for value in (protocol, *services.values())):
+            logger.warning("HTTP/2 upstream support requires the 'httpx[http2]' extra. Using HTTP/1.1 instead...")
+
+        self.protocol = protocol
+        self.services = services
+        self.sockets = dict() if sockets is None else dict(sockets)
+        self.dns_ttl = dns_ttl
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+
+        self._sessions = dict()
+        self._http2_clients = dict()
+        self._confirmed = set()
+        self._downgraded = set()
+        self._active = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def protocol_for(self, service: Optional[str]) -> str:
+        """Get the protocol to be used with the given service.
+
+        :param service: The service name.
+        :return: One of ``PROTOCOLS``.
+        """
+        protocol = self.services.get(service, self.protocol)
+        if protocol == HTTP_1_1 or httpx is None or service in self._downgraded:
+            return HTTP_1_1
+        return protocol
+
+    def replayable(self, service: Optional[str], method: Optional[str] = None) -> bool:
+        """Check if the requests to the given service may have to be sent more than once.
+
+        :param service: The service name.
+        :param method: The request method.
+        :return: ``True`` if the request body must be replayable or ``False`` otherwise.
+        """
+        if self.retries and method is not None and method.upper() in IDEMPOTENT_METHODS:
+            return True
+        return self.protocol_for(service) != HTTP_1_1 and service not in self._confirmed
+
+    def socket_for(self, service: Optional[str], address: str) -> Optional[str]:
+        """Get the Unix domain socket path to be used with the given service, if any.
+
+        :param service: The service name.
+        :param address: The address returned by the discovery, which can be a ``unix:<path>`` address.
+        :return: A filesystem path or ``None`` if the service must be reached through TCP.
+        """
+        if address.startswith(UNIX_ADDRESS_PREFIX):
+            return address.partition(UNIX_ADDRESS_PREFIX)[2]
+        return self.sockets.get(service)
+
+    async def request(
+        self,
+        method: str,
+        url: URL,
+        headers: CIMultiDict,
+        data: Union[bytes, StreamReader, SpooledBody, None],
+        service: Optional[str] = None,
+        socket: Optional[str] = None,
+    ) -> web.StreamResponse:
+        """Forward a request to an upstream microservice.
+
+        :param method: The request method.
+        :param url: The upstream url.
+        :param headers: The request headers.
+        :param data: The request body, which can be the stream of the inbound request to forward it chunk by chunk.
+            Streams cannot be sent twice, so a ``SpooledBody`` must be given if ``replayable`` is ``True``, which lets
+            the request be retried without reading the client connection again.
+        :param service: The service name, used to select the protocol.
+        :param socket: The Unix domain socket path to connect to instead of the url host.
+        :return: The web response to be retrieved to the client, whose body is streamed from the upstream response.
+        """
+        retries = 0
+        if method.upper() in IDEMPOTENT_METHODS and not isinstance(data, StreamReader):
+            retries = self.retries
+
+        attempt = 0
+        while True:
+            try:
+                return await self._send(method, url, headers, data, service, socket)
+            except _RETRYABLE_ERRORS as exc:
+                if attempt >= retries:
+                    if isinstance(exc, _UNAVAILABLE_ERRORS):
+                        raise web.HTTPServiceUnavailable(text="The requested endpoint is not available.")
+                    raise
+                logger.warning("Retrying %r request to %r after %r...", method, url, exc)
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+                attempt += 1
+
+    async def _send(
+        self,
+        method: str,
+        url: URL,
+        headers: CIMultiDict,
+        data: Union[bytes, StreamReader, SpooledBody, None],
+        service: Optional[str],
+        socket: Optional[str],
+    ) -> web.StreamResponse:
+        protocol = self.protocol_for(service)
+        if protocol != HTTP_1_1:
+            try:
+                response = await self._request_http2(protocol, method, url, headers, _payload(data), socket)
+                self._confirmed.add(service)
+                return response
+            except httpx.ConnectError:
+                raise  # The service is unavailable, so there is nothing to learn about its protocol support.
+            except (httpx.RemoteProtocolError, httpx.NetworkError):
+                # Only services that never answered over HTTP/2 are downgraded, so a request that may have been
+                # processed already is never sent twice.
+                if service in self._confirmed or isinstance(data, StreamReader):
+                    raise
+                logger.warning("The %r service does not support %r. Falling back to HTTP/1.1...", service, protocol)
+                self._downgraded.add(service)
+
+        session = self._get_session(socket)
+        response = await session.request(headers=headers, method=method, url=url, data=_payload(data))
+
+        return UpstreamResponse(
+            chunks=response.content.iter_any(),
+            release=self._track(_releaser(response)),
+            status=response.status,
+            reason=response.reason,
+            headers=response_headers(response.headers),
+            content_length=response.content_length,
+        )
+
+    def _track(self, release: Callable[[], Awaitable[None]]) -> Callable[[], Awaitable[None]]:
+        self._active += 1
+        self._idle.clear()
+
+        async def _release() -> None:
+            try:
+                await release()
+            finally:
+                self._active -= 1
+                if not self._active:
+                    self._idle.set()
+
+        return _release
+
+    def _get_session(self, socket: Optional[str] = None) -> ClientSession:
+        session = self._sessions.get(socket)
+        if session is None or session.closed:
+            if socket is None:
+                connector = TCPConnector(use_dns_cache=True, ttl_dns_cache=self.dns_ttl)
+            else:
+                connector = UnixConnector(path=socket)
+            # Only the encodings accepted by the client are forwarded, as the responses are not decompressed.
+            session = self._sessions[socket] = ClientSession(
+                connector=connector, auto_decompress=False, skip_auto_headers=("Accept-Encoding",)
+            )
+        return session
+
+    async def _request_http2(
+        self,
+        protocol: str,
+        method: str,
+        url: URL,
+        headers: CIMultiDict,
+        data: Union[bytes, StreamReader, AsyncIterator[bytes], None],
+        socket: Optional[str],
+    ) -> web.StreamResponse:
+        client = self._get_http2_client(protocol, socket)
+        if protocol == HTTP_2:
+            url = url.with_scheme("https")
+        headers = [(k, v) for k, v in headers.items() if k.lower() not in _HTTP2_EXCLUDED_HEADERS]
+        if isinstance(data, StreamReader):
+            data = data.iter_any()
+        request = client.build_request(method, str(url), headers=headers, content=data)
+        response = await client.send(request, stream=True)
+
+        content_length = response.headers.get("Content-Length")
+        return UpstreamResponse(
+            chunks=response.aiter_raw(),
+            release=self._track(response.aclose),
+            status=response.status_code,
+            reason=response.reason_phrase or None,
+            headers=response_headers(CIMultiDict(response.headers.multi_items())),
+            content_length=None if content_length is None else int(content_length),
+        )
+
+    def _get_http2_client(self, protocol: str, socket: Optional[str] = None) -> "httpx.AsyncClient":
+        key = (protocol, socket)
+        if key not in self._http2_clients:
+            # ``http1=False`` makes ``httpx`` use HTTP/2 with prior knowledge, which is how cleartext h2c works.
+            transport = httpx.AsyncHTTPTransport(http1=protocol != H2C, http2=True, uds=socket)
+            client = httpx.AsyncClient(transport=transport, timeout=_HTTP2_TIMEOUT)
+            del client.headers["Accept-Encoding"]
+            self._http2_clients[key] = client
+        return self._http2_clients[key]
+
+    async def close(self) -> None:
+        """Close all the underlying connections.
+
+        :return: This method does not return anything.
+        """
+        for session in self._sessions.values():
+            await session.close()
+        self._sessions.clear()
+
+        for client in self._http2_clients.values():
+            await client.aclose()
+        self._http2_clients.clear()
+
+    async def retire(self, timeout: float = _RETIRE_TIMEOUT) -> None:
+        """Close all the underlying connections once the responses being forwarded have been released.
+
+        :param timeout: The maximum number of seconds to wait before closing the connections anyway.
+        :return: This method does not return anything.
+        """
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Closing the retired upstream client with %d responses in progress...", self._active)
+        await self.close()
+
+    async def on_cleanup(self, app: web.Application) -> None:
+        """Close the connections as an ``aiohttp`` cleanup signal."""
+        await self.close()
+
+
+class UpstreamResponse(web.StreamResponse):
+    """Web response whose body is streamed from an upstream response.
+
+    The body chunks are written to the client as they are received from the upstream connection, so the payload is
+    never concatenated in memory. The chunks are only consumed when ``aiohttp`` finishes the response, so the
+    middlewares are still able to update the headers of the returned response. The upstream response is released
+    once the body has been forwarded or the client has gone.
+    """
+
+    def __init__(
+        self,
+        chunks: AsyncIterator[bytes],
+        release: Callable[[], Awaitable[None]],
+        status: int = 200,
+        reason: Optional[str] = None,
+        headers: Optional[CIMultiDict] = None,
+        content_length: Optional[int] = None,
+    ):
+        super().__init__(status=status, reason=reason, headers=headers)
+        if content_length is not None:
+            self.content_length = content_length
+        self._chunks = chunks
+        self._release = release
+
+    async def prepare(self, request):
+        try:
+            return await super().prepare(request)
+        except BaseException:
+            await self._close()
+            raise
+
+    async def write_eof(self, data: bytes = b"") -> None:
+        chunks, self._chunks = self._chunks, None
+        if chunks is not None:
+            try:
+                async for chunk in chunks:
+                    await self.write(chunk)
+            finally:
+                await self._close()
+        await super().write_eof(data)
+
+    async def _close(self) -> None:
+        release, self._release = self._release, None
+        if release is not None:
+            await release()
+
+
+def _payload(
+    data: Union[bytes, StreamReader, SpooledBody, None]
+) -> Union[bytes, StreamReader, AsyncIterator[bytes], None]:
+    if isinstance(data, SpooledBody):
+        return data.chunks()
+    return data
+
+
+def _releaser(response: ClientResponse) -> Callable[[], Awaitable[None]]:
+    async def _release() -> None:
+        response.release()
+
+    return _release
+
+
+async def clone_response(response: ClientResponse) -> web.Response:
+    """Build a web response from an upstream ``aiohttp`` response.
+
+    :param response: The upstream response.
+    :return: A ``web.Response`` instance.
+    """
+    return web.Response(
+        body=await response.read(),
+        status=response.status,
+        reason=response.reason,
+        headers=response_headers(response.headers),
+    )
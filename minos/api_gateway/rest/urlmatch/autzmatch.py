@@ -1,3 +1,7 @@
+from typing import (
+    Any,
+)
+
 from ..database.models import (
     AutzRuleDTO,
 )
@@ -8,13 +12,9 @@ from .urlmatch import (
 
 class AutzMatch(UrlMatch):
     @staticmethod
-    def match(url: str, role: int, method: str, records: list[AutzRuleDTO]) -> bool:
+    def match(url: str, role: Any, method: str, records: list[AutzRuleDTO]) -> bool:
         for record in records:
-            if AutzMatch.urlmatch(record.rule, url):
-                if record.roles is None:  # pragma: no cover
-                    return True
-                else:
-                    if role in record.roles or "*" in record.roles:
-                        return True
+            if record.role_set.allows(role) and AutzMatch.urlmatch(record.rule, url):
+                return True
 
         return False
@@ -0,0 +1,65 @@
+from collections import (
+    namedtuple,
+)
+from typing import (
+    Any,
+)
+
+from ..database.models import (
+    AuthRuleDTO,
+    AutzRuleDTO,
+)
+from .roles import (
+    NO_ROLE,
+)
+from .urlmatch import (
+    UrlMatch,
+)
+
+
+class AuthDecision(namedtuple("AuthDecision", "authenticate authorize roles")):
+    """The access decision for a request.
+
+    ``authenticate`` tells if the request needs a valid token, and ``authorize`` if the role of the user must also be
+    checked, against ``roles``: the ``RoleSet`` allowed by the rules.
+    """
+
+    def allows(self, role: Any) -> bool:
+        """Check if the given role is allowed.
+
+        :param role: The role of the user, or a list of roles if the user has many of them.
+        :return: ``True`` if the role is allowed or ``False`` otherwise.
+        """
+        return not self.authorize or self.roles.allows(role)
+
+
+class DecisionMatch(UrlMatch):
+    @staticmethod
+    def match(url: str, method: str, auth_records: list[AuthRuleDTO], autz_records: list[AutzRuleDTO]) -> AuthDecision:
+        """Decide the access to the given url and method in a single pass over the rules.
+
+        :param url: The requested url.
+        :param method: The requested method.
+        :param auth_records: The authentication rules of the requested service.
+        :param autz_records: The authorization rules of the requested service.
+        :return: An ``AuthDecision`` instance.
+        """
+        authenticate = any(
+            _allows_method(record, method) and DecisionMatch.urlmatch(record.rule, url) for record in auth_records
+        )
+
+        authorize, roles = False, NO_ROLE
+        for record in autz_records:
+            if not DecisionMatch.urlmatch(record.rule, url):
+                continue
+            authorize = authorize or _allows_method(record, method)
+            # The role is checked against every rule of the url, whatever its methods.
+            roles = roles.union(record.role_set)
+
+        if not authorize:
+            return AuthDecision(authenticate, False, NO_ROLE)
+        return AuthDecision(True, True, roles)
+
+
+def _allows_method(record: Any, method: str) -> bool:
+    return record.methods is None or method in record.methods or "*" in record.methods
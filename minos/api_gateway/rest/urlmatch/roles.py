@@ -0,0 +1,58 @@
+from collections import (
+    namedtuple,
+)
+from typing import (
+    Any,
+    Iterable,
+    Optional,
+)
+
+
+class RoleSet(namedtuple("RoleSet", "roles any")):
+    """The roles allowed by a rule, compiled once so every check is a constant time lookup.
+
+    The roles are compared as strings, as they are usually stored as numbers but may be received as strings. The
+    ``"*"`` wildcard, or a missing list of roles, allows any role, which is kept as the ``any`` flag.
+    """
+
+    @classmethod
+    def from_roles(cls, roles: Optional[Iterable[Any]]) -> "RoleSet":
+        """Build the role set of a rule.
+
+        :param roles: The roles of the rule.
+        :return: A ``RoleSet`` instance.
+        """
+        if roles is None:
+            return ANY_ROLE
+        roles = frozenset(str(role) for role in roles)
+        if "*" in roles:
+            return ANY_ROLE
+        return cls(roles, False)
+
+    def allows(self, role: Any) -> bool:
+        """Check if a user is allowed.
+
+        :param role: The role of the user, or a list of roles if the user has many of them.
+        :return: ``True`` if the user has any of the allowed roles, or ``False`` otherwise.
+        """
+        if self.any:
+            return True
+        if role is None:
+            return False
+        if isinstance(role, (list, tuple, set, frozenset)):
+            return not self.roles.isdisjoint(str(value) for value in role)
+        return str(role) in self.roles
+
+    def union(self, other: "RoleSet") -> "RoleSet":
+        """Build the role set that allows the roles of both sets.
+
+        :param other: The other role set.
+        :return: A ``RoleSet`` instance.
+        """
+        if self.any or other.any:
+            return ANY_ROLE
+        return RoleSet(self.roles | other.roles, False)
+
+
+ANY_ROLE = RoleSet(frozenset(), True)
+NO_ROLE = RoleSet(frozenset(), False)
@@ -0,0 +1,77 @@
+from collections import (
+    namedtuple,
+)
+from typing import (
+    Optional,
+)
+
+from yarl import (
+    URL,
+)
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+class RequestTarget(namedtuple("RequestTarget", "scheme host path")):
+    """The normalized target of a request, which is what the rules are matched against.
+
+    The query and the fragment are dropped, the host is lowercased (keeping the port only if it is not the default one
+    of the scheme) and the path is percent-decoded once, including the encoded slashes, with its empty and dot segments
+    resolved. So every spelling of a path is matched as the same one, and the decisions taken for it can be reused.
+
+    The target is also what the request is routed and forwarded to, so the rules are always checked against the same
+    service and path that receive the request. That is why the paths with encoded slashes are rejected (see
+    ``has_encoded_slash``), as they cannot be forwarded as decoded without changing their meaning.
+    """
+
+    @classmethod
+    def from_url(cls, url: URL) -> "RequestTarget":
+        """Build the target of a request from its url.
+
+        :param url: The requested url.
+        :return: A ``RequestTarget`` instance.
+        """
+        scheme = url.scheme.lower()
+
+        host = (url.host or "").lower()
+        if url.explicit_port is not None and url.explicit_port != _DEFAULT_PORTS.get(scheme):
+            host = f"{host}:{url.explicit_port}"
+
+        segments = list()
+        for segment in url.path.split("/"):
+            if segment == "..":
+                if segments:
+                    segments.pop()
+            elif segment not in ("", "."):
+                segments.append(segment)
+        path = "/" + "/".join(segments)
+        if segments and url.path.endswith("/"):
+            path += "/"
+
+        return cls(scheme, host, path)
+
+    @property
+    def service(self) -> Optional[str]:
+        """Get the service name, which is the first segment of the path.
+
+        :return: The service name, or ``None`` if the path is empty.
+        """
+        service = self.path.split("/", 2)[1]
+        return service or None
+
+    @property
+    def url(self) -> str:
+        """Get the normalized url.
+
+        :return: The url as a string.
+        """
+        return f"{self.scheme}://{self.host}{self.path}"
+
+
+def has_encoded_slash(url: URL) -> bool:
+    """Check if the path of the given url has encoded slashes, which become separators once the path is decoded.
+
+    :param url: The requested url.
+    :return: ``True`` if the path has encoded slashes or ``False`` otherwise.
+    """
+    return "%2f" in url.raw_path.lower()
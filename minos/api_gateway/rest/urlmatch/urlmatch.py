@@ -15,6 +15,7 @@ urlmatch(match_pattern, 'http://bad.com/') # False
 <path> := '/' <any chars>
 
 """
+import functools
 import re
 
 
@@ -83,6 +84,25 @@ class UrlMatch:
 
         return pattern_regex
 
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def compile_match_pattern(match_pattern, **kwargs):
+        """
+        Returns the compiled regular expression for a given match pattern,
+        which is cached, so every rule is only parsed once.
+
+        Args:
+            match_pattern: a comma separated list of `urlmatch` formatted
+                match patterns
+
+        Returns:
+            a compiled regular expression
+        """
+        patterns = map(str.strip, match_pattern.split(","))
+        regex = "({})".format("|".join(map(lambda x: UrlMatch.parse_match_pattern(x, **kwargs), patterns)))
+        # The paths are decoded, so they may contain new lines that must be matched by the wildcards too.
+        return re.compile(regex, re.DOTALL)
+
     @staticmethod
     def urlmatch(match_pattern, url, **kwargs):
         """
@@ -93,7 +113,7 @@ class UrlMatch:
             url: a url
         """
         if isinstance(match_pattern, str):
-            match_pattern = map(str.strip, match_pattern.split(","))
+            return bool(UrlMatch.compile_match_pattern(match_pattern, **kwargs).search(url))
 
         regex = "({})".format("|".join(map(lambda x: UrlMatch.parse_match_pattern(x, **kwargs), match_pattern)))
 
@@ -0,0 +1,136 @@
+"""tests.test_api_gateway.test_rest.test_access_log module."""
+
+import asyncio
+import json
+import logging
+import unittest
+from unittest.mock import (
+    MagicMock,
+)
+
+from aiohttp import (
+    web,
+)
+from aiohttp.test_utils import (
+    AioHTTPTestCase,
+)
+
+from minos.api_gateway.rest.access_log import (
+    AccessLogger,
+    JsonFormatter,
+)
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = list()
+        self.setFormatter(JsonFormatter())
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(self.format(record))
+
+
+class TestJsonFormatter(unittest.TestCase):
+    def test_format(self):
+        record = logging.LogRecord("foo", logging.INFO, __file__, 1, "hello %s", ("world",), None)
+        record.access = {"status": 200}
+
+        observed = json.loads(JsonFormatter().format(record))
+
+        self.assertEqual("hello world", observed["message"])
+        self.assertEqual("INFO", observed["level"])
+        self.assertEqual(200, observed["status"])
+
+
+class TestAccessLogger(unittest.TestCase):
+    def setUp(self) -> None:
+        self.handler = _ListHandler()
+
+    def _request(self):
+        request = MagicMock(method="GET", path="/order/5", remote="127.0.0.1")
+        return request
+
+    def test_invalid_sample_rate(self):
+        with self.assertRaises(ValueError):
+            AccessLogger(sample_rate=1.5)
+
+    def test_log(self):
+        access_logger = AccessLogger(handler=self.handler, name="tests.access.log")
+        access_logger.start()
+        access_logger.log(self._request(), 200, 0.0125)
+        access_logger.stop()
+
+        self.assertEqual(1, len(self.handler.records))
+        observed = json.loads(self.handler.records[0])
+        self.assertEqual("GET", observed["method"])
+        self.assertEqual("/order/5", observed["path"])
+        self.assertEqual(200, observed["status"])
+        self.assertEqual(12.5, observed["duration_ms"])
+
+    def test_log_sampled_out(self):
+        access_logger = AccessLogger(sample_rate=0.0, handler=self.handler, name="tests.access.sampled")
+        access_logger.start()
+        access_logger.log(self._request(), 200, 0.01)
+        access_logger.stop()
+
+        self.assertEqual(0, len(self.handler.records))
+
+    def test_log_disabled_level(self):
+        access_logger = AccessLogger(handler=self.handler, name="tests.access.disabled")
+        access_logger.logger.setLevel(logging.WARNING)
+        access_logger.start()
+        access_logger.log(self._request(), 200, 0.01)
+        access_logger.stop()
+
+        self.assertEqual(0, len(self.handler.records))
+
+
+class TestAccessLoggerMiddleware(AioHTTPTestCase):
+    async def get_application(self):
+        self.handler = _ListHandler()
+        self.access_logger = AccessLogger(handler=self.handler, name="tests.access.middleware")
+
+        async def _ok(request):
+            return web.json_response({"ok": True})
+
+        async def _not_found(request):
+            raise web.HTTPNotFound()
+
+        async def _stream(request):
+            async def _chunks():
+                for _ in range(2):
+                    await asyncio.sleep(0.05)
+                    yield b"x"
+
+            return web.Response(body=_chunks())
+
+        app = web.Application(middlewares=[self.access_logger.middleware()])
+        app.router.add_route("GET", "/ok", _ok)
+        app.router.add_route("GET", "/stream", _stream)
+        app.router.add_route("GET", "/missing", _not_found)
+        app.on_startup.append(self.access_logger.on_startup)
+        app.on_cleanup.append(self.access_logger.on_cleanup)
+        return app
+
+    async def test_middleware(self):
+        await self.client.get("/ok")
+        await self.client.get("/missing")
+        self.access_logger.stop()
+
+        observed = [json.loads(record) for record in self.handler.records]
+        self.assertEqual([200, 404], [record["status"] for record in observed])
+        self.assertEqual(["/ok", "/missing"], [record["path"] for record in observed])
+
+    async def test_middleware_streamed_body(self):
+        response = await self.client.get("/stream")
+        self.assertEqual(b"xx", await response.read())
+        self.access_logger.stop()
+
+        observed = json.loads(self.handler.records[0])
+        self.assertEqual(200, observed["status"])
+        self.assertGreaterEqual(observed["duration_ms"], 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
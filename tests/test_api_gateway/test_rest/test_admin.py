@@ -4,6 +4,9 @@ import unittest
 from unittest import (
     mock,
 )
+from uuid import (
+    uuid4,
+)
 
 from aiohttp.test_utils import (
     AioHTTPTestCase,
@@ -153,6 +156,8 @@ class TestApiGatewayAdminRules(AioHTTPTestCase):
     @mock.patch.dict(os.environ, {"API_GATEWAY_REST_CORS_ENABLED": "true"})
     def setUp(self) -> None:
         self.config = ApiGatewayConfig(self.CONFIG_FILE_PATH)
+        # The rules are unique by service and rule, so each test uses its own service and can be run again.
+        self.service = f"merchants-{uuid4().hex}"
         super().setUp()
 
     def tearDown(self) -> None:
@@ -183,7 +188,7 @@ class TestApiGatewayAdminRules(AioHTTPTestCase):
         response = await self.client.request(
             "POST",
             url,
-            data=json.dumps({"service": "merchants", "rule": "*://*/merchants/*", "methods": ["GET", "POST"]}),
+            data=json.dumps({"service": self.service, "rule": "*://*/merchants/*", "methods": ["GET", "POST"]}),
         )
 
         self.assertEqual(200, response.status)
@@ -195,7 +200,7 @@ class TestApiGatewayAdminRules(AioHTTPTestCase):
         res = await self.client.request(
             "POST",
             url,
-            data=json.dumps({"service": "merchants", "rule": "test_rule_update", "methods": ["GET", "POST"]}),
+            data=json.dumps({"service": self.service, "rule": "test_rule_update", "methods": ["GET", "POST"]}),
         )
 
         data = json.loads(await res.text())
@@ -207,7 +212,9 @@ class TestApiGatewayAdminRules(AioHTTPTestCase):
         response = await self.client.request(
             "PATCH",
             url,
-            data=json.dumps({"service": "merchants_modified", "rule": "*://*/merchants/*", "methods": ["GET", "POST"]}),
+            data=json.dumps(
+                {"service": f"{self.service}_modified", "rule": "*://*/merchants/*", "methods": ["GET", "POST"]}
+            ),
         )
 
         self.assertEqual(200, response.status)
@@ -219,7 +226,7 @@ class TestApiGatewayAdminRules(AioHTTPTestCase):
         res = await self.client.request(
             "POST",
             url,
-            data=json.dumps({"service": "merchants", "rule": "test_rule_delete", "methods": ["GET", "POST"]}),
+            data=json.dumps({"service": self.service, "rule": "test_rule_delete", "methods": ["GET", "POST"]}),
         )
 
         data = json.loads(await res.text())
@@ -239,6 +246,8 @@ class TestApiGatewayAdminAutzRules(AioHTTPTestCase):
     @mock.patch.dict(os.environ, {"API_GATEWAY_REST_CORS_ENABLED": "true"})
     def setUp(self) -> None:
         self.config = ApiGatewayConfig(self.CONFIG_FILE_PATH)
+        # The rules are unique by service and rule, so each test uses its own service and can be run again.
+        self.service = f"abc-{uuid4().hex}"
         super().setUp()
 
     def tearDown(self) -> None:
@@ -269,7 +278,9 @@ class TestApiGatewayAdminAutzRules(AioHTTPTestCase):
         response = await self.client.request(
             "POST",
             url,
-            data=json.dumps({"service": "abc", "roles": ["*"], "rule": "*://*/abc/*", "methods": ["GET", "POST"]}),
+            data=json.dumps(
+                {"service": self.service, "roles": ["*"], "rule": "*://*/abc/*", "methods": ["GET", "POST"]}
+            ),
         )
 
         self.assertEqual(200, response.status)
@@ -282,7 +293,7 @@ class TestApiGatewayAdminAutzRules(AioHTTPTestCase):
             "POST",
             url,
             data=json.dumps(
-                {"service": "abcd", "roles": ["*"], "rule": "test_rule_update", "methods": ["GET", "POST"]}
+                {"service": self.service, "roles": ["*"], "rule": "test_rule_update", "methods": ["GET", "POST"]}
             ),
         )
 
@@ -295,7 +306,9 @@ class TestApiGatewayAdminAutzRules(AioHTTPTestCase):
         response = await self.client.request(
             "PATCH",
             url,
-            data=json.dumps({"service": "abcde_modified", "rule": "*://*/abcde/*", "methods": ["GET", "POST"]}),
+            data=json.dumps(
+                {"service": f"{self.service}_modified", "rule": "*://*/abcde/*", "methods": ["GET", "POST"]}
+            ),
         )
 
         self.assertEqual(200, response.status)
@@ -308,7 +321,7 @@ class TestApiGatewayAdminAutzRules(AioHTTPTestCase):
             "POST",
             url,
             data=json.dumps(
-                {"service": "efg", "roles": ["*"], "rule": "efg_test_rule_delete", "methods": ["GET", "POST"]}
+                {"service": self.service, "roles": ["*"], "rule": "efg_test_rule_delete", "methods": ["GET", "POST"]}
             ),
         )
 
@@ -323,5 +336,252 @@ class TestApiGatewayAdminAutzRules(AioHTTPTestCase):
         self.assertEqual(200, response.status)
 
 
+class TestApiGatewayAdminRulesListing(AioHTTPTestCase):
+    CONFIG_FILE_PATH = BASE_PATH / "config.yml"
+
+    def setUp(self) -> None:
+        self.config = ApiGatewayConfig(self.CONFIG_FILE_PATH)
+        self.service = f"listing-{uuid4().hex}"
+        super().setUp()
+
+    async def get_application(self):
+        rest_service = ApiGatewayRestService(
+            address=self.config.rest.host, port=self.config.rest.port, config=self.config
+        )
+
+        return await rest_service.create_application()
+
+    async def asyncSetUp(self) -> None:
+        await super().asyncSetUp()
+        for rule, methods in (("/a/*", ["GET"]), ("/b/*", ["*"]), ("/c/*", ["POST"]), ("/a_b", ["PUT"])):
+            data = {"service": self.service, "rule": rule, "methods": methods}
+            await self.client.post("/admin/rules", data=json.dumps(data))
+            roles = ["*"] if methods == ["*"] else [3]
+            await self.client.post("/admin/autz-rules", data=json.dumps({**data, "roles": roles}))
+
+    async def test_paginate(self):
+        response = await self.client.get("/admin/rules", params={"service": self.service, "limit": 3, "count": "true"})
+
+        self.assertEqual(200, response.status)
+        self.assertEqual(3, len(await response.json()))
+        self.assertEqual("4", response.headers["X-Total-Count"])
+
+        response = await self.client.get(response.links["next"]["url"].relative())
+
+        self.assertEqual(1, len(await response.json()))
+        self.assertNotIn("Link", response.headers)
+        self.assertNotIn("X-Total-Count", response.headers)
+
+    async def test_project_and_sort(self):
+        response = await self.client.get(
+            "/admin/rules", params={"service": self.service, "fields": "rule", "sort": "-rule"}
+        )
+
+        expected = [{"rule": "/c/*"}, {"rule": "/b/*"}, {"rule": "/a_b"}, {"rule": "/a/*"}]
+        self.assertEqual(expected, await response.json())
+
+    async def test_filter(self):
+        params = {"service": self.service, "fields": "rule", "sort": "rule"}
+
+        response = await self.client.get("/admin/rules", params={**params, "method": "GET"})
+        self.assertEqual([{"rule": "/a/*"}, {"rule": "/b/*"}], await response.json())
+
+        response = await self.client.get("/admin/rules", params={**params, "rule": "/a_"})
+        self.assertEqual([{"rule": "/a_b"}], await response.json())
+
+        response = await self.client.get("/admin/autz-rules", params={**params, "role": "3", "method": "PUT"})
+        self.assertEqual([{"rule": "/a_b"}, {"rule": "/b/*"}], await response.json())
+
+    async def test_filter_without_lists(self):
+        # The rules without methods or roles apply to any of them.
+        data = {"service": self.service, "rule": "/d/*", "methods": None}
+        await self.client.post("/admin/rules", data=json.dumps(data))
+        await self.client.post("/admin/autz-rules", data=json.dumps({**data, "roles": None}))
+        params = {"service": self.service, "fields": "rule", "sort": "rule"}
+
+        response = await self.client.get("/admin/rules", params={**params, "method": "DELETE"})
+        self.assertEqual([{"rule": "/b/*"}, {"rule": "/d/*"}], await response.json())
+
+        response = await self.client.get("/admin/autz-rules", params={**params, "role": "7", "method": "DELETE"})
+        self.assertEqual([{"rule": "/b/*"}, {"rule": "/d/*"}], await response.json())
+
+    async def test_wrong_params(self):
+        for params in ({"sort": "methods"}, {"fields": "password"}, {"limit": "0"}, {"after": "foo"}):
+            response = await self.client.get("/admin/rules", params=params)
+
+            self.assertEqual(400, response.status)
+            self.assertIn("error", await response.json())
+
+    async def test_wrong_filters(self):
+        for params in ({"method": "GE T"}, {"method": ""}, {"role": ""}, {"role": "\x00"}, {"role": "9" * 20}):
+            response = await self.client.get("/admin/autz-rules", params=params)
+
+            self.assertEqual(400, response.status)
+            self.assertIn("error", await response.json())
+
+
+class TestApiGatewayAdminRulesBulk(AioHTTPTestCase):
+    CONFIG_FILE_PATH = BASE_PATH / "config.yml"
+
+    def setUp(self) -> None:
+        self.config = ApiGatewayConfig(self.CONFIG_FILE_PATH)
+        self.service = f"bulk-{uuid4().hex}"
+        super().setUp()
+
+    async def get_application(self):
+        rest_service = ApiGatewayRestService(
+            address=self.config.rest.host, port=self.config.rest.port, config=self.config
+        )
+
+        return await rest_service.create_application()
+
+    def _rules(self, *rules, **kwargs):
+        return [{"service": self.service, "rule": rule, "methods": ["GET"], **kwargs} for rule in rules]
+
+    async def test_import(self):
+        response = await self.client.post("/admin/rules/import", json=self._rules("/a", "/b", "/c"))
+
+        self.assertEqual(200, response.status)
+        self.assertEqual({"created": 3, "updated": 0, "deleted": 0, "unchanged": 0}, await response.json())
+
+        entries = [
+            *self._rules("/a"),
+            *self._rules("/b", methods=["POST"]),
+            *self._rules("/c", op="delete"),
+            *self._rules("/d"),
+        ]
+        response = await self.client.post("/admin/rules/import", json=entries)
+
+        self.assertEqual({"created": 1, "updated": 1, "deleted": 1, "unchanged": 1}, await response.json())
+
+        response = await self.client.get("/admin/rules", params={"service": self.service, "fields": "rule,methods"})
+        expected = [
+            {"rule": "/a", "methods": ["GET"]},
+            {"rule": "/b", "methods": ["POST"]},
+            {"rule": "/d", "methods": ["GET"]},
+        ]
+        self.assertEqual(expected, await response.json())
+
+    async def test_import_dry_run(self):
+        await self.client.post("/admin/rules/import", json=self._rules("/a"))
+
+        entries = self._rules("/a", methods=["POST"]) + self._rules("/b")
+        response = await self.client.post("/admin/rules/import", params={"dry_run": "true"}, json=entries)
+
+        observed = await response.json()
+        self.assertEqual([{"service": self.service, "rule": "/b", "methods": ["GET"]}], observed["created"])
+        self.assertEqual(
+            [{"service": self.service, "rule": "/a", "changes": {"methods": [["GET"], ["POST"]]}}], observed["updated"]
+        )
+
+        response = await self.client.get("/admin/rules", params={"service": self.service, "fields": "rule,methods"})
+        self.assertEqual([{"rule": "/a", "methods": ["GET"]}], await response.json())
+
+    async def test_import_ndjson(self):
+        roles = {"roles": [1]}
+        body = "\n".join(json.dumps(entry) for entry in self._rules("/a", "/b", **roles))
+
+        response = await self.client.post(
+            "/admin/autz-rules/import", data=body, headers={"Content-Type": "application/x-ndjson"}
+        )
+
+        self.assertEqual({"created": 2, "updated": 0, "deleted": 0, "unchanged": 0}, await response.json())
+
+    async def test_import_wrong(self):
+        for entries in (
+            {"rules": []},
+            [{"service": self.service}],
+            self._rules("/a", op="merge"),
+            self._rules("/a", methods="GET"),
+        ):
+            response = await self.client.post("/admin/rules/import", json=entries)
+
+            self.assertEqual(400, response.status)
+
+        response = await self.client.get("/admin/rules", params={"service": self.service})
+        self.assertEqual([], await response.json())
+
+    async def test_export(self):
+        await self.client.post("/admin/rules/import", json=self._rules("/a", "/b"))
+
+        response = await self.client.get("/admin/rules/export", params={"service": self.service})
+        self.assertEqual(["/a", "/b"], [rule["rule"] for rule in await response.json()])
+
+        response = await self.client.get(
+            "/admin/rules/export", params={"service": self.service}, headers={"Accept": "application/x-ndjson"}
+        )
+        self.assertEqual("application/x-ndjson", response.content_type)
+        lines = (await response.text()).splitlines()
+        self.assertEqual(["/a", "/b"], [json.loads(line)["rule"] for line in lines])
+
+    async def test_export_empty(self):
+        response = await self.client.get("/admin/autz-rules/export", params={"service": self.service})
+
+        self.assertEqual([], await response.json())
+
+
+class TestApiGatewayAdminRulesImportLimits(AioHTTPTestCase):
+    CONFIG_FILE_PATH = BASE_PATH / "config.yml"
+
+    @mock.patch.dict(
+        os.environ, {"API_GATEWAY_REST_BODY_MAX_SIZE": "1024", "API_GATEWAY_RULES_IMPORT_MAX_SIZE": "16384"},
+    )
+    def setUp(self) -> None:
+        self.config = ApiGatewayConfig(self.CONFIG_FILE_PATH)
+        self.service = f"limits-{uuid4().hex}"
+        super().setUp()
+
+    async def get_application(self):
+        rest_service = ApiGatewayRestService(
+            address=self.config.rest.host, port=self.config.rest.port, config=self.config
+        )
+
+        return await rest_service.create_application()
+
+    def _rules(self, count):
+        return [{"service": self.service, "rule": f"/{index}", "methods": ["GET"]} for index in range(count)]
+
+    async def test_import_ndjson(self):
+        body = "\n".join(json.dumps(entry) for entry in self._rules(50))
+        self.assertGreater(len(body), self.config.rest.body.max_size)
+
+        response = await self.client.post(
+            "/admin/rules/import", data=body, headers={"Content-Type": "application/x-ndjson"}
+        )
+
+        self.assertEqual({"created": 50, "updated": 0, "deleted": 0, "unchanged": 0}, await response.json())
+
+    async def test_import_json(self):
+        response = await self.client.post("/admin/rules/import", json=self._rules(50))
+
+        self.assertEqual({"created": 50, "updated": 0, "deleted": 0, "unchanged": 0}, await response.json())
+
+    async def test_import_too_large(self):
+        body = "\n".join(json.dumps(entry) for entry in self._rules(500))
+
+        async def _chunks():
+            yield body.encode()
+
+        response = await self.client.post(
+            "/admin/rules/import", data=body, headers={"Content-Type": "application/x-ndjson"}
+        )
+        self.assertEqual(413, response.status)
+
+        response = await self.client.post(
+            "/admin/rules/import", data=_chunks(), headers={"Content-Type": "application/x-ndjson"}
+        )
+        self.assertEqual(413, response.status)
+
+        response = await self.client.get("/admin/rules", params={"service": self.service})
+        self.assertEqual([], await response.json())
+
+    async def test_body_limit(self):
+        rule = {"service": self.service, "rule": "/" + "x" * 2048, "methods": ["GET"]}
+
+        response = await self.client.post("/admin/rules", json=rule)
+
+        self.assertEqual(413, response.status)
+
+
 if __name__ == "__main__":
     unittest.main()
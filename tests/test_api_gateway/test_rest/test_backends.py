@@ -0,0 +1,254 @@
+"""tests.test_api_gateway.test_rest.test_backends module."""
+
+import os
+import tempfile
+import unittest
+from datetime import (
+    datetime,
+)
+from pathlib import (
+    Path,
+)
+from unittest import (
+    mock,
+)
+
+from aiohttp.test_utils import (
+    AioHTTPTestCase,
+)
+from sqlalchemy import (
+    text,
+)
+
+from minos.api_gateway.rest import (
+    ApiGatewayConfig,
+    ApiGatewayConfigException,
+    ApiGatewayRestService,
+)
+from minos.api_gateway.rest.database.backends import (
+    FileRuleBackend,
+    RuleBackend,
+    build_backend,
+)
+from minos.api_gateway.rest.database.models import (
+    AuthRule,
+)
+from minos.api_gateway.rest.database.repository import (
+    AUTH_RULES,
+    ReadOnlyRepository,
+)
+from minos.api_gateway.rest.exceptions import (
+    ReadOnlyRulesException,
+)
+from tests.utils import (
+    BASE_PATH,
+)
+
+RULES = """
+auth_rules:
+  - service: order
+    rule: /order/*
+    methods: [GET]
+  - service: "*"
+    rule: /health
+    methods: ["*"]
+autz_rules:
+  - service: order
+    rule: /order/*
+    roles: [1, 2]
+    methods: [POST]
+"""
+
+
+class TestSqliteRuleBackend(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        config = ApiGatewayConfig(
+            BASE_PATH / "config.yml",
+            api_gateway_database_backend="sqlite",
+            api_gateway_database_path=str(Path(self.directory.name) / "api_gateway.db"),
+        )
+        self.backend = build_backend(config.database)
+        self.backend.setup()
+        self.repository = self.backend.repository()
+
+    def tearDown(self) -> None:
+        self.repository.close()
+        self.backend.dispose()
+        self.directory.cleanup()
+
+    def test_build(self):
+        self.assertIsInstance(self.backend, RuleBackend)
+        self.assertFalse(self.backend.read_only)
+        with self.backend.engine.connect() as connection:
+            self.assertEqual("wal", connection.execute(text("PRAGMA journal_mode")).scalar())
+
+    def test_rules(self):
+        now = datetime.now()
+        record = self.repository.create_auth_rule(
+            AuthRule(service="order", rule="/order/*", methods=["GET"], created_at=now, updated_at=now)
+        )
+        self.repository.import_autz_rules(
+            [
+                {"service": "order", "rule": "/order/*", "roles": [1], "methods": ["GET"]},
+                {"service": "order", "rule": "/order/admin", "roles": ["*"], "methods": ["*"]},
+                {"service": "order", "rule": "/order/other", "roles": [2], "methods": ["GET"]},
+            ]
+        )
+        self.repository.update_auth_rule(id=record["id"], methods=["POST"])
+
+        self.assertEqual(["/order/*"], [r["rule"] for r in self.repository.list_auth_rules(method="POST").records])
+        self.assertEqual([], self.repository.list_auth_rules(method="GET").records)
+        self.repository.update_auth_rule(id=record["id"], methods=None)
+        self.assertEqual(["/order/*"], [r["rule"] for r in self.repository.list_auth_rules(method="GET").records])
+
+        page = self.repository.list_autz_rules(fields=("rule",), role="1", sort="-rule", limit=1, count=True)
+        self.assertEqual(([{"rule": "/order/admin"}], 2), (page.records, page.total))
+        page = self.repository.list_autz_rules(fields=("rule",), role="1", sort="-rule", after=page.cursor)
+        self.assertEqual([{"rule": "/order/*"}], page.records)
+
+        changes = self.repository.get_rule_changes(0)
+        self.assertEqual(4, changes.version)
+        self.assertIn((AUTH_RULES, "order"), changes.changes)
+
+    def test_paginate_by_timestamp(self):
+        ids = list()
+        for i, second in enumerate((5, 1, 3, 1, 4, 2, 0)):
+            when = datetime(2021, 6, 1, 12, 30, second)
+            record = self.repository.create_auth_rule(
+                AuthRule(service="order", rule=f"/order/{i}", methods=["GET"], created_at=when, updated_at=when)
+            )
+            ids.append((when, record["id"]))
+
+        for sort, descending in (("created_at", False), ("-created_at", True)):
+            with self.subTest(sort=sort):
+                observed, cursor = list(), None
+                for _ in range(len(ids)):
+                    page = self.repository.list_auth_rules(fields=("id",), sort=sort, limit=2, after=cursor)
+                    observed.extend(r["id"] for r in page.records)
+                    cursor = page.cursor
+                    if cursor is None:
+                        break
+                self.assertIsNone(cursor)
+                self.assertEqual([id_ for _, id_ in sorted(ids, reverse=descending)], observed)
+
+
+class TestFileRuleBackend(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / "rules.yml"
+        self.path.write_text(RULES)
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_build(self):
+        config = ApiGatewayConfig(
+            BASE_PATH / "config.yml", api_gateway_database_backend="file", api_gateway_database_path=str(self.path)
+        )
+        backend = build_backend(config.database)
+
+        self.assertIsInstance(backend, FileRuleBackend)
+        self.assertTrue(backend.read_only)
+        self.assertIsInstance(backend.repository(), ReadOnlyRepository)
+
+    def test_setup(self):
+        backend = FileRuleBackend(self.path)
+        backend.setup()
+
+        repository = backend.repository()
+        self.assertEqual(["*", "order"], sorted(rule.service for rule in repository.get_auth_rule_by_service("order")))
+        self.assertEqual([[1, 2]], [rule.roles for rule in repository.get_autz_rule_by_service("order")])
+
+    def test_read_only(self):
+        backend = FileRuleBackend(self.path)
+        backend.setup()
+
+        repository = backend.repository()
+        with self.assertRaises(ReadOnlyRulesException):
+            repository.delete_auth_rule(1)
+        with self.assertRaises(ReadOnlyRulesException):
+            repository.import_autz_rules([], dry_run=True)
+
+    def test_invalid(self):
+        self.path.write_text("auth_rules:\n  - service: order\n")
+        with self.assertRaises(ApiGatewayConfigException):
+            FileRuleBackend(self.path).setup()
+
+        self.path.write_text("auth_rules: [\n")
+        with self.assertRaises(ApiGatewayConfigException):
+            FileRuleBackend(self.path).setup()
+
+    def test_missing(self):
+        with self.assertRaises(ApiGatewayConfigException):
+            FileRuleBackend(Path(self.directory.name) / "missing.yml").setup()
+
+
+class TestApiGatewayRestServiceSqlite(AioHTTPTestCase):
+    async def get_application(self):
+        self.directory = tempfile.TemporaryDirectory()
+        environ = {
+            "API_GATEWAY_DATABASE_BACKEND": "sqlite",
+            "API_GATEWAY_DATABASE_PATH": str(Path(self.directory.name) / "api_gateway.db"),
+        }
+        with mock.patch.dict(os.environ, environ):
+            config = ApiGatewayConfig(BASE_PATH / "config.yml")
+        rest_service = ApiGatewayRestService(address=config.rest.host, port=config.rest.port, config=config)
+        return await rest_service.create_application()
+
+    async def asyncTearDown(self) -> None:
+        await super().asyncTearDown()
+        self.directory.cleanup()
+
+    async def test_rules(self):
+        rule = {"service": "order", "rule": "/order/*", "methods": ["GET"]}
+        response = await self.client.post("/admin/rules", json=rule)
+        self.assertEqual(200, response.status)
+
+        response = await self.client.get("/admin/rules", params={"method": "GET", "fields": "service,rule"})
+        self.assertEqual([{"service": "order", "rule": "/order/*"}], await response.json())
+        self.assertEqual(["/order/*"], [rule.rule for rule in self.app["rules"].auth_rules("order")])
+
+    async def test_rules_cache(self):
+        response = await self.client.get("/admin/rules/cache")
+
+        self.assertEqual(200, response.status)
+        stats = await response.json()
+        self.assertEqual(10000, stats["max_size"])
+        self.assertEqual(0, stats["size"])
+
+
+class TestApiGatewayRestServiceFile(AioHTTPTestCase):
+    async def get_application(self):
+        self.directory = tempfile.TemporaryDirectory()
+        path = Path(self.directory.name) / "rules.yml"
+        path.write_text(RULES)
+
+        config = ApiGatewayConfig(
+            BASE_PATH / "config.yml", api_gateway_database_backend="file", api_gateway_database_path=str(path)
+        )
+        rest_service = ApiGatewayRestService(address=config.rest.host, port=config.rest.port, config=config)
+        return await rest_service.create_application()
+
+    async def asyncTearDown(self) -> None:
+        await super().asyncTearDown()
+        self.directory.cleanup()
+
+    async def test_rules(self):
+        self.assertTrue(self.app["rules"].ready)
+        self.assertEqual(["/order/*", "/health"], [rule.rule for rule in self.app["rules"].auth_rules("order")])
+
+        response = await self.client.get("/admin/autz-rules", params={"fields": "rule,roles"})
+        self.assertEqual([{"rule": "/order/*", "roles": [1, 2]}], await response.json())
+
+    async def test_read_only(self):
+        response = await self.client.post("/admin/rules", json={"service": "a", "rule": "/a", "methods": ["GET"]})
+        self.assertEqual(400, response.status)
+
+        response = await self.client.post("/admin/rules/import", json=[])
+        self.assertEqual(400, response.status)
+        self.assertEqual({"error": "The rules are read-only."}, await response.json())
+
+
+if __name__ == "__main__":
+    unittest.main()
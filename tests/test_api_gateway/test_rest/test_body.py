@@ -0,0 +1,145 @@
+"""tests.test_api_gateway.test_rest.test_body module."""
+
+import tempfile
+import threading
+import unittest
+from unittest.mock import (
+    patch,
+)
+
+from aiohttp import (
+    web,
+)
+from aiohttp.test_utils import (
+    AioHTTPTestCase,
+)
+
+from minos.api_gateway.rest.body import (
+    BodyPolicy,
+    SpooledBody,
+)
+from minos.api_gateway.rest.reload import (
+    GatewayState,
+)
+from minos.api_gateway.rest.service import (
+    _body_middleware,
+)
+
+
+async def _collect(body: SpooledBody) -> bytes:
+    return b"".join([bytes(chunk) async for chunk in body.chunks(chunk_size=3)])
+
+
+class TestSpooledBody(unittest.IsolatedAsyncioTestCase):
+    async def test_in_memory(self):
+        body = SpooledBody(threshold=10)
+        await body.write(b"foo")
+        await body.write(b"bar")
+
+        self.assertFalse(body.spilled)
+        self.assertEqual(6, body.size)
+        self.assertEqual([b"foo", b"bar"], [chunk async for chunk in body.chunks()])
+        body.close()
+
+    async def test_spilled(self):
+        body = SpooledBody(threshold=4)
+        await body.write(b"foo")
+        await body.write(b"barbaz")
+
+        self.assertTrue(body.spilled)
+        self.assertEqual(9, body.size)
+        self.assertEqual(b"foobarbaz", await _collect(body))
+        self.assertEqual(b"foobarbaz", await _collect(body))
+        body.close()
+        self.assertFalse(body.spilled)
+
+    async def test_spilled_off_loop(self):
+        threads, temporary_file = list(), tempfile.TemporaryFile
+
+        def _temporary_file():
+            threads.append(threading.get_ident())
+            return temporary_file()
+
+        body = SpooledBody(threshold=4)
+        with patch("minos.api_gateway.rest.body.tempfile.TemporaryFile", _temporary_file):
+            await body.write(b"foobar")
+
+        self.assertNotIn(threading.get_ident(), threads)
+        self.assertEqual(b"foobar", await _collect(body))
+        body.close()
+
+    async def test_empty(self):
+        body = SpooledBody()
+
+        self.assertEqual(b"", await _collect(body))
+
+    async def test_max_size(self):
+        body = SpooledBody(max_size=5)
+        await body.write(b"foo")
+
+        with self.assertRaises(web.HTTPRequestEntityTooLarge):
+            await body.write(b"bar")
+
+
+class TestBodyPolicy(AioHTTPTestCase):
+    async def get_application(self):
+        self.policy = BodyPolicy(max_size=8, spool_threshold=4, services={"upload": 64}, exempt=("/exempt",))
+
+        async def _spool(request):
+            body = await self.policy.spool(request, request.match_info["service"])
+            try:
+                return web.json_response({"size": body.size, "spilled": body.spilled})
+            finally:
+                body.close()
+
+        async def _read(request):
+            return web.json_response({"size": len(await request.content.read())})
+
+        @web.middleware
+        async def _pin_state(request, handler):
+            request["state"] = GatewayState(1, None, None, None, self.policy, None, None)
+            return await handler(request)
+
+        # The body middleware registered by the service, which uses the policy of the state pinned to the request.
+        app = web.Application(middlewares=[_pin_state, _body_middleware])
+        app.router.add_route("POST", "/exempt", _read)
+        app.router.add_route("POST", "/{service}", _spool)
+        return app
+
+    def test_max_size_for(self):
+        self.assertEqual(64, self.policy.max_size_for("upload"))
+        self.assertEqual(8, self.policy.max_size_for("order"))
+        self.assertEqual(8, self.policy.max_size_for(None))
+
+    async def test_content_length(self):
+        response = await self.client.post("/order", data=b"x" * 6)
+
+        self.assertEqual({"size": 6, "spilled": True}, await response.json())
+
+    async def test_content_length_too_large(self):
+        response = await self.client.post("/order", data=b"x" * 9)
+
+        self.assertEqual(413, response.status)
+
+    async def test_exempt(self):
+        response = await self.client.post("/exempt", data=b"x" * 16)
+
+        self.assertEqual({"size": 16}, await response.json())
+
+    async def test_service_max_size(self):
+        response = await self.client.post("/upload", data=b"x" * 32)
+
+        self.assertEqual({"size": 32, "spilled": True}, await response.json())
+
+    async def test_chunked_too_large(self):
+        async def _chunks():
+            for _ in range(3):
+                yield b"x" * 4
+
+        response = await self.client.post("/order", data=_chunks())
+
+        self.assertEqual(413, response.status)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -46,6 +46,17 @@ class TestCli(unittest.TestCase):
         self.assertEqual(result.exit_code, 1)
         self.assertTrue("Error loading config" in result.stdout)
 
+    def test_migrate(self):
+        result = runner.invoke(app, ["migrate", str(self.CONFIG_FILE_PATH)])
+        self.assertEqual(0, result.exit_code)
+        self.assertIn("database is up to date", result.stdout)
+
+    def test_migrate_ko(self):
+        path = f"{BASE_PATH}/non_existing_config.yml"
+        result = runner.invoke(app, ["migrate", path])
+        self.assertEqual(result.exit_code, 1)
+        self.assertTrue("Error loading config" in result.stdout)
+
     def test_launch(self):
         entrypoint = FakeEntrypoint()
         with patch("minos.api_gateway.rest.launchers.EntrypointLauncher.entrypoint", new_callable=PropertyMock) as mock:
@@ -6,11 +6,16 @@ This file is part of minos framework.
 Minos framework can not be copied and/or distributed without the express permission of Clariteia SL.
 """
 import os
+import tempfile
 import unittest
 from unittest import (
     mock,
 )
 
+from yarl import (
+    URL,
+)
+
 from minos.api_gateway.rest import (
     ApiGatewayConfig,
     ApiGatewayConfigException,
@@ -28,6 +33,61 @@ class TestApiGatewayConfig(unittest.TestCase):
         with self.assertRaises(ApiGatewayConfigException):
             ApiGatewayConfig(path=BASE_PATH / "test_fail_config.yaml")
 
+    def test_config_snapshot(self):
+        config = ApiGatewayConfig(path=self.config_file_path)
+
+        self.assertIs(config.rest, config.rest)
+        self.assertIs(config.snapshot.discovery, config.discovery)
+        with self.assertRaises(AttributeError):
+            config.rest.host = "other"
+
+    def test_config_snapshot_environment(self):
+        config = ApiGatewayConfig(path=self.config_file_path)
+
+        with mock.patch.dict(os.environ, {"API_GATEWAY_REST_HOST": "::1"}):
+            self.assertEqual("localhost", config.rest.host)
+
+    def test_config_missing_key(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".yml") as file:
+            file.write("rest:\n  host: localhost\n")
+            file.flush()
+
+            with self.assertRaises(ApiGatewayConfigException):
+                ApiGatewayConfig(path=file.name)
+
+    def test_config_reload(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".yml") as file:
+            file.write((BASE_PATH / "config.yml").read_text())
+            file.flush()
+            config = ApiGatewayConfig(path=file.name, api_gateway_rest_port=7777)
+
+            file.write("upstream:\n  retries: 2\n")
+            file.flush()
+            reloaded = config.reload()
+
+        self.assertIsNot(config, reloaded)
+        self.assertEqual(0, config.upstream.retries)
+        self.assertEqual(2, reloaded.upstream.retries)
+        self.assertEqual(7777, reloaded.rest.port)
+
+    def test_config_invalid_yaml(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".yml") as file:
+            file.write("rest: [\n")
+            file.flush()
+
+            with self.assertRaises(ApiGatewayConfigException):
+                ApiGatewayConfig(path=file.name)
+
+    def test_config_wrong_value(self):
+        with self.assertRaises(ApiGatewayConfigException):
+            ApiGatewayConfig(path=self.config_file_path, api_gateway_rest_port="foo")
+
+    def test_config_urls(self):
+        config = ApiGatewayConfig(path=self.config_file_path)
+
+        self.assertEqual(URL("http://localhost:55909/auth"), config.rest.auth.url)
+        self.assertEqual(URL("http://localhost:5567"), config.discovery.url)
+
     def test_config_rest(self):
         config = ApiGatewayConfig(path=self.config_file_path)
         rest = config.rest
@@ -48,6 +108,71 @@ class TestApiGatewayConfig(unittest.TestCase):
         self.assertEqual("test_user", admin.username)
         self.assertEqual("Admin1234", admin.password)
 
+    def test_config_rest_access_log_default(self):
+        config = ApiGatewayConfig(path=self.config_file_path)
+        access_log = config.rest.access_log
+
+        self.assertEqual(False, access_log.enabled)
+        self.assertEqual(1.0, access_log.sample_rate)
+
+    @mock.patch.dict(
+        os.environ,
+        {"API_GATEWAY_REST_ACCESS_LOG_ENABLED": "true", "API_GATEWAY_REST_ACCESS_LOG_SAMPLE_RATE": "0.25"},
+    )
+    def test_overwrite_with_environment_rest_access_log(self):
+        config = ApiGatewayConfig(path=self.config_file_path)
+        access_log = config.rest.access_log
+
+        self.assertEqual(True, access_log.enabled)
+        self.assertEqual(0.25, access_log.sample_rate)
+
+    def test_config_rules_default(self):
+        config = ApiGatewayConfig(path=self.config_file_path)
+        rules = config.rules
+
+        self.assertEqual(5.0, rules.poll_interval)
+        self.assertEqual(True, rules.listen)
+        self.assertEqual(10000, rules.cache_size)
+        self.assertEqual(64 * 1024 ** 2, rules.import_max_size)
+
+    @mock.patch.dict(
+        os.environ,
+        {
+            "API_GATEWAY_RULES_POLL_INTERVAL": "0.5",
+            "API_GATEWAY_RULES_LISTEN": "false",
+            "API_GATEWAY_RULES_IMPORT_MAX_SIZE": "2048",
+        },
+    )
+    def test_overwrite_with_environment_rules(self):
+        config = ApiGatewayConfig(path=self.config_file_path)
+        rules = config.rules
+
+        self.assertEqual(0.5, rules.poll_interval)
+        self.assertEqual(False, rules.listen)
+        self.assertEqual(2048, rules.import_max_size)
+
+    def test_config_rest_body_default(self):
+        config = ApiGatewayConfig(path=self.config_file_path)
+        body = config.rest.body
+
+        self.assertEqual(1024 ** 2, body.max_size)
+        self.assertEqual(1024 ** 2, body.spool_threshold)
+        self.assertEqual((), body.services)
+
+    @mock.patch.dict(
+        os.environ, {"API_GATEWAY_REST_BODY_MAX_SIZE": "2048", "API_GATEWAY_REST_BODY_SPOOL_THRESHOLD": "512"},
+    )
+    def test_overwrite_with_environment_rest_body(self):
+        config = ApiGatewayConfig(path=self.config_file_path)
+        body = config.rest.body
+
+        self.assertEqual(2048, body.max_size)
+        self.assertEqual(512, body.spool_threshold)
+
+    def test_config_rest_body_invalid(self):
+        with self.assertRaises(ApiGatewayConfigException):
+            ApiGatewayConfig(path=self.config_file_path, api_gateway_rest_body_max_size=-1)
+
     def test_config_database(self):
         config = ApiGatewayConfig(path=self.config_file_path)
         database = config.database
@@ -56,6 +181,65 @@ class TestApiGatewayConfig(unittest.TestCase):
         self.assertEqual("minos", database.user)
         self.assertEqual("min0s", database.password)
         self.assertEqual(5432, database.port)
+        self.assertEqual(True, database.create_schema)
+        self.assertEqual(30, database.timeout)
+
+    def test_config_database_backend_default(self):
+        config = ApiGatewayConfig(path=self.config_file_path)
+        self.assertEqual("postgresql", config.database.backend)
+        self.assertIsNone(config.database.path)
+
+    @mock.patch.dict(
+        os.environ, {"API_GATEWAY_DATABASE_BACKEND": "sqlite", "API_GATEWAY_DATABASE_PATH": "api_gateway.db"},
+    )
+    def test_overwrite_with_environment_database_backend(self):
+        config = ApiGatewayConfig(path=self.config_file_path)
+        database = config.database
+
+        self.assertEqual("sqlite", database.backend)
+        self.assertEqual("api_gateway.db", database.path)
+        self.assertIsNone(database.host)
+
+    def test_config_database_backend_wrong(self):
+        with self.assertRaises(ApiGatewayConfigException):
+            ApiGatewayConfig(path=self.config_file_path, api_gateway_database_backend="mysql")
+
+    def test_config_database_backend_missing_path(self):
+        with self.assertRaises(ApiGatewayConfigException):
+            ApiGatewayConfig(path=self.config_file_path, api_gateway_database_backend="file")
+
+    def test_config_database_parameterized(self):
+        config = ApiGatewayConfig(path=self.config_file_path, api_gateway_database_name="other_db")
+        self.assertEqual("other_db", config.database.dbname)
+
+    @mock.patch.dict(
+        os.environ, {"API_GATEWAY_DATABASE_CREATE_SCHEMA": "false", "API_GATEWAY_DATABASE_TIMEOUT": "5"},
+    )
+    def test_overwrite_with_environment_database_schema(self):
+        config = ApiGatewayConfig(path=self.config_file_path)
+        database = config.database
+
+        self.assertEqual(False, database.create_schema)
+        self.assertEqual(5, database.timeout)
+
+    def test_config_rest_auth_token_headers_default(self):
+        config = ApiGatewayConfig(path=self.config_file_path)
+        self.assertEqual(("Authorization", "Cookie"), config.rest.auth.token_headers)
+
+    def test_config_rest_auth_jwt_default(self):
+        config = ApiGatewayConfig(path=self.config_file_path)
+        jwt = config.rest.auth.jwt
+
+        self.assertEqual(False, jwt.enabled)
+        self.assertEqual("/auth/jwks", jwt.jwks_path)
+        self.assertEqual(("RS256",), jwt.algorithms)
+        self.assertIsNone(jwt.audience)
+        self.assertEqual(300, jwt.refresh_interval)
+
+    @mock.patch.dict(os.environ, {"API_GATEWAY_REST_AUTH_JWT_ENABLED": "true"})
+    def test_overwrite_with_environment_rest_auth_jwt_enabled(self):
+        config = ApiGatewayConfig(path=self.config_file_path)
+        self.assertEqual(True, config.rest.auth.jwt.enabled)
 
     def test_config_rest_auth_none(self):
         config = ApiGatewayConfig(path=BASE_PATH / "config_without_auth.yml")
@@ -67,6 +251,59 @@ class TestApiGatewayConfig(unittest.TestCase):
 
         self.assertEqual("localhost", discovery.host)
         self.assertEqual(5567, discovery.port)
+        self.assertEqual("pull", discovery.mode)
+        self.assertEqual(30, discovery.interval)
+
+    def test_config_discovery_sync(self):
+        config = ApiGatewayConfig(
+            path=self.config_file_path, api_gateway_discovery_mode="sync", api_gateway_discovery_interval="5"
+        )
+        discovery = config.discovery
+
+        self.assertEqual("sync", discovery.mode)
+        self.assertEqual(5, discovery.interval)
+
+    def test_config_discovery_wrong_mode(self):
+        with self.assertRaises(ApiGatewayConfigException):
+            ApiGatewayConfig(path=self.config_file_path, api_gateway_discovery_mode="push")
+
+    def test_config_headers_default(self):
+        config = ApiGatewayConfig(path=self.config_file_path)
+        headers = config.headers
+
+        self.assertEqual(True, headers.forwarded)
+        self.assertIsNone(headers.allow)
+        self.assertEqual((), headers.deny)
+        self.assertEqual((), headers.services)
+
+    def test_config_upstream_default(self):
+        config = ApiGatewayConfig(path=self.config_file_path)
+        upstream = config.upstream
+
+        self.assertEqual("http/1.1", upstream.protocol)
+        self.assertEqual(10, upstream.dns_ttl)
+        self.assertEqual(0, upstream.retries)
+        self.assertEqual(0.1, upstream.retry_backoff)
+        self.assertEqual((), upstream.services)
+
+    def test_config_upstream_retries(self):
+        config = ApiGatewayConfig(
+            path=self.config_file_path, api_gateway_upstream_retries="2", api_gateway_upstream_retry_backoff="0.5"
+        )
+        self.assertEqual(2, config.upstream.retries)
+        self.assertEqual(0.5, config.upstream.retry_backoff)
+
+    def test_config_upstream_wrong_retries(self):
+        with self.assertRaises(ApiGatewayConfigException):
+            ApiGatewayConfig(path=self.config_file_path, api_gateway_upstream_retries="-1")
+
+    def test_config_upstream_dns_ttl(self):
+        config = ApiGatewayConfig(path=self.config_file_path, api_gateway_upstream_dns_ttl="60")
+        self.assertEqual(60, config.upstream.dns_ttl)
+
+    def test_config_upstream_wrong_protocol(self):
+        with self.assertRaises(ApiGatewayConfigException):
+            ApiGatewayConfig(path=self.config_file_path, api_gateway_upstream_protocol="spdy")
 
     @mock.patch.dict(os.environ, {"API_GATEWAY_DISCOVERY_HOST": "::1"})
     def test_overwrite_with_environment_discovery_host(self):
@@ -97,3 +97,9 @@ class TestApiGatewayCORS(AioHTTPTestCase):
             expected_origin,
             **kwargs,
         )
+
+
+class TestApiGatewayCORSAccessLog(TestApiGatewayCORS):
+    @mock.patch.dict(os.environ, {"API_GATEWAY_REST_ACCESS_LOG_ENABLED": "true"})
+    def setUp(self) -> None:
+        super().setUp()
@@ -0,0 +1,107 @@
+"""tests.test_api_gateway.test_rest.test_decision module."""
+
+import unittest
+from types import (
+    SimpleNamespace,
+)
+
+from minos.api_gateway.rest.urlmatch.autzmatch import (
+    AutzMatch,
+)
+from minos.api_gateway.rest.urlmatch.decision import (
+    AuthDecision,
+    DecisionMatch,
+)
+from minos.api_gateway.rest.urlmatch.roles import (
+    ANY_ROLE,
+    NO_ROLE,
+    RoleSet,
+)
+
+URL = "http://localhost:5566/order/5"
+
+
+def _auth(rule: str, methods=("*",)):
+    return SimpleNamespace(rule=rule, methods=list(methods))
+
+
+def _autz(rule: str, roles, methods=("*",)):
+    return SimpleNamespace(rule=rule, roles=list(roles), methods=list(methods), role_set=RoleSet.from_roles(roles))
+
+
+class TestDecisionMatch(unittest.TestCase):
+    def test_public(self):
+        decision = DecisionMatch.match(URL, "GET", [_auth("http://*/ticket/*")], [_autz("*://*/ticket/*", [1])])
+
+        self.assertEqual(AuthDecision(False, False, NO_ROLE), decision)
+        self.assertTrue(decision.allows(None))
+
+    def test_authenticate(self):
+        decision = DecisionMatch.match(URL, "GET", [_auth("http://*/order/*", ["GET"])], [])
+
+        self.assertEqual(AuthDecision(True, False, NO_ROLE), decision)
+        self.assertTrue(decision.allows(3))
+
+    def test_authenticate_other_method(self):
+        decision = DecisionMatch.match(URL, "POST", [_auth("http://*/order/*", ["GET"])], [])
+
+        self.assertFalse(decision.authenticate)
+
+    def test_authorize(self):
+        autz = [_autz("http://*/order/*", [1], ["GET"]), _autz("http://*/order/*", [2], ["POST"])]
+
+        decision = DecisionMatch.match(URL, "GET", [], autz)
+
+        self.assertEqual(AuthDecision(True, True, RoleSet(frozenset({"1", "2"}), False)), decision)
+        self.assertTrue(decision.allows(2))
+        self.assertTrue(decision.allows([3, 1]))
+        self.assertFalse(decision.allows(3))
+        self.assertFalse(decision.allows(None))
+
+    def test_authorize_any_role(self):
+        autz = [_autz("http://*/order/*", [1]), _autz("http://*/order/5", ["*"])]
+
+        decision = DecisionMatch.match(URL, "DELETE", [], autz)
+
+        self.assertEqual(AuthDecision(True, True, ANY_ROLE), decision)
+        self.assertTrue(decision.allows(3))
+
+
+class TestRoleSet(unittest.TestCase):
+    def test_allows(self):
+        roles = RoleSet.from_roles([1, "Customer"])
+
+        self.assertTrue(roles.allows(1))
+        self.assertTrue(roles.allows("1"))
+        self.assertTrue(roles.allows("Customer"))
+        self.assertFalse(roles.allows(2))
+        self.assertFalse(roles.allows(None))
+
+    def test_allows_many(self):
+        roles = RoleSet.from_roles([1, 2])
+
+        self.assertTrue(roles.allows([3, 2]))
+        self.assertFalse(roles.allows([3, 4]))
+        self.assertFalse(roles.allows([]))
+
+    def test_wildcard(self):
+        self.assertEqual(ANY_ROLE, RoleSet.from_roles(["*", 1]))
+        self.assertEqual(ANY_ROLE, RoleSet.from_roles(None))
+        self.assertTrue(ANY_ROLE.allows(None))
+
+    def test_union(self):
+        self.assertEqual(RoleSet(frozenset({"1", "2"}), False), RoleSet.from_roles([1]).union(RoleSet.from_roles([2])))
+        self.assertEqual(ANY_ROLE, RoleSet.from_roles([1]).union(ANY_ROLE))
+
+
+class TestAutzMatch(unittest.TestCase):
+    def test_match(self):
+        records = [_autz("http://*/order/*", [1], ["GET"]), _autz("http://*/order/*", ["*"], ["POST"])]
+
+        self.assertTrue(AutzMatch.match(URL, 1, "GET", records[:1]))
+        self.assertFalse(AutzMatch.match(URL, 2, "GET", records[:1]))
+        self.assertTrue(AutzMatch.match(URL, 2, "GET", records))
+
+
+if __name__ == "__main__":
+    unittest.main()
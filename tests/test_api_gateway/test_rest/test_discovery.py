@@ -0,0 +1,171 @@
+"""tests.test_api_gateway.test_rest.test_discovery module."""
+
+import asyncio
+import unittest
+
+from aiohttp import (
+    web,
+)
+from aiohttp.test_utils import (
+    AioHTTPTestCase,
+)
+
+from minos.api_gateway.rest.discovery import (
+    DiscoverySynchronizer,
+    EndpointTable,
+)
+
+ENDPOINTS = [
+    {
+        "name": "order",
+        "address": "localhost",
+        "port": "5568",
+        "status": True,
+        "endpoints": ["endpoint:GET:/order/{id}", "endpoint:POST:/order", "endpoint:GET:/order/{id:\\d+}/items"],
+    },
+    {"name": "payments", "address": "payments", "port": 8080, "status": False, "endpoints": ["endpoint:GET:/payments"]},
+]
+
+
+class TestEndpointTable(unittest.TestCase):
+    def setUp(self) -> None:
+        self.table = EndpointTable.from_endpoints(ENDPOINTS)
+
+    def test_len(self):
+        self.assertEqual(3, len(self.table))
+
+    def test_resolve(self):
+        expected = {"name": "order", "address": "localhost", "port": 5568, "status": True}
+
+        self.assertEqual(expected, self.table.resolve("GET", "/order/5"))
+        self.assertEqual(expected, self.table.resolve("POST", "/order"))
+        self.assertEqual(expected, self.table.resolve("GET", "/order/5/items"))
+
+    def test_resolve_missing(self):
+        self.assertIsNone(self.table.resolve("DELETE", "/order/5"))
+        self.assertIsNone(self.table.resolve("GET", "/order/5/6"))
+        self.assertIsNone(self.table.resolve("GET", "/order/abc/items"))
+        self.assertIsNone(self.table.resolve("GET", "/payments"))
+
+    def test_match_params(self):
+        _, params = self.table.match("GET", "/order/5/items")
+        self.assertEqual({"id": "5"}, params)
+
+    def test_match_static_precedence(self):
+        table = EndpointTable.from_endpoints(
+            [
+                {"name": "a", "address": "a", "port": 1, "endpoints": ["endpoint:GET:/order/{id}"]},
+                {"name": "b", "address": "b", "port": 2, "endpoints": ["endpoint:GET:/order/latest"]},
+                {"name": "c", "address": "c", "port": 3, "endpoints": ["endpoint:GET:/files/{name}.json"]},
+            ]
+        )
+
+        self.assertEqual("b", table.resolve("GET", "/order/latest")["name"])
+        self.assertEqual("a", table.resolve("GET", "/order/5")["name"])
+        self.assertEqual(
+            ({"name": "c", "address": "c", "port": 3, "status": True}, {"name": "report"}),
+            table.match("GET", "/files/report.json"),
+        )
+        self.assertIsNone(table.resolve("GET", "/files/report.xml"))
+
+    def test_match_backtracking(self):
+        table = EndpointTable.from_endpoints(
+            [
+                {"name": "a", "address": "a", "port": 1, "endpoints": ["endpoint:GET:/order/latest"]},
+                {"name": "b", "address": "b", "port": 2, "endpoints": ["endpoint:GET:/order/{id}/items"]},
+            ]
+        )
+
+        self.assertEqual("b", table.resolve("GET", "/order/latest/items")["name"])
+
+    def test_many_endpoints(self):
+        table = EndpointTable.from_endpoints(
+            [
+                {
+                    "name": f"service{i}",
+                    "address": "localhost",
+                    "port": 8000 + i,
+                    "endpoints": [f"endpoint:GET:/service{i}/{{id}}", f"endpoint:POST:/service{i}"],
+                }
+                for i in range(500)
+            ]
+        )
+
+        self.assertEqual(1000, len(table))
+        self.assertEqual(8250, table.resolve("GET", "/service250/abc")["port"])
+        self.assertEqual(8499, table.resolve("POST", "/service499")["port"])
+
+
+class TestDiscoverySynchronizer(AioHTTPTestCase):
+    async def get_application(self):
+        self.calls = 0
+
+        async def _endpoints(request):
+            self.calls += 1
+            if request.headers.get("If-None-Match") == '"v1"':
+                return web.Response(status=304)
+            return web.json_response(ENDPOINTS, headers={"ETag": '"v1"'})
+
+        async def _malformed(request):
+            self.calls += 1
+            return web.json_response([1, {"address": "localhost"}])
+
+        app = web.Application()
+        app.router.add_route("GET", "/endpoints", _endpoints)
+        app.router.add_route("GET", "/malformed", _malformed)
+        return app
+
+    def _synchronizer(self) -> DiscoverySynchronizer:
+        return DiscoverySynchronizer(host=self.server.host, port=self.server.port, interval=3600)
+
+    async def test_synchronize(self):
+        synchronizer = self._synchronizer()
+        self.assertFalse(synchronizer.ready)
+
+        self.assertTrue(await synchronizer.synchronize())
+        self.assertTrue(synchronizer.ready)
+        self.assertEqual("localhost", synchronizer.resolve("GET", "/order/5")["address"])
+
+        table = synchronizer.table
+        self.assertFalse(await synchronizer.synchronize())
+        self.assertIs(table, synchronizer.table)
+        self.assertEqual(2, self.calls)
+
+    async def test_resolve_not_found(self):
+        synchronizer = self._synchronizer()
+        await synchronizer.synchronize()
+
+        with self.assertRaises(web.HTTPNotFound):
+            synchronizer.resolve("GET", "/unknown")
+
+    async def test_signals(self):
+        synchronizer = self._synchronizer()
+        await synchronizer.on_startup(self.app)
+        self.assertTrue(synchronizer.ready)
+        await synchronizer.on_cleanup(self.app)
+
+    async def test_startup_unavailable(self):
+        synchronizer = DiscoverySynchronizer(host="localhost", port=1, interval=3600)
+        await synchronizer.on_startup(self.app)
+        self.assertFalse(synchronizer.ready)
+        await synchronizer.on_cleanup(self.app)
+
+    async def test_malformed(self):
+        synchronizer = DiscoverySynchronizer(
+            host=self.server.host, port=self.server.port, interval=0.01, path="/malformed"
+        )
+        with self.assertLogs("minos.api_gateway.rest.discovery", "ERROR"):
+            await synchronizer.on_startup(self.app)
+            for _ in range(100):
+                if self.calls >= 3:
+                    break
+                await asyncio.sleep(0.01)
+
+        self.assertGreaterEqual(self.calls, 3)
+        self.assertFalse(synchronizer.ready)
+        self.assertFalse(synchronizer._task.done())
+        await synchronizer.on_cleanup(self.app)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""tests.test_api_gateway.test_rest.test_headers module."""
+
+import unittest
+from unittest.mock import (
+    MagicMock,
+)
+
+from aiohttp.test_utils import (
+    make_mocked_request,
+)
+from multidict import (
+    CIMultiDict,
+    CIMultiDictProxy,
+)
+
+from minos.api_gateway.rest.headers import (
+    HeaderPipeline,
+    HeaderRewrite,
+    response_headers,
+)
+
+
+def _request(headers: dict):
+    transport = MagicMock()
+    transport.get_extra_info.return_value = ("127.0.0.1", 12345)
+    return make_mocked_request("POST", "/order/5", headers=CIMultiDict(headers), transport=transport)
+
+
+class TestHeaderPipeline(unittest.TestCase):
+    def test_hop_by_hop(self):
+        request = _request(
+            {
+                "Host": "gateway",
+                "Connection": "keep-alive, X-Private",
+                "Keep-Alive": "timeout=5",
+                "Transfer-Encoding": "chunked",
+                "Content-Length": "5",
+                "X-Private": "secret",
+                "Authorization": "Bearer test",
+            }
+        )
+
+        observed = HeaderPipeline(forwarded=False).request_headers(request)
+
+        self.assertEqual(CIMultiDict({"Authorization": "Bearer test"}), observed)
+
+    def test_forwarded(self):
+        request = _request({"Host": "gateway", "X-Forwarded-For": "10.0.0.1", "Forwarded": "for=10.0.0.1"})
+
+        observed = HeaderPipeline().request_headers(request)
+
+        self.assertEqual("10.0.0.1, 127.0.0.1", observed["X-Forwarded-For"])
+        self.assertEqual("http", observed["X-Forwarded-Proto"])
+        self.assertEqual("gateway", observed["X-Forwarded-Host"])
+        self.assertEqual('for=10.0.0.1, for=127.0.0.1;proto=http;host="gateway"', observed["Forwarded"])
+
+    def test_allow_deny(self):
+        request = _request({"Authorization": "Bearer test", "Cookie": "a=b", "X-Trace": "1"})
+
+        observed = HeaderPipeline(forwarded=False, allow=["authorization", "cookie"], deny=["Cookie"]).request_headers(
+            request
+        )
+
+        self.assertEqual(CIMultiDict({"Authorization": "Bearer test"}), observed)
+
+    def test_rewrites(self):
+        request = _request({"Authorization": "Bearer test", "Cookie": "a=b"})
+        pipeline = HeaderPipeline(
+            forwarded=False, rewrites={"order": HeaderRewrite(set_headers={"X-Service": "order"}, remove=["Cookie"])}
+        )
+
+        self.assertEqual(
+            CIMultiDict({"Authorization": "Bearer test", "X-Service": "order"}),
+            pipeline.request_headers(request, "order"),
+        )
+        self.assertEqual(
+            CIMultiDict({"Authorization": "Bearer test", "Cookie": "a=b"}), pipeline.request_headers(request, "other"),
+        )
+
+
+class TestResponseHeaders(unittest.TestCase):
+    def test_response_headers(self):
+        headers = CIMultiDictProxy(
+            CIMultiDict(
+                [
+                    ("Content-Type", "application/json"),
+                    ("Content-Length", "120"),
+                    ("Transfer-Encoding", "chunked"),
+                    ("Connection", "close"),
+                    ("Set-Cookie", "a=1"),
+                    ("Set-Cookie", "b=2"),
+                ]
+            )
+        )
+
+        observed = response_headers(headers)
+
+        self.assertEqual(
+            CIMultiDict([("Content-Type", "application/json"), ("Set-Cookie", "a=1"), ("Set-Cookie", "b=2")]), observed
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
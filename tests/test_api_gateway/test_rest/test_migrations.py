@@ -0,0 +1,95 @@
+"""tests.test_api_gateway.test_rest.test_migrations module."""
+
+import unittest
+from uuid import (
+    uuid4,
+)
+
+from sqlalchemy import (
+    create_engine,
+    inspect,
+    text,
+)
+
+from minos.api_gateway.rest import (
+    ApiGatewayConfig,
+)
+from minos.api_gateway.rest.database.migrations import (
+    build_engine,
+    migrate,
+)
+from tests.utils import (
+    BASE_PATH,
+)
+
+LEGACY_SCHEMA = """
+CREATE SEQUENCE item_id_seq;
+CREATE TABLE auth_rules (
+    id INTEGER NOT NULL, service VARCHAR NOT NULL, rule VARCHAR NOT NULL, methods JSON,
+    created_at TIMESTAMP, updated_at TIMESTAMP, PRIMARY KEY (service, rule)
+);
+CREATE TABLE autz_rules (
+    id INTEGER NOT NULL, service VARCHAR NOT NULL, rule VARCHAR NOT NULL, roles JSON, methods JSON,
+    created_at TIMESTAMP, updated_at TIMESTAMP, PRIMARY KEY (id, service, rule)
+);
+INSERT INTO auth_rules (id, service, rule, methods) VALUES (1, 'order', '/order/*', '["GET"]');
+INSERT INTO autz_rules (id, service, rule, roles, methods) VALUES
+    (2, 'order', '/order/*', '[1]', '["GET"]'),
+    (3, 'order', '/order/*', '[2]', '["*"]'),
+    (4, 'order', '/admin/*', '[1]', NULL),
+    (5, 'order', '/admin/*', '[1, 3]', '["GET"]'),
+    (6, 'order', '/public/*', '[1]', '["GET"]');
+"""
+
+
+class TestMigrate(unittest.TestCase):
+    def setUp(self) -> None:
+        url = build_engine(ApiGatewayConfig(BASE_PATH / "config.yml").database).url
+        self.schema = f"legacy_{uuid4().hex}"
+        self.admin = create_engine(url)
+        with self.admin.begin() as connection:
+            connection.execute(text(f"CREATE SCHEMA {self.schema}"))
+        self.engine = create_engine(url, connect_args={"options": f"-csearch_path={self.schema}"})
+
+    def tearDown(self) -> None:
+        self.engine.dispose()
+        with self.admin.begin() as connection:
+            connection.execute(text(f"DROP SCHEMA {self.schema} CASCADE"))
+        self.admin.dispose()
+
+    def test_create(self):
+        migrate(self.engine)
+
+        inspector = inspect(self.engine)
+        self.assertEqual(["id"], inspector.get_pk_constraint("auth_rules")["constrained_columns"])
+        self.assertIn("ix_autz_rules_roles", {index["name"] for index in inspector.get_indexes("autz_rules")})
+
+    def test_upgrade(self):
+        with self.engine.begin() as connection:
+            connection.execute(text(LEGACY_SCHEMA))
+
+        with self.assertLogs("minos.api_gateway.rest.database.migrations", "WARNING") as logs:
+            migrate(self.engine)
+        migrate(self.engine)
+
+        self.assertEqual(2, sum("Merging" in message for message in logs.output))
+        inspector = inspect(self.engine)
+        for table in ("auth_rules", "autz_rules"):
+            self.assertEqual(["id"], inspector.get_pk_constraint(table)["constrained_columns"])
+            self.assertEqual(
+                [["service", "rule"]], [c["column_names"] for c in inspector.get_unique_constraints(table)]
+            )
+            self.assertIn(f"ix_{table}_service", {index["name"] for index in inspector.get_indexes(table)})
+            self.assertIn("jsonb", {column["type"].__visit_name__.lower() for column in inspector.get_columns(table)})
+
+        with self.engine.begin() as connection:
+            self.assertEqual(
+                [(3, [1, 2], ["GET", "*"]), (5, [1, 3], None), (6, [1], ["GET"])],
+                connection.execute(text("SELECT id, roles, methods FROM autz_rules ORDER BY id")).all(),
+            )
+            connection.execute(text("INSERT INTO auth_rules (service, rule) VALUES ('order', '/order')"))
+            self.assertEqual(2, connection.execute(text("SELECT max(id) FROM auth_rules")).scalar())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,184 @@
+"""tests.test_api_gateway.test_rest.test_reload module."""
+
+import asyncio
+import os
+import signal
+import tempfile
+import unittest
+from pathlib import (
+    Path,
+)
+
+from aiohttp import (
+    web,
+)
+from aiohttp.test_utils import (
+    AioHTTPTestCase,
+)
+
+from minos.api_gateway.rest import (
+    ApiGatewayConfig,
+    ApiGatewayRestService,
+)
+from minos.api_gateway.rest.reload import (
+    ConfigReloader,
+    GatewayState,
+)
+from tests.utils import (
+    BASE_PATH,
+)
+
+
+class _Component:
+    def __init__(self):
+        self.started = False
+        self.stopped = False
+
+    async def on_startup(self, app):
+        self.started = True
+
+    async def on_cleanup(self, app):
+        self.stopped = True
+
+
+def _build(config, previous=None):
+    upstream = _Component()
+    if previous is not None and previous.config.upstream == config.upstream:
+        upstream = previous.upstream
+    return GatewayState(
+        version=1 if previous is None else previous.version + 1,
+        config=config,
+        upstream=upstream,
+        headers=None,
+        body=None,
+        discovery=None,
+        token_verifier=None,
+    )
+
+
+class TestConfigReloader(AioHTTPTestCase):
+    async def get_application(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / "config.yml"
+        self.path.write_text((BASE_PATH / "config.yml").read_text())
+
+        self.reloader = ConfigReloader(ApiGatewayConfig(self.path), _build)
+        self.released = asyncio.Event()
+
+        async def _version(request):
+            await self.released.wait()
+            return web.json_response({"version": request["state"].version})
+
+        app = web.Application(middlewares=[self.reloader.middleware()])
+        app.on_startup.append(self.reloader.on_startup)
+        app.on_cleanup.append(self.reloader.on_cleanup)
+        app.router.add_route("POST", "/reload", self.reloader.handle)
+        app.router.add_route("GET", "/version", _version)
+        return app
+
+    async def asyncTearDown(self) -> None:
+        await super().asyncTearDown()
+        self.directory.cleanup()
+
+    async def test_reload(self):
+        previous = self.reloader.state
+        self.assertTrue(previous.upstream.started)
+
+        self.path.write_text(self.path.read_text() + "upstream:\n  retries: 2\n")
+        state = await self.reloader.reload()
+
+        self.assertEqual(2, state.version)
+        self.assertIs(state, self.reloader.state)
+        self.assertEqual(2, self.reloader.config.upstream.retries)
+        self.assertTrue(state.upstream.started)
+        await asyncio.sleep(0)
+        self.assertTrue(previous.upstream.stopped)
+
+    async def test_reload_unchanged(self):
+        previous = self.reloader.state
+
+        state = await self.reloader.reload()
+
+        self.assertIs(previous.upstream, state.upstream)
+        self.assertFalse(state.upstream.stopped)
+
+    async def test_in_flight(self):
+        request = asyncio.create_task(self.client.get("/version"))
+        await asyncio.sleep(0.05)
+
+        await self.reloader.reload()
+        self.released.set()
+
+        response = await request
+        self.assertEqual({"version": 1}, await response.json())
+
+        response = await self.client.get("/version")
+        self.assertEqual({"version": 2}, await response.json())
+
+    async def test_handle(self):
+        response = await self.client.post("/reload")
+
+        self.assertEqual(200, response.status)
+        self.assertEqual({"version": 2}, await response.json())
+
+    async def test_handle_invalid(self):
+        self.path.write_text("rest: [\n")
+
+        response = await self.client.post("/reload")
+
+        self.assertEqual(400, response.status)
+        self.assertIn("error", await response.json())
+        self.assertEqual(1, self.reloader.state.version)
+
+    async def test_signal(self):
+        os.kill(os.getpid(), signal.SIGHUP)
+
+        for _ in range(100):
+            if self.reloader.state.version == 2:
+                break
+            await asyncio.sleep(0.01)
+        self.assertEqual(2, self.reloader.state.version)
+
+
+class TestApiGatewayRestServiceReload(AioHTTPTestCase):
+    async def get_application(self):
+        os.environ["API_GATEWAY_REST_AUTH_ENABLED"] = "false"
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / "config.yml"
+        self.path.write_text((BASE_PATH / "config.yml").read_text())
+
+        config = ApiGatewayConfig(self.path)
+        rest_service = ApiGatewayRestService(address=config.rest.host, port=config.rest.port, config=config)
+        return await rest_service.create_application()
+
+    async def asyncTearDown(self) -> None:
+        await super().asyncTearDown()
+        self.directory.cleanup()
+
+    async def test_reload_cors(self):
+        headers = {"Origin": "http://example.com"}
+        response = await self.client.post("/admin/login", json={}, headers=headers)
+        self.assertIn("Access-Control-Allow-Origin", response.headers)
+
+        self.path.write_text(self.path.read_text().replace("enabled: true\n  auth", "enabled: false\n  auth"))
+        response = await self.client.post("/admin/reload")
+        self.assertEqual({"version": 2}, await response.json())
+
+        response = await self.client.post("/admin/login", json={}, headers=headers)
+        self.assertNotIn("Access-Control-Allow-Origin", response.headers)
+
+    async def test_reload_components(self):
+        previous = self.app["reloader"].state
+
+        self.path.write_text(self.path.read_text() + "upstream:\n  retries: 2\n")
+        await self.client.post("/admin/reload")
+
+        state = self.app["reloader"].state
+        self.assertIsNot(previous.upstream, state.upstream)
+        self.assertEqual(2, state.upstream.retries)
+        self.assertIs(previous.headers, state.headers)
+        self.assertIs(previous.body, state.body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,259 @@
+"""tests.test_api_gateway.test_rest.test_rules module."""
+
+import asyncio
+import unittest
+from datetime import (
+    datetime,
+)
+from unittest.mock import (
+    patch,
+)
+from uuid import (
+    uuid4,
+)
+
+from minos.api_gateway.rest import (
+    ApiGatewayConfig,
+)
+from minos.api_gateway.rest.database.backends import (
+    RuleBackend,
+)
+from minos.api_gateway.rest.database.migrations import (
+    build_engine,
+    migrate,
+)
+from minos.api_gateway.rest.database.models import (
+    AuthRule,
+    AutzRule,
+    AutzRuleDTO,
+    RuleChange,
+)
+from minos.api_gateway.rest.database.repository import (
+    AUTH_RULES,
+    AUTZ_RULES,
+    Repository,
+)
+from minos.api_gateway.rest.rules import (
+    DecisionCache,
+    RuleIndex,
+)
+from minos.api_gateway.rest.urlmatch.decision import (
+    AuthDecision,
+)
+from tests.utils import (
+    BASE_PATH,
+)
+
+
+def _auth_rule(service: str, rule: str) -> AuthRule:
+    now = datetime.now()
+    return AuthRule(service=service, rule=rule, methods=["GET"], created_at=now, updated_at=now)
+
+
+def _autz_rule(service: str, rule: str) -> AutzRule:
+    now = datetime.now()
+    return AutzRule(service=service, rule=rule, roles=[1], methods=["GET"], created_at=now, updated_at=now)
+
+
+def _rules(records: list, service: str) -> list[str]:
+    return [record.rule for record in records if record.service == service]
+
+
+class TestDecisionCache(unittest.TestCase):
+    def test_get(self):
+        cache = DecisionCache(max_size=10)
+        decision = AuthDecision(True, False, None)
+
+        self.assertIsNone(cache.get(1, "a"))
+        cache.put(1, "a", decision)
+
+        self.assertIs(decision, cache.get(1, "a"))
+        self.assertEqual(1, cache.stats()["hits"])
+        self.assertEqual(1, cache.stats()["misses"])
+        self.assertEqual(0.5, cache.stats()["hit_ratio"])
+
+    def test_version(self):
+        cache = DecisionCache(max_size=10)
+        cache.get(1, "a")
+        cache.put(1, "a", AuthDecision(True, False, None))
+
+        self.assertIsNone(cache.get(2, "a"))
+        self.assertEqual(0, cache.stats()["size"])
+
+        cache.put(1, "a", AuthDecision(True, False, None))
+        self.assertEqual(0, cache.stats()["size"])
+
+    def test_evict(self):
+        cache = DecisionCache(max_size=2)
+        for key in ("a", "b"):
+            cache.get(1, key)
+            cache.put(1, key, AuthDecision(True, False, None))
+        cache.get(1, "a")
+
+        cache.get(1, "c")
+        cache.put(1, "c", AuthDecision(True, False, None))
+
+        self.assertIsNone(cache.get(1, "b"))
+        self.assertIsNotNone(cache.get(1, "a"))
+        self.assertEqual(1, cache.stats()["evictions"])
+
+    def test_disabled(self):
+        cache = DecisionCache(max_size=0)
+        cache.get(1, "a")
+        cache.put(1, "a", AuthDecision(True, False, None))
+
+        self.assertIsNone(cache.get(1, "a"))
+
+
+class TestRuleChanges(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = build_engine(ApiGatewayConfig(BASE_PATH / "config.yml").database)
+        migrate(self.engine)
+        self.repository = Repository(self.engine)
+        self.service = f"service_{uuid4().hex}"
+
+    def tearDown(self) -> None:
+        self.repository.session.close()
+        self.engine.dispose()
+
+    def test_version(self):
+        version = self.repository.get_rules_version()
+
+        record = self.repository.create_auth_rule(_auth_rule(self.service, "/order/*"))
+        self.repository.update_auth_rule(id=record["id"], methods=["POST"])
+
+        self.assertEqual(version + 2, self.repository.get_rules_version())
+
+    def test_version_unchanged(self):
+        version = self.repository.get_rules_version()
+
+        self.repository.delete_auth_rule(0)
+
+        self.assertEqual(version, self.repository.get_rules_version())
+
+    def test_changes(self):
+        version = self.repository.get_rules_version()
+
+        self.repository.create_auth_rule(_auth_rule(self.service, "/order/*"))
+        self.repository.create_autz_rule(_autz_rule(self.service, "/order/*"))
+
+        changes = self.repository.get_rule_changes(version)
+        self.assertEqual(version + 2, changes.version)
+        self.assertEqual({(AUTH_RULES, self.service), (AUTZ_RULES, self.service)}, changes.changes)
+        self.assertEqual(frozenset(), self.repository.get_rule_changes(changes.version).changes)
+
+    def test_changes_not_retained(self):
+        version = self.repository.get_rules_version()
+        self.repository.create_auth_rule(_auth_rule(self.service, "/order/*"))
+        self.repository.session.query(RuleChange).filter(RuleChange.version == version + 1).delete()
+        self.repository.session.commit()
+
+        self.assertIsNone(self.repository.get_rule_changes(version).changes)
+        self.assertIsNone(self.repository.get_rule_changes(version + 100).changes)
+
+    def test_rules_of_services(self):
+        record = self.repository.create_autz_rule(_autz_rule(self.service, "/order/*"))
+
+        (rule,) = self.repository.get_rules_of_services(AUTZ_RULES, {self.service})
+
+        self.assertIsInstance(rule, AutzRuleDTO)
+        self.assertFalse(hasattr(rule, "__dict__"))
+        self.assertTrue(rule.role_set.allows(1))
+        self.assertEqual({**record, "rule": "/order/*"}, rule.to_serializable_dict())
+
+
+class TestRuleIndex(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.engine = build_engine(ApiGatewayConfig(BASE_PATH / "config.yml").database)
+        migrate(self.engine)
+        self.repository = Repository(self.engine)
+        self.service = f"service_{uuid4().hex}"
+        self.other = f"service_{uuid4().hex}"
+        self.repository.create_auth_rule(_auth_rule(self.other, "/other/*"))
+
+    async def asyncTearDown(self) -> None:
+        self.repository.session.close()
+        self.engine.dispose()
+
+    async def _start(self, **kwargs) -> RuleIndex:
+        index = RuleIndex(RuleBackend(self.engine), **kwargs)
+        await index.on_startup(None)
+        self.addAsyncCleanup(index.on_cleanup, None)
+        return index
+
+    async def _wait(self, index: RuleIndex, version: int) -> None:
+        for _ in range(200):
+            if index.version >= version:
+                return
+            await asyncio.sleep(0.01)
+        self.fail(f"The rules index did not reach the version {version}.")
+
+    async def test_load(self):
+        record = self.repository.create_auth_rule(_auth_rule("*", f"/{self.service}/*"))
+        self.addCleanup(self.repository.delete_auth_rule, record["id"])
+
+        index = await self._start(poll_interval=60)
+
+        self.assertTrue(index.ready)
+        self.assertEqual(self.repository.get_rules_version(), index.version)
+        self.assertEqual(["/other/*"], _rules(index.auth_rules(self.other), self.other))
+        self.assertIn(f"/{self.service}/*", _rules(index.auth_rules(self.other), "*"))
+        self.assertIn(f"/{self.service}/*", _rules(index.auth_rules(self.service), "*"))
+
+    async def test_notify(self):
+        index = await self._start(poll_interval=60)
+        other = index.auth_rules(self.other)
+
+        self.repository.create_autz_rule(_autz_rule(self.service, "/order/*"))
+        await self._wait(index, self.repository.get_rules_version())
+
+        self.assertEqual(["/order/*"], _rules(index.autz_rules(self.service), self.service))
+        self.assertEqual([], _rules(index.auth_rules(self.service), self.service))
+        self.assertEqual(other, index.auth_rules(self.other))
+
+    async def test_poll(self):
+        index = await self._start(poll_interval=0.05, listen=False)
+
+        record = self.repository.create_auth_rule(_auth_rule(self.service, "/order/*"))
+        await self._wait(index, self.repository.get_rules_version())
+        self.assertEqual(["/order/*"], _rules(index.auth_rules(self.service), self.service))
+
+        self.repository.delete_auth_rule(record["id"])
+        await self._wait(index, self.repository.get_rules_version())
+        self.assertEqual([], _rules(index.auth_rules(self.service), self.service))
+
+    async def test_poll_listen_failed(self):
+        with patch.object(RuleIndex, "_connect", side_effect=AttributeError("connection")):
+            index = await self._start(poll_interval=0.05)
+
+        self.assertTrue(index.ready)
+        self.repository.create_auth_rule(_auth_rule(self.service, "/order/*"))
+        await self._wait(index, self.repository.get_rules_version())
+        self.assertEqual(["/order/*"], _rules(index.auth_rules(self.service), self.service))
+
+    async def test_decide(self):
+        index = await self._start(poll_interval=60, listen=False)
+        url = f"http://localhost/{self.service}/1"
+
+        self.assertFalse(index.decide(self.service, url, "GET").authenticate)
+        self.assertFalse(index.decide(self.service, url, "GET").authenticate)
+        self.assertEqual(1, index.decisions.hits)
+
+        self.repository.create_auth_rule(_auth_rule(self.service, f"http://*/{self.service}/*"))
+        await index.refresh()
+
+        self.assertTrue(index.decide(self.service, url, "GET").authenticate)
+
+    async def test_refresh(self):
+        index = await self._start(poll_interval=60, listen=False)
+
+        self.assertFalse(await index.refresh())
+
+        self.repository.create_auth_rule(_auth_rule(self.service, "/order/*"))
+
+        self.assertTrue(await index.refresh())
+        self.assertEqual(["/order/*"], _rules(index.auth_rules(self.service), self.service))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -76,6 +76,26 @@ class TestApiGatewayRestService(AioHTTPTestCase):
         self.assertEqual(200, response.status)
         self.assertIn("Microservice call correct!!!", await response.text())
 
+    def test_startup_report(self):
+        self.assertEqual({"components", "database", "routes"}, set(self.app["startup_report"]))
+
+    @unittest_run_loop
+    async def test_post_chunked(self):
+        async def _chunks():
+            yield b'{"foo": '
+            yield b'"bar"}'
+
+        response = await self.client.request("POST", "/order", data=_chunks())
+
+        self.assertEqual(200, response.status)
+        self.assertIn("Microservice call correct!!!", await response.text())
+
+    @unittest_run_loop
+    async def test_post_too_large(self):
+        response = await self.client.request("POST", "/order", data=b"x" * (1024 ** 2 + 1))
+
+        self.assertEqual(413, response.status)
+
     @unittest_run_loop
     async def test_put(self):
         url = "/order/5"
@@ -233,5 +253,61 @@ class TestApiGatewayRestServiceUnreachableMicroservice(AioHTTPTestCase):
         self.assertIn("The requested endpoint is not available.", await response.text())
 
 
+class TestApiGatewayRestServiceSyncDiscovery(AioHTTPTestCase):
+    CONFIG_FILE_PATH = BASE_PATH / "config.yml"
+
+    def setUp(self) -> None:
+        os.environ["API_GATEWAY_REST_AUTH_ENABLED"] = "false"
+        self.config = ApiGatewayConfig(self.CONFIG_FILE_PATH, api_gateway_discovery_mode="sync")
+
+        self.discovery = MockServer(host=self.config.discovery.host, port=self.config.discovery.port,)
+        self.discovery.add_json_response(
+            "/endpoints",
+            [
+                {
+                    "name": "order",
+                    "address": "localhost",
+                    "port": "5568",
+                    "status": True,
+                    "endpoints": ["endpoint:GET:/order/{id}", "endpoint:POST:/order"],
+                }
+            ],
+        )
+
+        self.microservice = MockServer(host="localhost", port=5568)
+        self.microservice.add_json_response("/order/5", "Microservice call correct!!!", methods=("GET",))
+
+        self.discovery.start()
+        self.microservice.start()
+        super().setUp()
+
+    def tearDown(self) -> None:
+        self.discovery.shutdown_server()
+        self.microservice.shutdown_server()
+        super().tearDown()
+
+    async def get_application(self):
+        """
+        Override the get_app method to return your application.
+        """
+        rest_service = ApiGatewayRestService(
+            address=self.config.rest.host, port=self.config.rest.port, config=self.config
+        )
+
+        return await rest_service.create_application()
+
+    async def test_get(self):
+        response = await self.client.request("GET", "/order/5")
+
+        self.assertEqual(200, response.status)
+        self.assertIn("Microservice call correct!!!", await response.text())
+
+    async def test_get_not_found(self):
+        response = await self.client.request("DELETE", "/order/5")
+
+        self.assertEqual(404, response.status)
+        self.assertIn("The '/order/5' path is not available for 'DELETE' method.", await response.text())
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,121 @@
+"""tests.test_api_gateway.test_rest.test_static module."""
+
+import gzip
+import tempfile
+import unittest
+from pathlib import (
+    Path,
+)
+
+from aiohttp import (
+    web,
+)
+from aiohttp.test_utils import (
+    AioHTTPTestCase,
+)
+
+from minos.api_gateway.rest.static import (
+    IMMUTABLE_CACHE_CONTROL,
+    REVALIDATE_CACHE_CONTROL,
+    StaticAssets,
+)
+
+SCRIPT = b"console.log('minos');" * 100
+
+
+class TestStaticAssets(AioHTTPTestCase):
+    async def get_application(self):
+        self.directory = tempfile.TemporaryDirectory()
+        path = Path(self.directory.name)
+        (path / "main.33051811e0a291cf.js").write_bytes(SCRIPT)
+        (path / "favicon.ico").write_bytes(b"icon")
+        (path / "assets").mkdir()
+        (path / "assets" / "logo.png").write_bytes(b"\x89PNG" * 100)
+        (path / "index.html").write_bytes(b"<html></html>")
+
+        self.assets = StaticAssets(directory=path, index=path / "index.html", headers={"Content-Language": "es"})
+
+        app = web.Application()
+        app.on_startup.append(self.assets.on_startup)
+        app.on_cleanup.append(self.assets.on_cleanup)
+        app.router.add_get("/administration{path:.*}", self.assets.handle)
+        return app
+
+    async def asyncSetUp(self) -> None:
+        await super().asyncSetUp()
+        await self.assets._task
+
+    async def asyncTearDown(self) -> None:
+        await super().asyncTearDown()
+        self.directory.cleanup()
+
+    async def test_hashed(self):
+        response = await self.client.get(
+            "/administration/main.33051811e0a291cf.js", skip_auto_headers=["Accept-Encoding"]
+        )
+
+        self.assertEqual(200, response.status)
+        self.assertEqual(SCRIPT, await response.read())
+        self.assertEqual(IMMUTABLE_CACHE_CONTROL, response.headers["Cache-Control"])
+        self.assertIn("javascript", response.headers["Content-Type"])
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    async def test_not_hashed(self):
+        response = await self.client.get("/administration/favicon.ico")
+
+        self.assertEqual(200, response.status)
+        self.assertEqual(REVALIDATE_CACHE_CONTROL, response.headers["Cache-Control"])
+
+    async def test_nested(self):
+        response = await self.client.get("/administration/assets/logo.png", headers={"Accept-Encoding": "gzip"})
+
+        self.assertEqual(200, response.status)
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    async def test_index(self):
+        for url in ("/administration", "/administration/", "/administration/rules/5"):
+            response = await self.client.get(url)
+
+            self.assertEqual(200, response.status)
+            self.assertEqual(b"<html></html>", await response.read())
+            self.assertEqual("es", response.headers["Content-Language"])
+            self.assertEqual(REVALIDATE_CACHE_CONTROL, response.headers["Cache-Control"])
+
+    async def test_gzip(self):
+        response = await self.client.get(
+            "/administration/main.33051811e0a291cf.js", headers={"Accept-Encoding": "gzip"}, auto_decompress=False
+        )
+
+        self.assertEqual("gzip", response.headers["Content-Encoding"])
+        self.assertEqual("Accept-Encoding", response.headers["Vary"])
+        self.assertEqual(SCRIPT, gzip.decompress(await response.read()))
+
+    async def test_rejected_encoding(self):
+        response = await self.client.get(
+            "/administration/main.33051811e0a291cf.js", headers={"Accept-Encoding": "gzip;q=0"}
+        )
+
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    async def test_etag(self):
+        response = await self.client.get("/administration/favicon.ico")
+        etag = response.headers["ETag"]
+
+        response = await self.client.get("/administration/favicon.ico", headers={"If-None-Match": etag})
+
+        self.assertEqual(304, response.status)
+        self.assertEqual(etag, response.headers["ETag"])
+
+    async def test_etag_by_encoding(self):
+        url = "/administration/main.33051811e0a291cf.js"
+        identity = await self.client.get(url, headers={"Accept-Encoding": "identity"})
+        compressed = await self.client.get(url, headers={"Accept-Encoding": "gzip"})
+
+        self.assertNotEqual(identity.headers["ETag"], compressed.headers["ETag"])
+
+        response = await self.client.get(url, headers={"Accept-Encoding": "identity", "If-None-Match": "*"})
+        self.assertEqual(304, response.status)
+
+
+if __name__ == "__main__":
+    unittest.main()
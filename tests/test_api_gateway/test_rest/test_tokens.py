@@ -0,0 +1,144 @@
+"""tests.test_api_gateway.test_rest.test_tokens module."""
+
+import json
+import time
+import unittest
+from unittest.mock import (
+    MagicMock,
+)
+from uuid import (
+    uuid4,
+)
+
+import jwt
+from aiohttp import (
+    web,
+)
+from aiohttp.test_utils import (
+    AioHTTPTestCase,
+)
+from cryptography.hazmat.primitives.asymmetric import (
+    rsa,
+)
+from yarl import (
+    URL,
+)
+
+from minos.api_gateway.rest.tokens import (
+    TokenVerifier,
+)
+
+
+def _generate_key(kid: str):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    public_jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+    public_jwk.update({"kid": kid, "alg": "RS256", "use": "sig"})
+    return private_key, public_jwk
+
+
+class TestTokenVerifier(AioHTTPTestCase):
+    async def get_application(self):
+        self.private_key, public_jwk = _generate_key("key-1")
+        self.jwks = {"keys": [public_jwk]}
+        self.calls = 0
+
+        async def _jwks(request):
+            self.calls += 1
+            return web.json_response(self.jwks)
+
+        app = web.Application()
+        app.router.add_route("GET", "/auth/jwks", _jwks)
+        return app
+
+    def _verifier(self, **kwargs) -> TokenVerifier:
+        url = URL(str(self.server.make_url("/auth/jwks")))
+        return TokenVerifier(url=url, **kwargs)
+
+    def _token(self, private_key=None, kid="key-1", **claims) -> str:
+        payload = {"sub": str(uuid4()), "role": 3, "exp": int(time.time()) + 60, **claims}
+        return jwt.encode(payload, private_key or self.private_key, algorithm="RS256", headers={"kid": kid})
+
+    async def test_verify(self):
+        verifier = self._verifier()
+        await verifier.refresh()
+        uuid = str(uuid4())
+
+        observed = await verifier.verify(self._token(uuid=uuid))
+
+        self.assertEqual({"uuid": uuid, "role": 3}, observed)
+
+    async def test_verify_request(self):
+        verifier = self._verifier()
+        await verifier.refresh()
+        request = MagicMock(headers={"Authorization": f"Bearer {self._token()}"})
+
+        observed = await verifier.verify_request(request)
+
+        self.assertEqual(3, observed["role"])
+
+    async def test_verify_request_without_token(self):
+        verifier = self._verifier()
+        request = MagicMock(headers={})
+
+        self.assertIsNone(await verifier.verify_request(request))
+
+    async def test_verify_opaque(self):
+        verifier = self._verifier()
+        await verifier.refresh()
+
+        self.assertIsNone(await verifier.verify("credential-token-test"))
+
+    async def test_verify_expired(self):
+        verifier = self._verifier()
+        await verifier.refresh()
+
+        with self.assertRaises(web.HTTPUnauthorized):
+            await verifier.verify(self._token(exp=int(time.time()) - 60))
+
+    async def test_verify_without_subject(self):
+        verifier = self._verifier()
+        await verifier.refresh()
+        token = jwt.encode(
+            {"role": 3, "exp": int(time.time()) + 60}, self.private_key, algorithm="RS256", headers={"kid": "key-1"}
+        )
+
+        with self.assertRaises(web.HTTPUnauthorized):
+            await verifier.verify(token)
+
+    async def test_verify_wrong_signature(self):
+        verifier = self._verifier()
+        await verifier.refresh()
+        other_key, _ = _generate_key("key-1")
+
+        with self.assertRaises(web.HTTPUnauthorized):
+            await verifier.verify(self._token(private_key=other_key))
+
+    async def test_verify_rotated_key(self):
+        verifier = self._verifier(min_refresh_interval=0)
+        await verifier.refresh()
+
+        rotated_key, rotated_jwk = _generate_key("key-2")
+        self.jwks = {"keys": [rotated_jwk]}
+
+        observed = await verifier.verify(self._token(private_key=rotated_key, kid="key-2"))
+
+        self.assertEqual(3, observed["role"])
+        self.assertEqual(2, self.calls)
+
+    async def test_verify_unknown_key(self):
+        verifier = self._verifier()
+        await verifier.refresh()
+        other_key, _ = _generate_key("key-3")
+
+        self.assertIsNone(await verifier.verify(self._token(private_key=other_key, kid="key-3")))
+        self.assertEqual(1, self.calls)
+
+    async def test_signals(self):
+        verifier = self._verifier()
+        await verifier.on_startup(self.app)
+        self.assertEqual(1, self.calls)
+        await verifier.on_cleanup(self.app)
+
+
+if __name__ == "__main__":
+    unittest.main()
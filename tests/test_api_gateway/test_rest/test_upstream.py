@@ -0,0 +1,286 @@
+"""tests.test_api_gateway.test_rest.test_upstream module."""
+
+import asyncio
+import tempfile
+import unittest
+from pathlib import (
+    Path,
+)
+from unittest.mock import (
+    patch,
+)
+
+from aiohttp import (
+    ClientConnectionError,
+    web,
+)
+from aiohttp.test_utils import (
+    AioHTTPTestCase,
+    make_mocked_request,
+)
+from multidict import (
+    CIMultiDict,
+)
+from yarl import (
+    URL,
+)
+
+from minos.api_gateway.rest.body import (
+    SpooledBody,
+)
+from minos.api_gateway.rest.upstream import (
+    H2C,
+    HTTP_1_1,
+    HTTP_2,
+    UpstreamClient,
+)
+
+
+class TestUpstreamClientProtocol(unittest.TestCase):
+    def test_invalid_protocol(self):
+        with self.assertRaises(ValueError):
+            UpstreamClient(protocol="spdy")
+
+        with self.assertRaises(ValueError):
+            UpstreamClient(services={"order": "spdy"})
+
+    def test_protocol_for(self):
+        client = UpstreamClient(protocol=HTTP_1_1, services={"order": H2C, "payments": HTTP_2})
+
+        self.assertEqual(HTTP_1_1, client.protocol_for("merchants"))
+        self.assertEqual(HTTP_1_1, client.protocol_for(None))
+        self.assertEqual(H2C, client.protocol_for("order"))
+        self.assertEqual(HTTP_2, client.protocol_for("payments"))
+
+    def test_protocol_for_without_httpx(self):
+        with patch("minos.api_gateway.rest.upstream.httpx", None):
+            client = UpstreamClient(services={"order": H2C})
+            self.assertEqual(HTTP_1_1, client.protocol_for("order"))
+
+    def test_replayable(self):
+        client = UpstreamClient(services={"order": H2C})
+
+        self.assertTrue(client.replayable("order"))
+        self.assertFalse(client.replayable("payments"))
+
+    def test_replayable_retries(self):
+        client = UpstreamClient(retries=2)
+
+        self.assertTrue(client.replayable("payments", "PUT"))
+        self.assertFalse(client.replayable("payments", "POST"))
+        self.assertFalse(client.replayable("payments"))
+
+    def test_socket_for(self):
+        client = UpstreamClient(sockets={"order": "/run/order.sock"})
+
+        self.assertEqual("/run/order.sock", client.socket_for("order", "localhost"))
+        self.assertEqual("/run/payments.sock", client.socket_for("payments", "unix:/run/payments.sock"))
+        self.assertIsNone(client.socket_for("payments", "localhost"))
+
+
+async def _order(request):
+    return web.json_response({"method": request.method, "body": (await request.read()).decode()})
+
+
+async def _headers(request):
+    return web.json_response(dict(request.headers))
+
+
+async def _stream(request):
+    response = web.StreamResponse(headers={"Content-Type": "application/octet-stream"})
+    await response.prepare(request)
+    for _ in range(int(request.query["chunks"])):
+        await response.write(b"x" * 1024)
+    await response.write_eof()
+    return response
+
+
+class TestUpstreamClientRequest(AioHTTPTestCase):
+    async def get_application(self):
+        async def _proxy(request):
+            url = URL(str(self.server.make_url(request.match_info["path"]))).with_query(request.query)
+            service = request.headers.get("X-Service")
+            headers = CIMultiDict()
+            if not request.body_exists:
+                data = None
+            elif self.upstream.replayable(service):
+                data = await SpooledBody.from_stream(request.content)
+                headers["Content-Length"] = str(data.size)
+            else:
+                data = request.content
+                if request.content_length is not None:
+                    headers["Content-Length"] = str(request.content_length)
+            return await self.upstream.request(request.method, url, headers, data, service=service)
+
+        app = web.Application()
+        app.router.add_route("*", "/order", _order)
+        app.router.add_route("GET", "/stream", _stream)
+        app.router.add_route("GET", "/headers", _headers)
+        app.router.add_route("*", "/proxy/{path:.*}", _proxy)
+        return app
+
+    async def asyncTearDown(self) -> None:
+        await self.upstream.close()
+        await super().asyncTearDown()
+
+    async def asyncSetUp(self) -> None:
+        await super().asyncSetUp()
+        self.upstream = UpstreamClient(services={"order": H2C})
+
+    async def test_request_http_1_1(self):
+        response = await self.client.post("/proxy/order", data=b"foo", headers={"X-Service": "merchants"})
+
+        self.assertEqual(200, response.status)
+        self.assertIn(b'"body": "foo"', await response.read())
+
+    async def test_request_streamed_body(self):
+        async def _chunks():
+            for _ in range(64):
+                yield b"y" * 1024
+
+        response = await self.client.post("/proxy/order", data=_chunks(), headers={"X-Service": "merchants"})
+
+        self.assertEqual(200, response.status)
+        self.assertEqual("y" * 64 * 1024, (await response.json())["body"])
+
+    async def test_request_streamed_response(self):
+        response = await self.client.get("/proxy/stream?chunks=128", headers={"X-Service": "merchants"})
+
+        self.assertEqual(200, response.status)
+        self.assertEqual("application/octet-stream", response.headers["Content-Type"])
+        self.assertEqual(128 * 1024, len(await response.read()))
+
+    async def test_request_content_length(self):
+        response = await self.client.post("/proxy/order", data=b"foo", headers={"X-Service": "merchants"})
+
+        self.assertEqual(int(response.headers["Content-Length"]), len(await response.read()))
+
+    async def test_request_h2c_fallback(self):
+        response = await self.client.put("/proxy/order", data=b"bar", headers={"X-Service": "order"})
+
+        self.assertEqual(200, response.status)
+        self.assertEqual({"method": "PUT", "body": "bar"}, await response.json())
+        self.assertEqual(HTTP_1_1, self.upstream.protocol_for("order"))
+
+    async def test_request_accept_encoding(self):
+        response = await self.client.get("/proxy/headers", headers={"X-Service": "merchants"})
+
+        self.assertNotIn("Accept-Encoding", await response.json())
+
+    def test_http2_accept_encoding(self):
+        self.assertNotIn("Accept-Encoding", self.upstream._get_http2_client(H2C).headers)
+
+    async def test_retire(self):
+        url = URL(str(self.server.make_url("/order")))
+        response = await self.upstream.request("GET", url, CIMultiDict(), None, service="merchants")
+
+        retire = asyncio.create_task(self.upstream.retire())
+        await asyncio.sleep(0.01)
+        self.assertFalse(retire.done())
+
+        await response._close()
+        await asyncio.wait_for(retire, 1)
+
+    async def test_retire_timeout(self):
+        url = URL(str(self.server.make_url("/order")))
+        response = await self.upstream.request("GET", url, CIMultiDict(), None, service="merchants")
+
+        await self.upstream.retire(timeout=0.01)
+
+        await response._close()
+
+    async def test_request_unavailable(self):
+        url = URL("http://localhost:1/order")
+
+        with self.assertRaises(web.HTTPServiceUnavailable):
+            await self.upstream.request("GET", url, CIMultiDict(), None, service="merchants")
+
+
+class TestUpstreamClientRetries(AioHTTPTestCase):
+    async def get_application(self):
+        self.calls = 0
+
+        async def _flaky(request):
+            self.calls += 1
+            body = await request.read()
+            if self.calls == 1:
+                request.transport.close()
+            return web.json_response({"method": request.method, "body": body.decode()})
+
+        app = web.Application()
+        app.router.add_route("*", "/order", _flaky)
+        return app
+
+    async def asyncTearDown(self) -> None:
+        await self.upstream.close()
+        await super().asyncTearDown()
+
+    async def asyncSetUp(self) -> None:
+        await super().asyncSetUp()
+        self.upstream = UpstreamClient(retries=2, retry_backoff=0)
+
+    async def _read(self, response: web.StreamResponse) -> bytes:
+        request = make_mocked_request("PUT", "/order")
+        await response.prepare(request)
+        await response.write_eof()
+        return b"".join(call.args[0] for call in request.writer.write.call_args_list)
+
+    async def test_retry_idempotent(self):
+        url = URL(str(self.server.make_url("/order")))
+        body = SpooledBody()
+        await body.write(b"foo")
+
+        response = await self.upstream.request("PUT", url, CIMultiDict({"Content-Length": "3"}), body)
+
+        self.assertEqual(200, response.status)
+        self.assertIn(b'"body": "foo"', await self._read(response))
+        self.assertEqual(2, self.calls)
+
+    async def test_not_retry_non_idempotent(self):
+        url = URL(str(self.server.make_url("/order")))
+
+        with self.assertRaises(ClientConnectionError):
+            await self.upstream.request("POST", url, CIMultiDict(), b"foo")
+        self.assertEqual(1, self.calls)
+
+    async def test_retry_unavailable(self):
+        url = URL("http://localhost:1/order")
+
+        with self.assertRaises(web.HTTPServiceUnavailable):
+            await self.upstream.request("GET", url, CIMultiDict(), None)
+
+
+class TestUpstreamClientUnixSocket(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.socket = str(Path(self.directory.name) / "order.sock")
+
+        app = web.Application()
+        app.router.add_route("*", "/order", _order)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.UnixSite(self.runner, self.socket).start()
+
+        self.upstream = UpstreamClient()
+
+    async def asyncTearDown(self) -> None:
+        await self.upstream.close()
+        await self.runner.cleanup()
+        self.directory.cleanup()
+
+    async def test_request(self):
+        url = URL("http://localhost/order")
+        socket = self.upstream.socket_for("order", f"unix:{self.socket}")
+
+        response = await self.upstream.request("POST", url, CIMultiDict(), b"foo", service="order", socket=socket)
+        self.assertEqual(200, response.status)
+
+        request = make_mocked_request("POST", "/order")
+        await response.prepare(request)
+        await response.write_eof()
+
+        self.assertIn(b'"body": "foo"', b"".join(call.args[0] for call in request.writer.write.call_args_list))
+
+
+if __name__ == "__main__":
+    unittest.main()